@@ -1,10 +1,14 @@
+import copy
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from torch.autograd import Variable
+from torch.nn.utils.fusion import fuse_conv_bn_eval
 from functools import partial
 
-__all__ = ['resnet50', 'resnet101', 'resnet152', 'resnet200']
+__all__ = [
+    'resnet50', 'resnet101', 'resnet152', 'resnet200', 'optimize_for_inference', 'ScreenedSlowFast',
+    'StreamingSlowFast', 'screener_head'
+]
 
 
 def conv3x3x3(in_planes, out_planes, stride=1):
@@ -20,12 +24,8 @@ def conv3x3x3(in_planes, out_planes, stride=1):
 
 def downsample_basic_block(x, planes, stride):
     out = F.avg_pool3d(x, kernel_size=1, stride=stride)
-    zero_pads = torch.Tensor(out.size(0), planes - out.size(1), out.size(2), out.size(3), out.size(4)).zero_()
-    if isinstance(out.data, torch.cuda.FloatTensor):
-        zero_pads = zero_pads.cuda()
-    out = Variable(torch.cat([out.data, zero_pads], dim=1))
-
-    return out
+    # Zero-pad the channel dimension up to `planes`, on the input's device and dtype
+    return F.pad(out, (0, 0, 0, 0, 0, 0, 0, planes - out.size(1)))
 
 
 class Bottleneck(nn.Module):
@@ -95,6 +95,12 @@ def get_fine_tuning_parameters(model, ft_begin_index):
 
 
 class SlowFast(nn.Module):
+    # Temporal sampling of the input clip for the fast and slow pathways
+    fast_stride = 2
+    slow_stride = 16
+    # Set to torch.channels_last_3d by optimize_for_inference
+    memory_format = torch.contiguous_format
+
     def __init__(self, block=Bottleneck, layers=[3, 4, 6, 3], class_num=27, shortcut_type='B', dropout=0.5,
                  alpha=8, beta=0.125):
         super(SlowFast, self).__init__()
@@ -136,22 +142,38 @@ class SlowFast(nn.Module):
         self.Tconv3 = nn.Conv3d(64, 128, kernel_size=(5, 1, 1), stride=(alpha, 1, 1), padding=(2, 0, 0), bias=False)
         self.Tconv4 = nn.Conv3d(128, 256, kernel_size=(5, 1, 1), stride=(alpha, 1, 1), padding=(2, 0, 0), bias=False)
 
+        self.avgpool = nn.AdaptiveAvgPool3d(1)
         self.dp = nn.Dropout(dropout)
         self.fc = nn.Linear(self.fast_inplanes + self.slow_inplanes, class_num)
 
     def forward(self, input):
-        fast, Tc = self.FastPath(input[:, :, ::2, :, :])
-        slow = self.SlowPath(input[:, :, ::16, :, :], Tc)
+        input = self.prepare_input(input)
+        fast, Tc = self.FastPath(input[:, :, ::self.fast_stride, :, :])
+        slow = self.SlowPath(input[:, :, ::self.slow_stride, :, :], Tc)
+        return self.classify(slow, fast)
+
+    def prepare_input(self, input):
+        if self.memory_format != torch.contiguous_format:
+            input = input.contiguous(memory_format=self.memory_format)
+        return input
+
+    def classify(self, slow, fast):
         x = torch.cat([slow, fast], dim=1)
         x = self.dp(x)
         x = self.fc(x)
         return x
 
     def SlowPath(self, input, Tc):
+        return self.slow_trunk(self.slow_stem(input), Tc)
+
+    def slow_stem(self, input):
         x = self.slow_conv1(input)
         x = self.slow_bn1(x)
         x = self.slow_relu(x)
         x = self.slow_maxpool(x)
+        return x
+
+    def slow_trunk(self, x, Tc):
         x = torch.cat([x, Tc[0]], dim=1)
         x = self.slow_res1(x)
         x = torch.cat([x, Tc[1]], dim=1)
@@ -160,15 +182,21 @@ class SlowFast(nn.Module):
         x = self.slow_res3(x)
         x = torch.cat([x, Tc[3]], dim=1)
         x = self.slow_res4(x)
-        x = nn.AdaptiveAvgPool3d(1)(x)
+        x = self.avgpool(x)
         x = x.view(-1, x.size(1))
         return x
 
     def FastPath(self, input):
-        x = self.fast_conv1(input)
+        return self.fast_trunk(self.fast_stem_post(self.fast_conv1(input)))
+
+    def fast_stem_post(self, x):
+        # Everything in the fast stem after fast_conv1 works frame by frame
         x = self.fast_bn1(x)
         x = self.fast_relu(x)
         x = self.fast_maxpool(x)
+        return x
+
+    def fast_trunk(self, x):
         Tc1 = self.Tconv1(x)
         x = self.fast_res1(x)
         Tc2 = self.Tconv2(x)
@@ -177,7 +205,7 @@ class SlowFast(nn.Module):
         x = self.fast_res3(x)
         Tc4 = self.Tconv4(x)
         x = self.fast_res4(x)
-        x = nn.AdaptiveAvgPool3d(1)(x)
+        x = self.avgpool(x)
         x = x.view(-1, x.size(1))
         return x, [Tc1, Tc2, Tc3, Tc4]
 
@@ -232,6 +260,176 @@ class SlowFast(nn.Module):
         return nn.Sequential(*layers)
 
 
+class ScreenedSlowFast(nn.Module):
+    """Two-stage cascade around a SlowFast model.
+
+    A linear screener on the fast pathway features classifies every clip. Only
+    clips whose non-normal probability exceeds `threshold` also run the slow
+    pathway and the full classifier, reusing the fast pathway outputs; the other
+    clips keep the screener's logits.
+    """
+
+    def __init__(self, slowfast, screener, normal_index, threshold=0.5):
+        super(ScreenedSlowFast, self).__init__()
+        self.slowfast = slowfast
+        self.screener = screener
+        self.normal_index = normal_index
+        self.threshold = threshold
+        self.fast_stride = slowfast.fast_stride
+        self.slow_stride = slowfast.slow_stride
+        self.screened = 0
+        self.escalated = 0
+
+    def forward(self, input):
+        input = self.slowfast.prepare_input(input)
+        fast, Tc = self.slowfast.FastPath(input[:, :, ::self.fast_stride, :, :])
+        logits = self.screener(fast)
+
+        suspicious = 1 - torch.softmax(logits, dim=1)[:, self.normal_index] > self.threshold
+        self.screened += input.size(0)
+        if suspicious.any():
+            self.escalated += int(suspicious.sum())
+            slow = self.slowfast.SlowPath(input[suspicious][:, :, ::self.slow_stride, :, :],
+                                          [t[suspicious] for t in Tc])
+            logits = logits.clone()
+            logits[suspicious] = self.slowfast.classify(slow, fast[suspicious])
+        return logits
+
+
+class StreamingSlowFast(nn.Module):
+    """Per-stream sliding-window inference that computes the SlowFast stems once per frame.
+
+    Overlapping windows share most of their frames. fast_conv1 is split into its
+    temporal taps, each tap's contribution is computed once per new frame and
+    cached by absolute frame id, and a window's fast_conv1 output is the sum of
+    the cached taps (taps that fall outside the window are the conv's zero
+    padding). The slow stem is purely per-frame and cached whole. Everything
+    above the stems mixes time within the window and runs per window. Wraps a
+    shared SlowFast without modifying it; keep one instance per stream.
+    """
+
+    def __init__(self, slowfast):
+        super(StreamingSlowFast, self).__init__()
+        self.slowfast = slowfast
+        self.fast_stride = slowfast.fast_stride
+        self.slow_stride = slowfast.slow_stride
+
+        conv = slowfast.fast_conv1
+        self.fast_taps = conv.kernel_size[0]
+        self.fast_padding = conv.padding[0]
+        # (out, in, taps, kh, kw) -> one 2D conv whose output channels are grouped by tap
+        weight = conv.weight.detach().permute(2, 0, 1, 3, 4)
+        self.register_buffer('fast_tap_weight', weight.reshape(-1, *weight.shape[2:]).contiguous(), persistent=False)
+        bias = conv.bias.detach().view(1, -1, 1, 1, 1) if conv.bias is not None else None
+        self.register_buffer('fast_bias', bias, persistent=False)
+        self.fast_tap_stride = conv.stride[1:]
+        self.fast_tap_padding = conv.padding[1:]
+        self.fast_channels = conv.out_channels
+
+        self.reset()
+
+    def reset(self):
+        """Forget cached frames, e.g. when the stream restarts"""
+        self._fast_taps = {}  # frame id -> (taps, C, H, W) tap contributions
+        self._slow_stems = {}  # frame id -> (C, 1, H, W) slow stem output
+        self.computed_frames = 0
+        self.reused_frames = 0
+
+    def _cached(self, cache, frame_ids, frames, compute):
+        new_ids = [i for i in frame_ids if i not in cache]
+        self.reused_frames += len(frame_ids) - len(new_ids)
+        self.computed_frames += len(new_ids)
+        if new_ids:
+            positions = [frame_ids.index(i) for i in new_ids]
+            for i, value in zip(new_ids, compute(frames[positions])):
+                cache[i] = value
+        return [cache[i] for i in frame_ids]
+
+    def _fast_tap_contributions(self, frames):
+        # frames: (N, 3, H, W) -> (N, taps, C, H', W')
+        out = F.conv2d(frames, self.fast_tap_weight, stride=self.fast_tap_stride, padding=self.fast_tap_padding)
+        return out.view(out.size(0), self.fast_taps, self.fast_channels, out.size(2), out.size(3))
+
+    def _slow_stem(self, frames):
+        # frames: (N, 3, H, W) -> (N, C, 1, H', W'), each frame through the slow stem on its own
+        return self.slowfast.slow_stem(frames.unsqueeze(2))
+
+    def forward(self, input, first_frame_id):
+        """Classify one (1, 3, T, H, W) window whose first frame has absolute id `first_frame_id`"""
+        clip = input[0]
+        sequence_length = clip.size(1)
+        frames = clip.transpose(0, 1)  # (T, 3, H, W)
+
+        fast_offsets = list(range(0, sequence_length, self.fast_stride))
+        fast_ids = [first_frame_id + offset for offset in fast_offsets]
+        taps = self._cached(self._fast_taps, fast_ids, frames[fast_offsets], self._fast_tap_contributions)
+
+        # fast_conv1 output at fast position t sums tap j of the frame at t + j - padding
+        fast = []
+        for t in range(len(fast_ids)):
+            x = None
+            for j in range(self.fast_taps):
+                source = t + j - self.fast_padding
+                if 0 <= source < len(fast_ids):
+                    x = taps[source][j] if x is None else x + taps[source][j]
+            fast.append(x)
+        fast = torch.stack(fast, dim=1).unsqueeze(0)  # (1, C, T_fast, H', W')
+        if self.fast_bias is not None:
+            fast = fast + self.fast_bias
+
+        slow_offsets = list(range(0, sequence_length, self.slow_stride))
+        slow_ids = [first_frame_id + offset for offset in slow_offsets]
+        slow = self._cached(self._slow_stems, slow_ids, frames[slow_offsets], self._slow_stem)
+        slow = torch.cat(slow, dim=1).unsqueeze(0)  # (1, C, T_slow, H', W')
+
+        # Windows only move forward, so frames before this one are never needed again
+        for cache in (self._fast_taps, self._slow_stems):
+            for frame_id in [i for i in cache if i < first_frame_id]:
+                del cache[frame_id]
+
+        model = self.slowfast
+        fast = model.prepare_input(model.fast_stem_post(fast))
+        fast, Tc = model.fast_trunk(fast)
+        slow = model.slow_trunk(model.prepare_input(slow), Tc)
+        return model.classify(slow, fast)
+
+
+def screener_head(model, class_num):
+    """Linear classifier over the pooled fast pathway features of `model`."""
+    return nn.Linear(model.fast_inplanes, class_num)
+
+
+def _fold_bn(module, conv_name, bn_name):
+    # Replace conv + BatchNorm with a single conv whose weights and bias absorb the normalization
+    conv, bn = getattr(module, conv_name), getattr(module, bn_name)
+    setattr(module, conv_name, fuse_conv_bn_eval(conv, bn))
+    setattr(module, bn_name, nn.Identity())
+
+
+def optimize_for_inference(model, channels_last=True):
+    """Returns an inference-only copy of a SlowFast model.
+
+    Every BatchNorm3d is folded into the convolution before it, gradients are
+    disabled and, with channels_last, weights and inputs use channels_last_3d.
+    """
+    model = copy.deepcopy(model).eval()
+
+    _fold_bn(model, 'fast_conv1', 'fast_bn1')
+    _fold_bn(model, 'slow_conv1', 'slow_bn1')
+    for module in model.modules():
+        if isinstance(module, Bottleneck):
+            for i in (1, 2, 3):
+                _fold_bn(module, 'conv{}'.format(i), 'bn{}'.format(i))
+            if isinstance(module.downsample, nn.Sequential):
+                _fold_bn(module.downsample, '0', '1')
+
+    model.requires_grad_(False)
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last_3d)
+        model.memory_format = torch.channels_last_3d
+    return model
+
+
 def resnet50(**kwargs):
     """Constructs a ResNet-50 model.
     """
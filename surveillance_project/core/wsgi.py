@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Serving processes load the model up front when configured to; manage.py commands do not
+from surveillance.apps import preload_model_if_enabled
+
+preload_model_if_enabled()
@@ -1,5 +1,22 @@
+import os
+
 from django.apps import AppConfig
 
+
+def preload_model_if_enabled():
+    """Load the video stack and model now when PRELOAD_MODEL or SURVEILLANCE_PRELOAD_MODEL=1 asks for it
+
+    Called from the WSGI and ASGI entry points, not from ready(), so manage.py
+    commands such as migrate or test never load the model. The analysis worker
+    loads its own model when it starts.
+    """
+    from .utils.config import VideoProcessorConfig
+
+    if VideoProcessorConfig.PRELOAD_MODEL or os.environ.get('SURVEILLANCE_PRELOAD_MODEL') == '1':
+        from .utils.setup import preload_model
+        preload_model()
+
+
 class SurveillanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'surveillance'
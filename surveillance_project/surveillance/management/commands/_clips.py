@@ -0,0 +1,32 @@
+import os
+
+import torch
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+
+def load_clips(processor, clips_dir, max_clips, batch_size, stderr):
+    """Preprocess windows from every video under clips_dir into batches, with per-clip labels"""
+    label_index = {label.lower(): idx for idx, label in enumerate(processor.class_labels)}
+    clips, labels = [], []
+
+    for root, _, files in sorted(os.walk(clips_dir)):
+        label = label_index.get(os.path.basename(root).lower(), -1)
+        for name in sorted(files):
+            if not name.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            try:
+                for frames, _ in processor.iter_windows(os.path.join(root, name)):
+                    clips.append(processor.preprocess_frames(frames).clone())
+                    labels.append(label)
+                    if len(clips) >= max_clips:
+                        break
+            except ValueError as e:
+                stderr.write(str(e))
+            if len(clips) >= max_clips:
+                break
+        if len(clips) >= max_clips:
+            break
+
+    batches = [torch.cat(clips[i:i + batch_size]) for i in range(0, len(clips), batch_size)]
+    return batches, labels
@@ -0,0 +1,213 @@
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import torch
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from ...utils.alert_handler import AlertHandler
+from ...utils.inference_backends import TorchBackend
+from ...utils.model_loader import MODEL_ARCHITECTURES, import_model_module
+from ...utils.video_processor import VideoProcessor
+
+
+def write_synthetic_video(path, width, height, frame_count, fps=25):
+    """Write a video of moving shapes over a noisy background"""
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    size = max(8, min(width, height) // 6)
+
+    for i in range(frame_count):
+        frame = background.copy()
+        x = (i * 7) % max(1, width - size)
+        y = (i * 3) % max(1, height - size)
+        cv2.rectangle(frame, (x, y), (x + size, y + size), (0, 0, 255), -1)
+        cv2.circle(frame, (width - x - 1, y + size // 2), size // 2, (0, 255, 0), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def median_ms(fn, repeats):
+    """Median wall time of fn() in milliseconds, after one warm-up call"""
+    fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def compare(results, baseline, tolerance):
+    """Relative change of every metric present in both runs; all metrics are lower-is-better"""
+    comparison = {}
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if not previous or not previous['value']:
+            continue
+        change = result['value'] / previous['value'] - 1
+        status = 'regression' if change > tolerance else 'improvement' if change < -tolerance else 'unchanged'
+        comparison[key] = {'baseline': previous['value'], 'current': result['value'], 'change': change,
+                           'status': status}
+    return comparison
+
+
+class Command(BaseCommand):
+    help = ('Benchmark each VideoProcessor stage (decode, preprocess, model forward, postprocess, save_alert) '
+            'on synthetic videos, write the results as JSON and compare them with a saved baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resolutions', nargs='+', default=['640x480', '1280x720'],
+                            help='Synthetic video sizes as WIDTHxHEIGHT')
+        parser.add_argument('--lengths', nargs='+', type=int, default=[64, 256], help='Synthetic video lengths in frames')
+        parser.add_argument('--archs', nargs='+', default=['resnet50'], choices=MODEL_ARCHITECTURES)
+        parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 4])
+        parser.add_argument('--repeats', type=int, default=5, help='Timed runs per measurement (median is kept)')
+        parser.add_argument('--threads', type=int, help='Torch intra-op threads (default: library default)')
+        parser.add_argument('--skip-save-alert', action='store_true',
+                            help='Skip the save_alert stage, which needs a migrated database')
+        parser.add_argument('--output', default='benchmark_results.json', help='Where to write the results')
+        parser.add_argument('--baseline', help='Results file from an earlier run to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.10, help='Relative slowdown reported as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['threads']:
+            torch.set_num_threads(options['threads'])
+
+        self.repeats = options['repeats']
+        self.results = {}
+        video_dir = tempfile.mkdtemp(prefix='surveillance-bench-')
+        try:
+            # No weights are needed: decode and preprocessing do not touch the model,
+            # and forward timing uses randomly initialised networks
+            processor = VideoProcessor()
+            for resolution in options['resolutions']:
+                width, height = (int(v) for v in resolution.lower().split('x'))
+                for length in options['lengths']:
+                    path = os.path.join(video_dir, f"{resolution}_{length}.mp4")
+                    write_synthetic_video(path, width, height, length)
+                    self.bench_decode(processor, path, resolution, length)
+                self.bench_preprocess(processor, path, resolution)
+                if not options['skip_save_alert']:
+                    self.bench_save_alert(processor, path, resolution)
+
+            for arch in options['archs']:
+                self.bench_forward(processor, arch, options['batch_sizes'])
+            self.bench_postprocess(processor)
+        finally:
+            shutil.rmtree(video_dir, ignore_errors=True)
+
+        report = {
+            'environment': {
+                'python': platform.python_version(),
+                'torch': torch.__version__,
+                'opencv': cv2.__version__,
+                'machine': platform.machine(),
+                'processor': platform.processor(),
+                'cpu_count': os.cpu_count(),
+                'torch_threads': torch.get_num_threads(),
+            },
+            'results': self.results,
+        }
+
+        regressions = []
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['results']
+            report['comparison'] = compare(self.results, baseline, options['tolerance'])
+            regressions = [key for key, row in report['comparison'].items() if row['status'] == 'regression']
+
+        self.print_report(report)
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Benchmark results written to {options['output']}"))
+
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} stage(s) regressed: {', '.join(regressions)}")
+
+    def record(self, key, value, unit):
+        self.results[key] = {'value': value, 'unit': unit}
+
+    def bench_decode(self, processor, path, resolution, length):
+        for sparse in (False, True):
+            ms = median_ms(lambda: sum(1 for _ in processor.iter_windows(path, sparse_decode=sparse)), self.repeats)
+            name = 'decode_sparse' if sparse else 'decode'
+            self.record(f"{name}/{resolution}/{length}f", ms / length, 'ms/frame')
+
+    def bench_preprocess(self, processor, path, resolution):
+        frames, _ = next(processor.iter_windows(path, sparse_decode=False))
+        out = np.empty((3, processor.sequence_length, processor.im_size, processor.im_size), dtype=np.float32)
+        self.record(f"preprocess/{resolution}", median_ms(lambda: processor.preprocessor(frames, out=out),
+                                                          self.repeats), 'ms/clip')
+
+    def bench_forward(self, processor, arch, batch_sizes):
+        model_module = import_model_module()
+        model = getattr(model_module, arch)(class_num=len(processor.class_labels)).eval()
+        backend = TorchBackend(model_module.optimize_for_inference(model), torch.device('cpu'))
+
+        for batch_size in batch_sizes:
+            clips = np.random.default_rng(0).standard_normal(
+                (batch_size, 3, processor.sequence_length, processor.im_size, processor.im_size)
+            ).astype(np.float32)
+            ms = median_ms(lambda: backend.predict(clips), self.repeats)
+            self.record(f"forward/{arch}/b{batch_size}", ms / batch_size, 'ms/clip')
+
+    def bench_postprocess(self, processor):
+        probabilities = np.random.default_rng(0).dirichlet(np.ones(len(processor.class_labels)), 256)
+        probabilities = probabilities.astype(np.float32)
+
+        def postprocess():
+            for i, row in enumerate(probabilities):
+                processor._build_prediction(row, i)
+
+        self.record('postprocess', median_ms(postprocess, self.repeats) / len(probabilities) * 1000, 'us/clip')
+
+    def bench_save_alert(self, processor, path, resolution):
+        """Time save_alert (JPEG encode, image write, DB insert, statistics, email) without keeping anything"""
+        frames, _ = next(processor.iter_windows(path, sparse_decode=False))
+        prediction = processor._build_prediction(np.eye(len(processor.class_labels), dtype=np.float32)[0], 16)
+        prediction['timestamp_vid'] = None
+        media_root = tempfile.mkdtemp(prefix='surveillance-bench-media-')
+
+        # The JPEG encode is timed on its own too, since it needs no database
+        handler = AlertHandler()
+        self.record(f"alert_encode/{resolution}", median_ms(lambda: handler.save_frame_as_image(frames[-1]),
+                                                            self.repeats), 'ms/alert')
+
+        def save_alert():
+            with transaction.atomic():
+                alert = processor.save_alert(frames[-1], prediction, None, None)
+                transaction.set_rollback(True)
+            if alert is None:
+                raise RuntimeError("save_alert did not create an alert")
+
+        try:
+            with override_settings(MEDIA_ROOT=media_root,
+                                   EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+                self.record(f"save_alert/{resolution}", median_ms(save_alert, self.repeats), 'ms/alert')
+        except Exception as e:
+            self.stderr.write(f"Skipping save_alert/{resolution}: {e}")
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def print_report(self, report):
+        comparison = report.get('comparison', {})
+        self.stdout.write(f"{'stage':<32} {'value':>10} {'unit':<9} {'baseline':>10} {'change':>8}")
+        for key, result in report['results'].items():
+            line = f"{key:<32} {result['value']:>10.3f} {result['unit']:<9}"
+            if key in comparison:
+                row = comparison[key]
+                line += f" {row['baseline']:>10.3f} {row['change'] * 100:>+7.1f}%"
+                if row['status'] == 'regression':
+                    line = self.style.ERROR(line)
+            self.stdout.write(line)
@@ -0,0 +1,78 @@
+import time
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+from django.core.management.base import BaseCommand
+from torchvision import transforms
+
+from ...utils.preprocessing import ClipPreprocessor
+
+SEQUENCE_LENGTH = 16
+IM_SIZE = 128
+MEAN = [0.4889, 0.4887, 0.4891]
+STD = [0.2074, 0.2074, 0.2074]
+
+
+def legacy_preprocess(frames, transform):
+    """Per-frame PIL/torchvision path used by VideoProcessor before ClipPreprocessor"""
+    images = [Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in frames]
+    return torch.stack([transform(image) for image in images], dim=1).unsqueeze(0)
+
+
+def smooth_clip(width, height):
+    """A clip of smooth, slowly moving colour gradients
+
+    Resize kernels only agree on image content that is smooth at the target size;
+    on per-pixel noise any two kernels differ by most of the value range.
+    """
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    frames = [
+        np.stack([127 + 100 * np.sin(x / width * 6 + i * 0.3),
+                  127 + 100 * np.cos(y / height * 5 - i * 0.2),
+                  255 * x / width], axis=-1)
+        for i in range(SEQUENCE_LENGTH)
+    ]
+    return np.stack(frames).clip(0, 255).astype(np.uint8)
+
+
+def time_per_clip(fn, repeats):
+    fn()  # Warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+class Command(BaseCommand):
+    help = 'Compare per-clip preprocessing time of the legacy PIL path and ClipPreprocessor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeats', type=int, default=20, help='Clips timed per resolution')
+        parser.add_argument('--resolutions', nargs='+', default=['320x240', '640x480', '1280x720', '1920x1080'],
+                            help='Source frame sizes as WIDTHxHEIGHT')
+
+    def handle(self, *args, **options):
+        transform = transforms.Compose([
+            transforms.Resize((IM_SIZE, IM_SIZE)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=MEAN, std=STD)
+        ])
+        preprocessor = ClipPreprocessor(SEQUENCE_LENGTH, IM_SIZE, MEAN, STD)
+
+        self.stdout.write(f"{'resolution':>12} {'legacy ms':>10} {'batched ms':>11} {'speedup':>8} {'max diff':>9}")
+        for resolution in options['resolutions']:
+            width, height = (int(v) for v in resolution.lower().split('x'))
+            clip = smooth_clip(width, height)
+
+            legacy_ms = time_per_clip(lambda: legacy_preprocess(clip, transform), options['repeats'])
+            batched_ms = time_per_clip(lambda: preprocessor(clip), options['repeats'])
+
+            # The two paths use different resize kernels, so expect small differences
+            max_diff = np.abs(legacy_preprocess(clip, transform)[0].numpy() - preprocessor(clip)).max()
+
+            self.stdout.write(
+                f"{resolution:>12} {legacy_ms:>10.2f} {batched_ms:>11.2f} "
+                f"{legacy_ms / batched_ms:>7.1f}x {max_diff:>9.3f}"
+            )
@@ -0,0 +1,69 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+HEAVY_MODULES = ('torch', 'torchvision', 'cv2', 'numpy', 'model')
+
+# Each scenario runs in a fresh interpreter; {urlconf} is filled in from the settings
+SCENARIOS = {
+    # What every manage.py command and web worker pays: the system checks load the URLconf
+    'django_startup': "import django; django.setup(); import {urlconf}",
+    # The first live feed or upload request, and what every startup paid before the imports were lazy
+    'video_stack': "import django; django.setup(); import {urlconf}; import surveillance.utils.setup",
+    # A web server process started with SURVEILLANCE_PRELOAD_MODEL=1
+    'preload_model': ("import django; django.setup(); import {urlconf}; "
+                      "from surveillance.utils.setup import preload_model; preload_model()"),
+}
+
+REPORT = ("import json, sys; print('@@' + json.dumps("
+          "[name for name in {heavy!r} if name in sys.modules]))")
+
+
+class Command(BaseCommand):
+    help = ('Time Django startup in fresh interpreters with and without the video/ML stack '
+            'to show what the lazy imports save')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeats', type=int, default=5, help='Interpreter starts per scenario (median is kept)')
+        parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+        parser.add_argument('--output', help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE,
+                   PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+        env.pop('SURVEILLANCE_PRELOAD_MODEL', None)
+
+        results = {}
+        for name in options['scenarios']:
+            code = SCENARIOS[name].format(urlconf=settings.ROOT_URLCONF) + '; ' + REPORT.format(heavy=HEAVY_MODULES)
+            times = []
+            for _ in range(options['repeats']):
+                start = time.perf_counter()
+                completed = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env,
+                                           capture_output=True, text=True)
+                times.append((time.perf_counter() - start) * 1000)
+                if completed.returncode != 0:
+                    raise CommandError(f"Scenario {name} failed:\n{completed.stderr}")
+
+            loaded = json.loads(completed.stdout.rsplit('@@', 1)[1])
+            results[name] = {'median_ms': statistics.median(times), 'min_ms': min(times), 'heavy_modules': loaded}
+
+        self.stdout.write(f"{'scenario':<16} {'median ms':>10} {'min ms':>10}  heavy modules loaded")
+        for name, result in results.items():
+            self.stdout.write(f"{name:<16} {result['median_ms']:>10.0f} {result['min_ms']:>10.0f}  "
+                              f"{', '.join(result['heavy_modules']) or '-'}")
+
+        if 'django_startup' in results and 'video_stack' in results:
+            saved = results['video_stack']['median_ms'] - results['django_startup']['median_ms']
+            self.stdout.write(self.style.SUCCESS(f"Lazy imports save {saved:.0f} ms per startup "
+                                                 f"that does not touch video"))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
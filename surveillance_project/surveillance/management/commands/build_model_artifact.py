@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...utils.config import VideoProcessorConfig
+from ...utils.model_loader import MODEL_ARCHITECTURES, build_artifact
+
+CLASS_COUNT = 6  # Length of VideoProcessor.class_labels
+
+
+class Command(BaseCommand):
+    help = 'Trace and freeze the SlowFast model into a TorchScript artifact for fast inference startup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-path', default=VideoProcessorConfig.MODEL_PATH)
+        parser.add_argument('--arch', default=VideoProcessorConfig.MODEL_ARCH, choices=MODEL_ARCHITECTURES)
+        parser.add_argument('--output-dir', default=VideoProcessorConfig.MODEL_ARTIFACT_DIR)
+        parser.add_argument('--sequence-length', type=int, default=16)
+        parser.add_argument('--im-size', type=int, default=128)
+        parser.add_argument('--device', default='cpu', help="Device the artifact will run on ('cpu' or 'cuda')")
+        parser.add_argument('--force', action='store_true', help='Rebuild even if a matching artifact exists')
+
+    def handle(self, *args, **options):
+        try:
+            path = build_artifact(
+                options['model_path'], options['arch'], CLASS_COUNT,
+                options['sequence_length'], options['im_size'], options['output_dir'],
+                device=options['device'], force=options['force']
+            )
+        except (OSError, RuntimeError) as e:
+            raise CommandError(f"Failed to build model artifact: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Model artifact ready: {path}"))
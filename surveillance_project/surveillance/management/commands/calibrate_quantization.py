@@ -0,0 +1,71 @@
+import json
+import os
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+
+from ...utils.config import VideoProcessorConfig
+from ...utils.model_loader import MODEL_ARCHITECTURES, artifact_metadata, artifact_path, save_artifact
+from ...utils.quantization import MAX_PROBABILITY_DIFF, QUANTIZATION_MODES, compare_models, quantize_model
+from ...utils.video_processor import VideoProcessor
+from ._clips import load_clips
+
+
+class Command(BaseCommand):
+    help = ('Calibrate an int8 SlowFast on a folder of sample clips, save it as a model artifact '
+            'and report accuracy and latency against the float model')
+
+    def add_arguments(self, parser):
+        parser.add_argument('clips_dir', help='Folder of sample videos; a parent folder named after a '
+                                              'class label (e.g. Robbery/clip.mp4) marks the ground truth')
+        parser.add_argument('--mode', default='static', choices=QUANTIZATION_MODES)
+        parser.add_argument('--model-path', default=VideoProcessorConfig.MODEL_PATH)
+        parser.add_argument('--arch', default=VideoProcessorConfig.MODEL_ARCH, choices=MODEL_ARCHITECTURES)
+        parser.add_argument('--output-dir', default=VideoProcessorConfig.MODEL_ARTIFACT_DIR)
+        parser.add_argument('--max-clips', type=int, default=256, help='Maximum 16-frame windows to use')
+        parser.add_argument('--batch-size', type=int, default=4)
+        parser.add_argument('--report', help='Write the comparison report to this JSON file')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['model_path']):
+            raise CommandError(f"Model weights not found: {options['model_path']}")
+
+        # Float eager model on CPU, the reference for the comparison; a private copy since it is moved
+        processor = VideoProcessor(model_path=options['model_path'], model_arch=options['arch'],
+                                   shared_model=False)
+        processor.device = torch.device('cpu')
+        float_model = processor.model.cpu()
+
+        batches, labels = load_clips(processor, options['clips_dir'], options['max_clips'],
+                                     options['batch_size'], self.stderr)
+        if not batches:
+            raise CommandError(f"No readable video clips found in {options['clips_dir']}")
+        self.stdout.write(f"Calibrating {options['mode']} int8 model on {sum(len(b) for b in batches)} clips")
+
+        quantized_model = quantize_model(float_model, options['mode'], batches)
+        report = compare_models(float_model, quantized_model, batches, labels)
+        report.update(mode=options['mode'], model_arch=options['arch'], model_path=options['model_path'])
+
+        path = artifact_path(options['output_dir'], options['model_path'], options['arch'],
+                             processor.sequence_length, processor.im_size, 'cpu', options['mode'])
+        metadata = artifact_metadata(float_model, options['model_path'], options['arch'],
+                                     len(processor.class_labels), processor.sequence_length,
+                                     processor.im_size, options['mode'])
+        save_artifact(quantized_model, path, batches[0], metadata)
+        report['artifact'] = path
+
+        for key, value in report.items():
+            self.stdout.write(f"{key:>22}: {value:.4f}" if isinstance(value, float) else f"{key:>22}: {value}")
+
+        tolerance = MAX_PROBABILITY_DIFF[options['mode']]
+        if report['max_probability_diff'] > tolerance:
+            self.stdout.write(self.style.WARNING(
+                f"Probabilities moved by up to {report['max_probability_diff']:.4f}, more than the "
+                f"{tolerance} expected for {options['mode']} quantization; check the calibration clips"
+            ))
+
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f"Quantized model artifact saved: {path}"))
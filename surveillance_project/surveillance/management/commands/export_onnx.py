@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...utils.config import VideoProcessorConfig
+from ...utils.inference_backends import export_onnx
+from ...utils.model_loader import MODEL_ARCHITECTURES, artifact_path, build_eager_model
+
+CLASS_COUNT = 6  # Length of VideoProcessor.class_labels
+
+
+class Command(BaseCommand):
+    help = 'Export the SlowFast model to ONNX for the onnxruntime inference backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-path', default=VideoProcessorConfig.MODEL_PATH)
+        parser.add_argument('--arch', default=VideoProcessorConfig.MODEL_ARCH, choices=MODEL_ARCHITECTURES)
+        parser.add_argument('--output-dir', default=VideoProcessorConfig.MODEL_ARTIFACT_DIR)
+        parser.add_argument('--sequence-length', type=int, default=16)
+        parser.add_argument('--im-size', type=int, default=128)
+        parser.add_argument('--opset', type=int, default=17)
+
+    def handle(self, *args, **options):
+        try:
+            model = build_eager_model(options['model_path'], options['arch'], CLASS_COUNT, 'cpu')
+            path = artifact_path(options['output_dir'], options['model_path'], options['arch'],
+                                 options['sequence_length'], options['im_size'], 'cpu', extension='.onnx')
+            export_onnx(model, path, options['sequence_length'], options['im_size'], options['opset'])
+        except (OSError, RuntimeError) as e:
+            raise CommandError(f"Failed to export ONNX model: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"ONNX model exported: {path}"))
@@ -0,0 +1,136 @@
+import os
+import socket
+import time
+from datetime import timedelta
+
+import cv2
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from ...models import AnalysisJob
+from ...utils.fileUploadHandler import VideoFileHandler, process_uploaded_video
+from ...utils.result_cache import analysis_cache_key, cached_alerts_exist
+from ...utils.setup import initialize_video_processor
+
+
+class Command(BaseCommand):
+    help = ('Process queued video analysis jobs from uploads; run one or more of these '
+            'next to the web server')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Recorded on claimed jobs, so progress writes only touch this worker's own job
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds between queue checks when idle')
+        parser.add_argument('--progress-interval', type=float, default=1.0,
+                            help='Seconds between progress updates written to the job')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--requeue-running', action='store_true',
+                            help='First put running jobs whose worker stopped making progress back in the queue')
+        parser.add_argument('--stale-after', type=float, default=600.0,
+                            help='Seconds without progress after which --requeue-running treats a job as abandoned')
+
+    def handle(self, *args, **options):
+        if options['requeue_running']:
+            count = self.requeue_stale_jobs(options['stale_after'])
+            self.stdout.write(f"Requeued {count} running job(s)")
+
+        # One processor for every job; the model stays loaded between jobs
+        processor = initialize_video_processor()
+        if processor.backend is None:
+            raise CommandError("No model could be loaded; check VideoProcessorConfig.MODEL_PATH")
+        self.result_cache = VideoFileHandler().result_cache
+        self.stdout.write("Analysis worker ready")
+
+        while True:
+            close_old_connections()
+            job = self.claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            self.run_job(processor, job, options['progress_interval'])
+
+    def requeue_stale_jobs(self, stale_after):
+        """Put running jobs whose worker stopped reporting progress back in the queue
+
+        Jobs still making progress belong to live workers and are left alone.
+        """
+        cutoff = timezone.now() - timedelta(seconds=stale_after)
+        stale = AnalysisJob.objects.filter(
+            Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff), status='running'
+        )
+        return stale.update(status='queued', started_at=None, frames_processed=0, worker='', heartbeat_at=None)
+
+    def claim_next_job(self):
+        """Mark the oldest queued job as running and return it; None when the queue is empty
+
+        The conditional update means only one of several workers can claim a job.
+        """
+        queued = AnalysisJob.objects.filter(status='queued').order_by('created_at').values_list('id', flat=True)
+        for job_id in queued[:10]:
+            now = timezone.now()
+            claimed = AnalysisJob.objects.filter(id=job_id, status='queued').update(
+                status='running', started_at=now, heartbeat_at=now, worker=self.worker_id
+            )
+            if claimed:
+                return AnalysisJob.objects.get(id=job_id)
+        return None
+
+    def run_job(self, processor, job, progress_interval):
+        self.stdout.write(f"Analysing job {job.id}: {job.original_name or job.video_path}")
+
+        # An identical upload may have been analysed since this job was queued
+        cache_key = analysis_cache_key(job.content_hash, job.user_id) if job.content_hash else None
+        cached = self.result_cache.get(cache_key, validate=cached_alerts_exist) if cache_key else None
+        if cached is not None:
+            job.status = 'completed'
+            job.results = cached['results']
+            job.frames_total = job.frames_processed = cached['frames_total']
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'results', 'frames_total', 'frames_processed', 'finished_at'])
+            self.stdout.write(self.style.SUCCESS(f"Job {job.id} completed from the result cache"))
+            return
+
+        video = cv2.VideoCapture(job.video_path)
+        job.frames_total = max(0, int(video.get(cv2.CAP_PROP_FRAME_COUNT)))
+        video.release()
+        AnalysisJob.objects.filter(id=job.id).update(frames_total=job.frames_total)
+
+        last_update = time.monotonic()
+
+        def progress(frame_number):
+            nonlocal last_update
+            job.frames_processed = frame_number
+            now = time.monotonic()
+            if now - last_update >= progress_interval:
+                # Also the heartbeat that keeps --requeue-running away from this job
+                AnalysisJob.objects.filter(id=job.id, worker=self.worker_id).update(
+                    frames_processed=frame_number, heartbeat_at=timezone.now()
+                )
+                last_update = now
+
+        report = {}
+        try:
+            results = process_uploaded_video(job.video_path, processor, progress=progress, raise_errors=True,
+                                             report=report)
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            self.stderr.write(f"Job {job.id} failed: {e}")
+        else:
+            job.status = 'completed'
+            job.results = results
+            job.frames_processed = max(job.frames_processed, job.frames_total)
+            # A result missing alerts that failed to save must not be served to the next upload
+            if cache_key and report.get('alerts') == report.get('candidates'):
+                self.result_cache.put(cache_key, {'results': results, 'frames_total': job.frames_total})
+            self.stdout.write(self.style.SUCCESS(f"Job {job.id} completed with {len(results)} alert(s)"))
+
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'results', 'frames_total', 'frames_processed', 'finished_at'])
@@ -0,0 +1,138 @@
+import json
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from django.core.management.base import BaseCommand, CommandError
+
+from ...utils.config import VideoProcessorConfig
+from ...utils.model_loader import MODEL_ARCHITECTURES, build_eager_model, import_model_module, screener_path
+from ...utils.video_processor import VideoProcessor
+from ._clips import load_clips
+
+
+class Command(BaseCommand):
+    help = ('Train the fast-pathway screener head used by the SlowFast cascade (CASCADE_THRESHOLD) '
+            'on a folder of sample clips and report its recall and speed against the full model')
+
+    def add_arguments(self, parser):
+        parser.add_argument('clips_dir', help='Folder of sample videos; a parent folder named after a '
+                                              'class label marks the ground truth, other clips are '
+                                              'labelled with the full model\'s prediction')
+        parser.add_argument('--model-path', default=VideoProcessorConfig.MODEL_PATH)
+        parser.add_argument('--arch', default=VideoProcessorConfig.MODEL_ARCH, choices=MODEL_ARCHITECTURES)
+        parser.add_argument('--output-dir', default=VideoProcessorConfig.MODEL_ARTIFACT_DIR)
+        parser.add_argument('--max-clips', type=int, default=1024, help='Maximum 16-frame windows to use')
+        parser.add_argument('--batch-size', type=int, default=8)
+        parser.add_argument('--epochs', type=int, default=200)
+        parser.add_argument('--lr', type=float, default=1e-2)
+        parser.add_argument('--holdout', type=float, default=0.2, help='Fraction of clips kept for the report')
+        parser.add_argument('--threshold', type=float, default=VideoProcessorConfig.CASCADE_THRESHOLD or 0.5,
+                            help='Cascade threshold to evaluate')
+        parser.add_argument('--report', help='Write the evaluation report to this JSON file')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['model_path']):
+            raise CommandError(f"Model weights not found: {options['model_path']}")
+
+        # Only used for decoding and preprocessing; the model is built directly below
+        processor = VideoProcessor(model_arch=options['arch'])
+        num_classes = len(processor.class_labels)
+        normal_index = processor.class_labels.index('normal')
+
+        batches, labels = load_clips(processor, options['clips_dir'], options['max_clips'],
+                                     options['batch_size'], self.stderr)
+        if not batches:
+            raise CommandError(f"No readable video clips found in {options['clips_dir']}")
+
+        model_module = import_model_module()
+        model = build_eager_model(options['model_path'], options['arch'], num_classes, 'cpu', optimize=True)
+
+        # The backbone is frozen, so fast pathway features and full-model predictions are computed once
+        features, teacher = [], []
+        with torch.no_grad():
+            for batch in batches:
+                fast, _ = model.FastPath(model.prepare_input(batch)[:, :, ::model.fast_stride])
+                features.append(fast)
+                teacher.append(model(batch).argmax(dim=1))
+        features, teacher = torch.cat(features), torch.cat(teacher)
+
+        labels = torch.tensor(labels)
+        targets = torch.where(labels >= 0, labels, teacher)
+        self.stdout.write(f"Training screener on {len(targets)} clips "
+                          f"({int((labels >= 0).sum())} labelled by folder, the rest by the full model)")
+
+        order = torch.randperm(len(targets), generator=torch.Generator().manual_seed(0))
+        holdout = int(len(order) * options['holdout'])
+        train_idx, eval_idx = order[holdout:], order[:holdout]
+        if holdout == 0:
+            eval_idx = order
+
+        head = model_module.screener_head(model, num_classes)
+        optimizer = torch.optim.Adam(head.parameters(), lr=options['lr'], weight_decay=1e-4)
+        train_features, train_targets = features[train_idx], targets[train_idx]
+        for _ in range(options['epochs']):
+            optimizer.zero_grad()
+            loss = F.cross_entropy(head(train_features), train_targets)
+            loss.backward()
+            optimizer.step()
+        head.eval().requires_grad_(False)
+
+        cascade = model_module.ScreenedSlowFast(model, head, normal_index, options['threshold']).eval()
+        eval_clips = torch.cat(batches)[eval_idx]
+        report = self.evaluate(model, cascade, eval_clips, targets[eval_idx], normal_index, options['batch_size'])
+        report.update(train_clips=len(train_idx), final_loss=loss.item(), threshold=options['threshold'])
+
+        path = screener_path(options['output_dir'], options['model_path'], options['arch'])
+        os.makedirs(options['output_dir'], exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        torch.save(head.state_dict(), tmp_path)
+        os.replace(tmp_path, path)
+        report['screener'] = path
+
+        for key, value in report.items():
+            self.stdout.write(f"{key:>24}: {value:.4f}" if isinstance(value, float) else f"{key:>24}: {value}")
+
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f"Screener head saved: {path}"))
+
+    def evaluate(self, model, cascade, clips, targets, normal_index, batch_size):
+        """Compare the full model and the cascade on held-out clips"""
+        full_predictions, cascade_predictions = [], []
+        full_seconds = cascade_seconds = 0.0
+
+        with torch.inference_mode():
+            for start in range(0, len(clips), batch_size):
+                batch = clips[start:start + batch_size]
+
+                begin = time.perf_counter()
+                full_predictions.append(model(batch).argmax(dim=1))
+                full_seconds += time.perf_counter() - begin
+
+                begin = time.perf_counter()
+                cascade_predictions.append(cascade(batch).argmax(dim=1))
+                cascade_seconds += time.perf_counter() - begin
+
+        full_predictions = torch.cat(full_predictions).numpy()
+        cascade_predictions = torch.cat(cascade_predictions).numpy()
+        targets = targets.numpy()
+        threats = targets != normal_index
+
+        def recall(predictions):
+            return float(np.mean(predictions[threats] == targets[threats])) if threats.any() else None
+
+        return {
+            'eval_clips': len(targets),
+            'threat_clips': int(threats.sum()),
+            'escalation_rate': cascade.escalated / cascade.screened if cascade.screened else 0.0,
+            'full_threat_recall': recall(full_predictions),
+            'cascade_threat_recall': recall(cascade_predictions),
+            'cascade_agreement': float(np.mean(full_predictions == cascade_predictions)),
+            'full_ms_per_clip': full_seconds / len(targets) * 1000,
+            'cascade_ms_per_clip': cascade_seconds / len(targets) * 1000,
+        }
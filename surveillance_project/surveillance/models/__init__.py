@@ -1,2 +1,3 @@
 from .camera import Camera
 from .alert import Alert
+from .analysis_job import AnalysisJob
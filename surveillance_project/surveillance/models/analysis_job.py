@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User
+from django.db import models
+from django.utils import timezone
+
+
+class AnalysisJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    video_path = models.CharField(max_length=500)
+    original_name = models.CharField(max_length=255, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # SHA-256 of the uploaded file
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True)
+    frames_total = models.IntegerField(default=0)
+    frames_processed = models.IntegerField(default=0)
+    results = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)  # host:pid of the worker running the job
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Refreshed while the worker makes progress
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.original_name or self.video_path} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+
+    def eta_seconds(self):
+        """Estimated seconds until a running job finishes, from its frame rate so far"""
+        if self.status != 'running' or not self.started_at or not self.frames_processed or not self.frames_total:
+            return None
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        remaining = max(0, self.frames_total - self.frames_processed)
+        return elapsed / self.frames_processed * remaining
+
+    def progress(self):
+        """Job state for the progress endpoint"""
+        percent = 100.0 if self.status == 'completed' else (
+            min(100.0, self.frames_processed / self.frames_total * 100) if self.frames_total else 0.0
+        )
+        return {
+            'id': self.id,
+            'status': self.status,
+            'frames_processed': self.frames_processed,
+            'frames_total': self.frames_total,
+            'percent': percent,
+            'eta_seconds': self.eta_seconds(),
+            'error': self.error,
+        }
@@ -1,3 +1,1191 @@
-from django.test import TestCase
+import importlib.util
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+import cv2
+import numpy as np
+import torch
+from torchvision import transforms
+
+from .apps import preload_model_if_enabled
+from .management.commands.benchmark_preprocessing import legacy_preprocess, smooth_clip
+from .management.commands.run_analysis_worker import Command as AnalysisWorkerCommand
+from .models import Alert, AnalysisJob, Camera
+from .utils.config import VideoProcessorConfig
+from .utils.ffmpeg_reader import FFmpegFrameReader
+from .utils.file_analysis import pipelined_analysis, plan_chunks
+from .utils.fileUploadHandler import process_uploaded_video
+from .utils.frame_buffer import FrameRingBuffer
+from .utils.inference_backends import OnnxRuntimeBackend, export_onnx, load_backend
+from .utils.inference_pool import InferencePool
+from .utils.inference_scheduler import InferenceScheduler, _PendingClip
+from .utils.load_governor import DEGRADATION_STEPS, LoadGovernor
+from .utils.metrics import FRAMES, FRAMES_DROPPED, metrics
+from .utils.model_loader import (artifact_path, build_artifact, build_eager_model, import_model_module, load_model,
+                                 weights_hash)
+from .utils.model_registry import ModelRegistry, SharedModel
+from .utils.motion_gate import MotionGate
+from .utils.preprocessing import ClipPreprocessor
+from .utils.processor_settings import ProcessorSettings
+from .utils.quantization import MAX_PROBABILITY_DIFF, compare_models, quantize_model
+from .utils.result_cache import ResultCache, analysis_cache_key, cached_alerts_exist
+from .utils.video_processor import VideoProcessor
+
+
+class OptimizeForInferenceTests(SimpleTestCase):
+    """optimize_for_inference must match the eager SlowFast numerically"""
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model_module = import_model_module()
+        self.model = self.model_module.resnet50(class_num=6)
+        # Non-trivial BatchNorm statistics so the folding actually changes the weights
+        for module in self.model.modules():
+            if isinstance(module, torch.nn.BatchNorm3d):
+                module.running_mean.uniform_(-0.5, 0.5)
+                module.running_var.uniform_(0.5, 2.0)
+                module.weight.data.uniform_(0.5, 1.5)
+                module.bias.data.uniform_(-0.5, 0.5)
+        self.model.eval()
+        self.clips = torch.randn(2, 3, 16, 64, 64)
+
+    def assert_parity(self, optimized, clips):
+        with torch.no_grad():
+            expected = self.model(clips)
+        with torch.inference_mode():
+            actual = optimized(clips)
+        self.assertEqual(actual.shape, expected.shape)
+        torch.testing.assert_close(actual, expected, rtol=1e-4, atol=1e-4)
+
+    def test_folded_channels_last_matches_eager(self):
+        self.assert_parity(self.model_module.optimize_for_inference(self.model), self.clips)
+
+    def test_folded_contiguous_matches_eager(self):
+        optimized = self.model_module.optimize_for_inference(self.model, channels_last=False)
+        self.assert_parity(optimized, self.clips)
+
+    def test_batch_norm_is_removed(self):
+        optimized = self.model_module.optimize_for_inference(self.model)
+        self.assertFalse(any(isinstance(m, torch.nn.BatchNorm3d) for m in optimized.modules()))
+        self.assertFalse(any(p.requires_grad for p in optimized.parameters()))
+
+    def test_eager_model_is_left_untouched(self):
+        self.model_module.optimize_for_inference(self.model)
+        self.assertTrue(any(isinstance(m, torch.nn.BatchNorm3d) for m in self.model.modules()))
+
+    def test_single_clip_batch(self):
+        self.assert_parity(self.model_module.optimize_for_inference(self.model), self.clips[:1])
+
+    def test_downsample_basic_block_pads_channels(self):
+        x = torch.randn(2, 4, 4, 6, 6)
+        out = self.model_module.downsample_basic_block(x, planes=10, stride=2)
+        self.assertEqual(tuple(out.shape), (2, 10, 2, 3, 3))
+        torch.testing.assert_close(out[:, :4], x[:, :, ::2, ::2, ::2])
+        self.assertTrue(torch.all(out[:, 4:] == 0))
+
+
+class ModelArtifactTests(SimpleTestCase):
+    """A scripted artifact is found by its weights hash and matches the eager model"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.artifact_dir = os.path.join(self.directory, 'artifacts')
+        self.model_path = save_random_model(self.directory)
+        self.shape = dict(num_classes=6, device='cpu', sequence_length=16, im_size=32)
+        self.clips = torch.randn(2, 3, 16, 32, 32)
+
+    def load(self):
+        return load_model(self.model_path, 'resnet50', artifact_dir=self.artifact_dir, **self.shape)
+
+    def assert_matches_eager(self, model):
+        eager = build_eager_model(self.model_path, 'resnet50', 6, 'cpu')
+        with torch.no_grad():
+            torch.testing.assert_close(model(self.clips), eager(self.clips), rtol=1e-4, atol=1e-4)
+
+    def test_artifact_matches_eager_model(self):
+        path = build_artifact(self.model_path, 'resnet50', 6, 16, 32, self.artifact_dir)
+        self.assertIn(weights_hash(self.model_path)[:16], os.path.basename(path))
+
+        model, info = self.load()
+        self.assertEqual((info['source'], info['path']), ('artifact', path))
+        self.assertEqual((info['fast_stride'], info['slow_stride']), (2, 16))
+        self.assert_matches_eager(model)
+
+    def test_changed_weights_force_a_rebuild(self):
+        old_path = build_artifact(self.model_path, 'resnet50', 6, 16, 32, self.artifact_dir)
+        self.assertEqual(build_artifact(self.model_path, 'resnet50', 6, 16, 32, self.artifact_dir), old_path)
+
+        torch.manual_seed(1)
+        torch.save(import_model_module().resnet50(class_num=6).state_dict(), self.model_path)
+        stat = os.stat(self.model_path)
+        os.utime(self.model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))  # Same size; make the change visible
+
+        # The stale artifact is no longer picked up for the new weights
+        model, info = self.load()
+        self.assertEqual(info['source'], 'eager')
+
+        new_path = build_artifact(self.model_path, 'resnet50', 6, 16, 32, self.artifact_dir)
+        self.assertNotEqual(new_path, old_path)
+        model, info = self.load()
+        self.assertEqual(info['path'], new_path)
+        self.assert_matches_eager(model)
+
+
+@skipUnless(importlib.util.find_spec('onnxruntime'), 'onnxruntime is not installed')
+class OnnxRuntimeBackendTests(SimpleTestCase):
+    """The ONNX Runtime backend must give the torch backend's probabilities"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.model_path = save_random_model(directory)
+        self.artifact_dir = os.path.join(directory, 'artifacts')
+        model = build_eager_model(self.model_path, 'resnet50', 6, 'cpu')
+        export_onnx(model, artifact_path(self.artifact_dir, self.model_path, 'resnet50', 16, 32, 'cpu',
+                                         extension='.onnx'), 16, 32)
+
+    def test_onnx_matches_torch(self):
+        load_kwargs = dict(model_path=self.model_path, model_arch='resnet50', num_classes=6, device='cpu',
+                           sequence_length=16, im_size=32, artifact_dir=self.artifact_dir)
+        torch_backend, _, _ = load_backend(**load_kwargs)
+        onnx_backend, model, info = load_backend(inference_backend='onnxruntime', **load_kwargs)
+        self.assertIsInstance(onnx_backend, OnnxRuntimeBackend)
+        self.assertEqual((info['source'], model), ('onnx', None))
+
+        # Batch sizes other than the exported example's, as arrays and as tensors
+        clips = np.random.default_rng(0).standard_normal((3, 3, 16, 32, 32)).astype(np.float32)
+        expected = torch_backend.predict(clips)
+        np.testing.assert_allclose(onnx_backend.predict(clips), expected, rtol=1e-4, atol=1e-5)
+        np.testing.assert_allclose(onnx_backend.predict(torch.from_numpy(clips[:1])), expected[:1],
+                                   rtol=1e-4, atol=1e-5)
+
+
+class ProcessorSettingsTests(SimpleTestCase):
+    """VideoProcessor options live in one ProcessorSettings, which chunk workers rebuild from"""
+
+    def test_options_override_settings(self):
+        settings = ProcessorSettings(batch_size=4, motion_threshold=0.01)
+        processor = VideoProcessor(settings=settings, batch_size=2, camera_id='lobby')
+        self.assertEqual((processor.batch_size, processor.settings.motion_threshold), (2, 0.01))
+        self.assertEqual(settings.batch_size, 4)  # The caller's settings are left alone
+        self.assertIsNotNone(processor.motion_gate)
+
+    def test_unknown_option_is_rejected(self):
+        with self.assertRaisesRegex(TypeError, 'batch_sise'):
+            VideoProcessor(batch_sise=2)
+
+    def test_file_analysis_settings_drop_live_state(self):
+        settings = ProcessorSettings.from_config('lobby', governor=LoadGovernor())
+        worker_settings = pickle.loads(pickle.dumps(settings.for_file_analysis()))
+        self.assertEqual((worker_settings.model_path, worker_settings.batch_size),
+                         (VideoProcessorConfig.MODEL_PATH, VideoProcessorConfig.BATCH_SIZE))
+        self.assertIsNone(worker_settings.governor)
+        self.assertIsNone(worker_settings.scheduler_batch)
+        self.assertIsNone(worker_settings.motion_threshold)
+        self.assertEqual(worker_settings.inference_workers, 0)
+
+
+class QuantizationTests(SimpleTestCase):
+    """Quantized models stay within the documented probability tolerance of the float model"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        torch.manual_seed(0)
+        cls.model = import_model_module().resnet50(class_num=6).eval()
+        cls.batches = [torch.randn(2, 3, 16, 32, 32) for _ in range(3)]
+
+    def assert_within_tolerance(self, mode, calibration_batches=None):
+        quantized = quantize_model(self.model, mode, calibration_batches)
+        report = compare_models(self.model, quantized, self.batches)
+        self.assertEqual(report['clips'], 6)
+        self.assertLessEqual(report['max_probability_diff'], MAX_PROBABILITY_DIFF[mode])
+        return quantized
+
+    def test_dynamic_quantization(self):
+        quantized = self.assert_within_tolerance('dynamic')
+        self.assertIsInstance(quantized.fc, torch.ao.nn.quantized.dynamic.Linear)
+        self.assertIsInstance(self.model.fc, torch.nn.Linear)  # The float model is left alone
+
+    def test_static_quantization(self):
+        self.assert_within_tolerance('static', self.batches[:2])
+
+    def test_static_quantization_needs_calibration_clips(self):
+        with self.assertRaisesRegex(ValueError, 'calibration batch'):
+            quantize_model(self.model, 'static')
+        with self.assertRaisesRegex(ValueError, 'Unknown quantization mode'):
+            quantize_model(self.model, 'int4')
+
+
+class ScreenedSlowFastTests(SimpleTestCase):
+    """The cascade must reproduce SlowFast for escalated clips and the screener for the rest"""
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model_module = import_model_module()
+        self.model = self.model_module.resnet50(class_num=6).eval()
+        self.head = self.model_module.screener_head(self.model, 6).eval()
+        self.clips = torch.randn(3, 3, 16, 64, 64)
+
+    def cascade(self, threshold):
+        return self.model_module.ScreenedSlowFast(self.model, self.head, normal_index=3, threshold=threshold)
+
+    def test_escalating_every_clip_matches_full_model(self):
+        cascade = self.cascade(threshold=-1.0)
+        with torch.no_grad():
+            torch.testing.assert_close(cascade(self.clips), self.model(self.clips), rtol=1e-4, atol=1e-4)
+        self.assertEqual(cascade.escalated, 3)
+
+    def test_unescalated_clips_keep_screener_logits(self):
+        cascade = self.cascade(threshold=1.0)
+        with torch.no_grad():
+            fast, _ = self.model.FastPath(self.clips[:, :, ::2])
+            torch.testing.assert_close(cascade(self.clips), self.head(fast))
+        self.assertEqual(cascade.escalated, 0)
+        self.assertEqual(cascade.screened, 3)
+
+    def test_mixed_batch_escalates_only_suspicious_clips(self):
+        with torch.no_grad():
+            fast, _ = self.model.FastPath(self.clips[:, :, ::2])
+            suspicious = 1 - torch.softmax(self.head(fast), dim=1)[:, 3]
+            threshold = float(suspicious.median())
+            cascade = self.cascade(threshold)
+            logits = cascade(self.clips)
+            full = self.model(self.clips)
+
+        escalated = suspicious > threshold
+        torch.testing.assert_close(logits[escalated], full[escalated], rtol=1e-4, atol=1e-4)
+        self.assertEqual(cascade.escalated, int(escalated.sum()))
+
+
+class StreamingSlowFastTests(SimpleTestCase):
+    """Cached-stem streaming inference must match full windows exactly"""
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model_module = import_model_module()
+        self.model = self.model_module.resnet50(class_num=6).eval()
+        self.video = torch.randn(1, 3, 40, 64, 64)
+
+    def assert_stream_matches(self, model, hop):
+        streaming = self.model_module.StreamingSlowFast(model)
+        with torch.inference_mode():
+            for start in range(0, self.video.size(2) - 16 + 1, hop):
+                clip = self.video[:, :, start:start + 16]
+                torch.testing.assert_close(streaming(clip, start), model(clip), rtol=1e-4, atol=1e-4)
+        return streaming
+
+    def test_overlapping_windows_reuse_cached_frames(self):
+        streaming = self.assert_stream_matches(self.model, hop=4)
+        self.assertGreater(streaming.reused_frames, streaming.computed_frames)
+
+    def test_optimized_model(self):
+        self.assert_stream_matches(self.model_module.optimize_for_inference(self.model), hop=2)
+
+    def test_non_overlapping_windows(self):
+        streaming = self.assert_stream_matches(self.model, hop=16)
+        self.assertEqual(streaming.reused_frames, 0)
+
+    def test_reset_forgets_frames(self):
+        streaming = self.assert_stream_matches(self.model, hop=8)
+        streaming.reset()
+        with torch.inference_mode():
+            clip = torch.randn(1, 3, 16, 64, 64)
+            torch.testing.assert_close(streaming(clip, 0), self.model(clip), rtol=1e-4, atol=1e-4)
+
+
+class InferencePoolTests(SimpleTestCase):
+    """A killed worker is restarted with backoff, and given up on after repeated failures"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        torch.manual_seed(0)
+        model = import_model_module().resnet50(class_num=6).eval()
+        model_path = os.path.join(directory, 'weights.pt')
+        torch.save(model.state_dict(), model_path)
+        self.clips = np.random.default_rng(0).standard_normal((3, 3, 16, 32, 32)).astype(np.float32)
+        with torch.no_grad():
+            self.expected = torch.softmax(model(torch.from_numpy(self.clips)), dim=1).numpy()
+
+        load_kwargs = dict(model_path=model_path, model_arch='resnet50', num_classes=6,
+                           sequence_length=16, im_size=32)
+        self.pool = InferencePool(load_kwargs, self.clips.shape[1:], workers=1, max_batch=2, startup_timeout=120)
+        self.addCleanup(self.pool.close)
+
+    def test_predict_after_worker_is_killed(self):
+        np.testing.assert_allclose(self.pool.predict(self.clips), self.expected, rtol=1e-4, atol=1e-5)
+
+        worker = self.pool._workers[0]
+        old_pid = worker.process.pid
+        worker.process.kill()
+        # While the supervisor is restarting the worker, predict waits for it instead of reading the handshake
+        deadline = time.monotonic() + 120
+        while worker.process.pid == old_pid and time.monotonic() < deadline:
+            time.sleep(0.05)
+        np.testing.assert_allclose(self.pool.predict(self.clips), self.expected, rtol=1e-4, atol=1e-5)
+        self.assertNotEqual(worker.process.pid, old_pid)
+        self.assertTrue(worker.process.is_alive())
+
+    def test_crash_is_reported_when_the_restart_fails(self):
+        worker = self.pool._workers[0]
+        with mock.patch.object(self.pool, '_start', side_effect=RuntimeError("no model")):
+            worker.process.kill()
+            worker.process.join()
+            with self.assertRaisesRegex(RuntimeError, 'crashed'):
+                self.pool._predict_chunk(self.clips[:1])
+
+    def test_worker_that_keeps_failing_is_given_up(self):
+        self.pool.max_restarts, self.pool.restart_backoff = 2, 0.01
+        worker = self.pool._workers[0]
+        with mock.patch.object(self.pool, '_start', side_effect=RuntimeError("no model")) as start:
+            worker.process.kill()
+            deadline = time.monotonic() + 30
+            while not worker.failed and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertTrue(worker.failed)
+            self.assertEqual(start.call_count, 2)
+
+        # With no healthy worker left, predict fails instead of waiting for one
+        with self.assertRaisesRegex(RuntimeError, 'All inference workers failed'):
+            self.pool.predict(self.clips)
+
+
+class FakeFrameReader:
+    """Stands in for FFmpegFrameReader: `frames` frames, each filled with its 0-based index"""
+
+    frames = 40
+
+    def __init__(self, source, width, height, ffmpeg='ffmpeg', start_seconds=0.0, **kwargs):
+        self.next_frame = 0
+
+    def read(self, out=None):
+        if self.next_frame >= self.frames:
+            return None
+        out[...] = self.next_frame
+        self.next_frame += 1
+        return out
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class FFmpegWindowTests(SimpleTestCase):
+    """Windows read from the ffmpeg pipe overlap by one frame and are never overwritten"""
+
+    def setUp(self):
+        self.processor = VideoProcessor(ffmpeg_binary='ffmpeg')
+        patcher = mock.patch('surveillance.utils.video_processor.FFmpegFrameReader', FakeFrameReader)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_windows_overlap_by_one_frame(self):
+        windows = list(self.processor.iter_windows('video.mp4'))
+
+        # 40 frames: two full windows (frames 0-15, 15-30) and a short one (30-39)
+        self.assertEqual([frame_number for _, frame_number in windows], [16, 31, 40])
+        self.assertEqual([list(frames[:, 0, 0, 0]) for frames, _ in windows],
+                         [list(range(0, 16)), list(range(15, 31)), list(range(30, 40))])
+        self.assertEqual(windows[0][0].shape, (16, 128, 128, 3))
+
+    def test_window_count_stops_early(self):
+        windows = list(self.processor.iter_windows('video.mp4', window_count=1))
+        self.assertEqual([frame_number for _, frame_number in windows], [16])
+
+
+@skipUnless(shutil.which('ffmpeg'), 'ffmpeg is not installed')
+class FFmpegFrameReaderTests(SimpleTestCase):
+    """Frames come out scaled and in order, with full-resolution snapshots on the side"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.video_path = os.path.join(directory, 'video.avi')
+        writer = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+        for i in range(20):
+            writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+        writer.release()
+
+    def test_reads_scaled_frames_and_snapshots(self):
+        with FFmpegFrameReader(self.video_path, 32, 32, snapshot_fps=10) as reader:
+            levels = []
+            while (frame := reader.read()) is not None:
+                self.assertEqual(frame.shape, (32, 32, 3))
+                levels.append(int(frame.mean()))
+            reader._snapshot_thread.join(timeout=5)
+            snapshot = cv2.imdecode(np.frombuffer(reader.snapshot(), dtype=np.uint8), cv2.IMREAD_COLOR)
+
+        self.assertEqual(len(levels), 20)
+        self.assertEqual(levels, sorted(levels))
+        self.assertEqual(snapshot.shape, (48, 64, 3))
+
+    def test_missing_file_raises(self):
+        with self.assertRaises(ValueError):
+            FFmpegFrameReader('missing.mp4', 32, 32).read()
+
+
+class LoadGovernorTests(SimpleTestCase):
+    """Pressure rises under load, falls when load goes away, and degrades low priorities first"""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('surveillance.utils.load_governor.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.governor = LoadGovernor(target_latency_ms=100, interval=1.0)
+
+    def record_each_interval(self, latency, count):
+        for _ in range(count):
+            self.now += 1.0
+            self.governor.record(latency)
+
+    def test_pressure_rises_with_latency_and_recovers(self):
+        self.record_each_interval(latency=1.0, count=20)
+        self.assertEqual(self.governor.pressure, self.governor.max_pressure)
+
+        self.record_each_interval(latency=0.0, count=20)
+        self.assertEqual(self.governor.pressure, 0)
+
+    def test_pressure_decays_without_samples(self):
+        self.record_each_interval(latency=1.0, count=3)
+        self.assertEqual(self.governor.pressure, 3)
+
+        # A gap shorter than the idle timeout keeps the level; a fully degraded camera samples that rarely
+        self.now += 4.0
+        self.assertEqual(self.governor.level(), 3)
+        self.now += 2.0
+        self.assertEqual(self.governor.level(), 1)
+        self.now += 10.0
+        self.assertEqual(self.governor.degradation(), DEGRADATION_STEPS[0])
+
+    def test_low_priority_cameras_degrade_first(self):
+        self.record_each_interval(latency=1.0, count=3)
+        self.assertEqual(self.governor.degradation(priority=0), DEGRADATION_STEPS[3])
+        self.assertEqual(self.governor.degradation(priority=2), DEGRADATION_STEPS[1])
+        self.assertEqual(self.governor.degradation(priority=5), DEGRADATION_STEPS[0])
+
+    def test_latency_is_scraped(self):
+        self.record_each_interval(latency=60.0, count=20)  # Far above any other live governor
+        samples = dict(line.split() for line in metrics.render().splitlines() if not line.startswith('#'))
+        self.assertAlmostEqual(float(samples['surveillance_load_latency_seconds']),
+                               self.governor.stats()['latency_ms'] / 1000, places=3)
+        self.assertIn('surveillance_load_target_latency_seconds', samples)
+
+
+class LiveFrameCountTests(SimpleTestCase):
+    """Live frames are counted once, where they are captured, and drops are a subset of them"""
+
+    def test_load_shedding_drops_are_counted_frames(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        video_path = os.path.join(directory, 'stream.avi')
+        write_test_video(video_path, 40)
+
+        governor = LoadGovernor()
+        governor.pressure = 2  # Analyse every second frame
+        processor = VideoProcessor(camera_id='frame-count-test', governor=governor)
+        processor.backend = CountingBackend()
+        self.assertEqual(list(processor.process_video_stream(video_path, confidence_threshold=1.0)), [])
+
+        self.assertEqual(FRAMES._values[('frame-count-test',)], 40)
+        self.assertEqual(FRAMES_DROPPED._values[('frame-count-test', 'load_shedding')], 20)
+        self.assertEqual(processor.processed_frames, 20)
+
+        processor.process_frame(np.zeros((48, 64, 3), dtype=np.uint8))  # Not a capture
+        self.assertEqual(FRAMES._values[('frame-count-test',)], 40)
+
+
+class FrameRingBufferTests(SimpleTestCase):
+    """Windows come out oldest-first, on the stride, and independent of the ring"""
+
+    def push_numbered(self, buffer, first, count):
+        for i in range(first, first + count):
+            buffer.push(np.full((2, 2, 3), i, dtype=np.uint8))
+
+    def test_window_order_after_wrap_around(self):
+        buffer = FrameRingBuffer(4, 2, 2)
+        self.push_numbered(buffer, 0, 6)
+        self.assertEqual(len(buffer), 4)
+        self.assertEqual(buffer.window()[:, 0, 0, 0].tolist(), [2, 3, 4, 5])
+        self.assertEqual(int(buffer.latest()[0, 0, 0]), 5)
+
+    def test_window_ready_with_stride(self):
+        buffer = FrameRingBuffer(4, 2, 2, stride=3)
+        ready = []
+        for i in range(12):
+            self.push_numbered(buffer, i, 1)
+            ready.append(buffer.window_ready())
+        self.assertEqual([i + 1 for i, r in enumerate(ready) if r], [4, 7, 10])
+
+        buffer.reset()
+        self.push_numbered(buffer, 0, 3)
+        self.assertFalse(buffer.window_ready())
+
+    def test_window_is_a_copy(self):
+        buffer = FrameRingBuffer(4, 2, 2)
+        self.push_numbered(buffer, 0, 4)
+        window = buffer.window()
+        self.assertFalse(np.shares_memory(window, buffer.frames))
+
+        window[:] = 99
+        self.push_numbered(buffer, 4, 2)
+        self.assertEqual(buffer.window()[:, 0, 0, 0].tolist(), [2, 3, 4, 5])
+
+        out = np.empty_like(buffer.frames)
+        self.assertIs(buffer.window(out=out), out)
+        self.assertEqual(out[:, 0, 0, 0].tolist(), [2, 3, 4, 5])
+
+    def test_frames_are_resized_into_the_ring(self):
+        buffer = FrameRingBuffer(2, 2, 2)
+        buffer.push(np.full((8, 8, 3), 7, dtype=np.uint8))
+        self.assertEqual(buffer.latest().shape, (2, 2, 3))
+        self.assertTrue(np.all(buffer.latest() == 7))
+
+
+class MotionGateTests(SimpleTestCase):
+    """Static windows skip the model, moving ones run it, and skips are counted"""
+
+    def feed(self, gate, frames):
+        for frame in frames:
+            gate.score(frame)
+        return gate.window_active()
+
+    def test_static_and_moving_windows(self):
+        gate = MotionGate(threshold=0.002, window=4)
+        still = np.full((64, 64, 3), 80, dtype=np.uint8)
+        moving = []
+        for i in range(4):
+            frame = still.copy()
+            frame[20:40, i * 10:i * 10 + 20] = 255
+            moving.append(frame)
+
+        # The first frame has nothing to compare with, so its window always runs
+        self.assertTrue(self.feed(gate, [still] * 4))
+        self.assertFalse(self.feed(gate, [still] * 4))
+        self.assertTrue(self.feed(gate, moving))
+        self.assertFalse(self.feed(gate, [moving[-1]] * 4))
+
+        stats = gate.stats()
+        self.assertEqual((stats['windows'], stats['skipped_windows']), (4, 2))
+        self.assertEqual(stats['skipped_ratio'], 0.5)
+
+    def test_reset_forgets_the_previous_frame(self):
+        gate = MotionGate(threshold=0.002, window=2)
+        still = np.zeros((64, 64, 3), dtype=np.uint8)
+        self.feed(gate, [still] * 2)
+        self.assertFalse(self.feed(gate, [still] * 2))
+        gate.reset()
+        self.assertTrue(self.feed(gate, [still] * 2))
+
+    def test_savings_are_scraped(self):
+        processor = VideoProcessor(motion_threshold=0.002, camera_id='gate-test')
+        processor.inference_seconds, processor.inferred_clips = 0.5, 1
+        still = np.zeros((64, 64, 3), dtype=np.uint8)
+        for _ in range(2):
+            self.feed(processor.motion_gate, [still] * processor.sequence_length)
+
+        report = processor.motion_report()
+        self.assertEqual((report['windows'], report['skipped_windows']), (2, 1))
+        self.assertEqual(report['inference_seconds_saved'], 0.5)
+        body = metrics.render()
+        label = '{camera="%s"}' % processor.camera
+        self.assertIn('surveillance_motion_skipped_windows%s 1' % label, body)
+        self.assertIn('surveillance_motion_skipped_ratio%s 0.5' % label, body)
+        self.assertIn('surveillance_motion_inference_seconds_saved%s 0.5' % label, body)
+
+
+class SparseDecodeTests(SimpleTestCase):
+    """Skipping frames the model never reads must not change what it sees"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.video_path = os.path.join(directory, 'video.avi')
+        writer = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*'MJPG'), 25, (64, 48))
+        for i in range(40):  # Two full windows and a short one
+            frame = np.zeros((48, 64, 3), dtype=np.uint8)
+            cv2.circle(frame, (i + 10, 24), 8, (0, 0, 255), -1)
+            writer.write(frame)
+        writer.release()
+        self.processor = VideoProcessor()
+
+    def test_sparse_windows_match_dense_windows(self):
+        dense = list(self.processor.iter_windows(self.video_path, sparse_decode=False))
+        sparse = list(self.processor.iter_windows(self.video_path, sparse_decode=True))
+        self.assertEqual([n for _, n in sparse], [n for _, n in dense])
+        self.assertEqual([n for _, n in dense], [16, 31, 40])
+
+        consumed = sorted(self.processor.consumed_offsets)
+        for (sparse_frames, _), (dense_frames, _) in zip(sparse, dense):
+            # The result frame, which also starts the next window, is always decoded
+            np.testing.assert_array_equal(sparse_frames[-1], dense_frames[-1])
+            self.assertTrue(any(frame is None for frame in sparse_frames[:-1]))
+
+            expected = self.processor.preprocessor(dense_frames).copy()
+            actual = self.processor.preprocessor(sparse_frames)
+            np.testing.assert_array_equal(actual[:, consumed], expected[:, consumed])
+
+
+def write_test_video(path, frames, size=(64, 48)):
+    """Write a short MJPEG video of a circle moving across a gradient"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25, size)
+    background = np.tile(np.linspace(0, 200, size[0], dtype=np.uint8)[None, :, None], (size[1], 1, 3))
+    for i in range(frames):
+        frame = background.copy()
+        cv2.circle(frame, (i % size[0], size[1] // 2), 8, (0, 0, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def save_random_model(directory, model_arch='resnet50'):
+    """Save a random-weight SlowFast checkpoint with the app's six classes; return its path"""
+    torch.manual_seed(0)
+    model = getattr(import_model_module(), model_arch)(class_num=6)
+    model_path = os.path.join(directory, f'{model_arch}.pt')
+    torch.save(model.state_dict(), model_path)
+    return model_path
+
+
+class BatchedFileAnalysisTests(SimpleTestCase):
+    """Batching windows into one forward must not change any result, for every model depth"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.video_path = os.path.join(self.directory, 'video.avi')
+        write_test_video(self.video_path, 70)  # Four full windows and a short one
+
+    def test_batched_results_match_single_clip_batches(self):
+        for model_arch in ('resnet50', 'resnet101', 'resnet152'):
+            with self.subTest(model_arch=model_arch):
+                processor = VideoProcessor(save_random_model(self.directory, model_arch), model_arch=model_arch,
+                                           shared_model=False, warmup=False)
+                single = [r['prediction'] for r in processor.process_video_file(self.video_path, batch_size=1)]
+                # A batch of three leaves a partial last batch
+                batched = [r['prediction'] for r in processor.process_video_file(self.video_path, batch_size=3)]
+
+                self.assertEqual([p['frame_number'] for p in single], [16, 31, 46, 61, 70])
+                self.assertEqual([p['frame_number'] for p in batched], [p['frame_number'] for p in single])
+                self.assertEqual([p['predicted_class_idx'] for p in batched],
+                                 [p['predicted_class_idx'] for p in single])
+                np.testing.assert_allclose([p['probabilities'] for p in batched],
+                                           [p['probabilities'] for p in single], rtol=1e-4, atol=1e-5)
+
+
+class ChunkedFileAnalysisTests(SimpleTestCase):
+    """Chunks analysed in worker processes give exactly the sequential pass's results"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.video_path = os.path.join(directory, 'video.avi')
+        write_test_video(self.video_path, 70)
+        self.processor = VideoProcessor(save_random_model(directory), batch_size=2, shared_model=False,
+                                        warmup=False)
+
+    def test_chunks_match_sequential_pass(self):
+        sequential = list(self.processor.process_video_file(self.video_path))
+        # Four one-window chunks, the last one running on to the short final window
+        chunked = list(self.processor.process_video_chunks(self.video_path, workers=2, top_k=1,
+                                                           min_chunk_windows=1))
+
+        frame_numbers = [r['prediction']['frame_number'] for r in chunked]
+        self.assertEqual(frame_numbers, [16, 31, 46, 61, 70])  # In order, chunk boundaries not repeated
+        self.assertEqual(frame_numbers, [r['prediction']['frame_number'] for r in sequential])
+        for chunk_result, result in zip(chunked, sequential):
+            self.assertEqual(chunk_result['prediction']['predicted_class_idx'],
+                             result['prediction']['predicted_class_idx'])
+            np.testing.assert_allclose(chunk_result['prediction']['probabilities'],
+                                       result['prediction']['probabilities'], rtol=1e-4, atol=1e-5)
+
+        # Only each chunk's most confident window carries its frame; the last chunk has two windows
+        self.assertEqual(sum(r['frame'] is not None for r in chunked), 4)
+        best = max(chunked, key=lambda r: r['prediction']['confidence'])
+        self.assertIsInstance(best['frame'], bytes)
+
+
+class GatedBackend:
+    """Records batch sizes; the first batch blocks until `release` is set when `hold_first` is"""
+
+    def __init__(self, hold_first=False):
+        self.batch_sizes = []
+        self.release = threading.Event()
+        if not hold_first:
+            self.release.set()
+
+    def predict(self, clips):
+        self.batch_sizes.append(len(clips))
+        if len(self.batch_sizes) == 1:
+            self.release.wait(5)
+        return np.zeros((len(clips), 2), dtype=np.float32)
+
+
+class CountingBackend:
+    """Records how many batches it ran"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, clips):
+        self.calls += 1
+        return np.zeros((len(clips), 6), dtype=np.float32)
+
+
+class ModelRegistryTests(SimpleTestCase):
+    """Concurrent first requests for a model load and warm it up exactly once"""
+
+    def test_concurrent_get_loads_once(self):
+        registry = ModelRegistry()
+        backend = CountingBackend()
+        loads = []
+
+        def loader():
+            loads.append(threading.current_thread().name)
+            time.sleep(0.1)  # Keep the other threads waiting on the load
+            return SharedModel(backend, None, {})
+
+        barrier = threading.Barrier(8)
+        results = []
+
+        def get():
+            barrier.wait()
+            results.append(registry.get('model', loader, warmup_shape=(1, 3, 16, 8, 8)))
+
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(backend.calls, 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(shared is results[0] for shared in results))
+        self.assertIs(registry.get('model', loader), results[0])
+        self.assertEqual(len(loads), 1)
+
+
+class InferenceSchedulerTests(SimpleTestCase):
+    """Clips are batched up to max_batch and never wait much past max_wait_ms"""
+
+    def scheduler(self, backend, **kwargs):
+        scheduler = InferenceScheduler(backend, clip_shape=(2,), **kwargs)
+        self.addCleanup(scheduler.stop)
+        return scheduler
+
+    def test_full_batches_do_not_wait(self):
+        backend = GatedBackend()
+        scheduler = self.scheduler(backend, max_batch=4, max_wait_ms=60000)
+        futures = [scheduler.submit(np.zeros(2)) for _ in range(8)]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(backend.batch_sizes, [4, 4])
+        self.assertEqual(scheduler.mean_batch_size(), 4.0)
+        self.assertIn('surveillance_inference_mean_batch_size ', metrics.render())
+
+    def test_partial_batch_is_dispatched_at_the_deadline(self):
+        backend = GatedBackend()
+        scheduler = self.scheduler(backend, max_batch=4, max_wait_ms=50)
+        start = time.monotonic()
+        scheduler.submit(np.zeros(2)).result(timeout=5)
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        self.assertEqual(backend.batch_sizes, [1])
+
+    def test_leftover_clips_do_not_wait_for_a_running_batch(self):
+        backend = GatedBackend(hold_first=True)
+        scheduler = self.scheduler(backend, max_batch=4, max_wait_ms=50, dispatchers=2)
+        time.sleep(0.1)  # Both dispatchers waiting for work
+        # A burst queued with a single wake-up, as when earlier notifications went to busy dispatchers
+        futures = [Future() for _ in range(6)]
+        with scheduler._condition:
+            scheduler._pending.extend(_PendingClip(np.zeros(2), future, None) for future in futures)
+            scheduler._condition.notify()
+
+        # The woken dispatcher is stuck on the full batch; it must wake the other for the two left behind
+        for future in futures[4:]:
+            future.result(timeout=2)
+        self.assertFalse(futures[0].done())
+        backend.release.set()
+        futures[0].result(timeout=5)
+        self.assertEqual(backend.batch_sizes, [4, 2])
+
+
+class ClipPreprocessorTests(SimpleTestCase):
+    """The vectorized preprocessing must match the old cvtColor -> PIL -> torchvision path"""
+
+    def test_matches_legacy_path_on_smooth_frames(self):
+        mean, std = [0.4889, 0.4887, 0.4891], [0.2074, 0.2074, 0.2074]
+        transform = transforms.Compose([
+            transforms.Resize((128, 128)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=mean, std=std)
+        ])
+        preprocessor = ClipPreprocessor(16, 128, mean, std)
+
+        # 1080p takes the bilinear prescale, 320x240 the direct area resize
+        for width, height in ((320, 240), (1920, 1080)):
+            clip = smooth_clip(width, height)
+            diff = np.abs(legacy_preprocess(clip, transform)[0].numpy() - preprocessor(clip))
+            # Normalized units: 0.05 is about 2.6 grey levels, 0.01 about half a level
+            self.assertLess(diff.max(), 0.05)
+            self.assertLess(diff.mean(), 0.01)
+
+
+class RecordingProcessor:
+    """Yields predefined window results and records the alerts it is asked to save"""
+
+    class_labels = ['normal', 'Robbery']
+
+    def __init__(self, confidences):
+        self.confidences = confidences
+        self.saved = []
+
+    def process_video_file(self, video_path):
+        for i, confidence in enumerate(self.confidences):
+            yield {
+                'frame': np.full((8, 8, 3), i, dtype=np.uint8),
+                'prediction': {
+                    'class_name': 'Robbery', 'confidence': confidence, 'predicted_class_idx': 1,
+                    'probabilities': np.array([0.5, 0.5]), 'frame_number': (i + 1) * 16,
+                },
+            }
+
+    def save_alert(self, frame, prediction, timestamp_vid, camera_id=None):
+        self.saved.append((frame, prediction['frame_number']))
+        return {'id': len(self.saved), 'image_url': None}
+
+
+class ProcessUploadedVideoTests(SimpleTestCase):
+    """Only the top-k windows are kept, as JPEG bytes, in confidence order"""
+
+    def test_keeps_most_confident_windows(self):
+        processor = RecordingProcessor([10, 90, 50, 90, 70, 20])
+        results = process_uploaded_video('missing.mp4', processor, top_k=3)
+
+        # Ties keep the earlier window
+        self.assertEqual([r['frame_number'] for r in results], [32, 64, 80])
+        self.assertTrue(all(isinstance(frame, bytes) and frame[:2] == b'\xff\xd8' for frame, _ in processor.saved))
+
+    def test_fewer_windows_than_k(self):
+        processor = RecordingProcessor([40, 60])
+        results = process_uploaded_video('missing.mp4', processor, top_k=5)
+        self.assertEqual([r['prediction']['confidence'] for r in results], [60, 40])
+
+    def test_report_counts_failed_alerts(self):
+        processor = RecordingProcessor([10, 90, 50])
+        processor.save_alert = lambda frame, prediction, timestamp_vid, camera_id=None: None
+        report = {}
+        self.assertEqual(process_uploaded_video('missing.mp4', processor, top_k=2, report=report), [])
+        self.assertEqual(report, {'windows': 3, 'candidates': 2, 'alerts': 0})
+
+
+class PlanChunksTests(SimpleTestCase):
+    """Chunks must cover every window of the video exactly once"""
+
+    def test_chunks_are_contiguous(self):
+        chunks = plan_chunks(total_frames=15 * 1000 + 1, sequence_length=16, workers=4, min_chunk_windows=50)
+        self.assertEqual(len(chunks), 16)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertIsNone(chunks[-1][1])
+        for (start, count), (next_start, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(start + count, next_start)
+
+    def test_short_video_is_one_chunk(self):
+        self.assertEqual(plan_chunks(total_frames=500, sequence_length=16, workers=16, min_chunk_windows=256),
+                         [(0, None)])
+
+
+def numbered_windows(count, fail_at=None):
+    """(frames, frame_number) windows whose frames are filled with the window's index"""
+    for i in range(count):
+        if i == fail_at:
+            raise IOError('decode failed')
+        yield np.full((4, 2, 2, 3), i, dtype=np.uint8), (i + 1) * 15
+
+
+class PipelinedAnalysisTests(SimpleTestCase):
+    """Overlapping stages must give the sequential results and shut down cleanly"""
+
+    def run_pipeline(self, windows, preprocess=None, batch_size=3):
+        def fill(frames, out):
+            out[...] = frames.mean()
+
+        def infer(clips, batch):
+            return [(frame_number, float(clip.mean()), frame[0, 0, 0])
+                    for clip, (frame, frame_number) in zip(clips, batch)]
+
+        return pipelined_analysis(windows, preprocess or fill, infer, clip_shape=(2, 2), batch_size=batch_size,
+                                  depth=2)
+
+    def pipeline_threads(self):
+        return [t for t in threading.enumerate() if t.name in ('file-decode', 'file-preprocess')]
+
+    def test_results_keep_window_order(self):
+        results = list(self.run_pipeline(numbered_windows(10)))
+        self.assertEqual(results, [((i + 1) * 15, float(i), i) for i in range(10)])
+        self.assertEqual(self.pipeline_threads(), [])
+
+    def test_decode_error_reaches_the_caller(self):
+        with self.assertRaisesRegex(IOError, 'decode failed'):
+            list(self.run_pipeline(numbered_windows(10, fail_at=4)))
+        self.assertEqual(self.pipeline_threads(), [])
+
+    def test_preprocess_error_reaches_the_caller(self):
+        def preprocess(frames, out):
+            raise ValueError('bad frame')
+
+        with self.assertRaisesRegex(ValueError, 'bad frame'):
+            list(self.run_pipeline(numbered_windows(10), preprocess=preprocess))
+        self.assertEqual(self.pipeline_threads(), [])
+
+    def test_closing_early_stops_both_threads(self):
+        endless = ((np.zeros((4, 2, 2, 3), dtype=np.uint8), i) for i in itertools.count())
+        results = self.run_pipeline(endless)
+        next(results)
+        results.close()
+        self.assertEqual(self.pipeline_threads(), [])
+
+
+class ResultCacheTests(SimpleTestCase):
+    """Cached analyses are bounded by count and age"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def age(self, cache, key, seconds):
+        stamp = time.time() - seconds
+        os.utime(cache._path(key), (stamp, stamp))
+
+    def test_round_trip(self):
+        cache = ResultCache(self.directory)
+        cache.put('a', {'results': [1, 2], 'frames_total': 32})
+        self.assertEqual(cache.get('a'), {'results': [1, 2], 'frames_total': 32})
+        self.assertIsNone(cache.get('missing'))
+
+    def test_least_recently_used_are_evicted(self):
+        cache = ResultCache(self.directory, max_entries=2)
+        for i, key in enumerate(['a', 'b']):
+            cache.put(key, {})
+            self.age(cache, key, 100 - i)
+        cache.get('a')  # Refreshes 'a', so 'b' is now the oldest
+        cache.put('c', {})
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_expired_entries_are_dropped(self):
+        cache = ResultCache(self.directory, max_age_days=1)
+        cache.put('a', {})
+        self.age(cache, 'a', 2 * 24 * 3600)
+        self.assertIsNone(cache.get('a'))
+        self.assertFalse(os.path.exists(cache._path('a')))
+
+
+class CachedAlertsTests(TestCase):
+    """A cached analysis is only served while the alerts and images it links to exist"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.cache = ResultCache(os.path.join(media_root, 'cache'))
+        camera = Camera.objects.create(name='Lobby', location='Hall', ip_address='127.0.0.1')
+        self.alert = Alert(camera=camera, threat_type='Robbery', confidence=90.0, timestamp_vid='00:00:01')
+        self.alert.image.save('alert.jpg', ContentFile(b'jpeg'), save=False)
+        self.alert.save()
+        self.entry = {'results': [{'frame_number': 16, 'prediction': {'alert_id': self.alert.id}}],
+                      'frames_total': 32}
+        self.cache.put('key', self.entry)
+
+    def test_entry_with_existing_alerts_is_served(self):
+        self.assertEqual(self.cache.get('key', validate=cached_alerts_exist), self.entry)
+        self.assertTrue(cached_alerts_exist({'results': []}))
+
+    def test_entry_is_dropped_when_its_alert_is_deleted(self):
+        self.alert.delete()
+        self.assertIsNone(self.cache.get('key', validate=cached_alerts_exist))
+        self.assertFalse(os.path.exists(self.cache._path('key')))
+
+    def test_entry_is_dropped_when_its_image_is_deleted(self):
+        self.alert.image.storage.delete(self.alert.image.name)
+        self.assertIsNone(self.cache.get('key', validate=cached_alerts_exist))
+
+    def test_worker_analyses_again_after_a_stale_hit(self):
+        user = User.objects.create_user('owner', password='x')
+        job = AnalysisJob.objects.create(user=user, video_path='a.mp4', content_hash='abc', status='running')
+        self.cache.put(analysis_cache_key('abc', user.id), self.entry)
+        self.alert.delete()
+
+        worker = AnalysisWorkerCommand()
+        worker.result_cache = self.cache
+        with mock.patch('surveillance.management.commands.run_analysis_worker.process_uploaded_video',
+                        return_value=[]) as analyse:
+            worker.run_job(processor=None, job=job, progress_interval=60)
+        analyse.assert_called_once()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.results), ('completed', []))
+
+
+class CurveProcessor(VideoProcessor):
+    """Scores each window from a known curve and counts the windows classified"""
+
+    def __init__(self, scores):
+        self.backend = 'curve'
+        self.sequence_length = 16
+        self.scores = scores
+        self.classified = []
+
+    def process_video_file(self, video_path, window_indices=None, **kwargs):
+        for window in sorted(window_indices):
+            self.classified.append(window)
+            yield {'frame': None, 'prediction': {'frame_number': window * 15 + 16,
+                                                 'confidence': float(self.scores[window])}}
+
+
+class TemporalSearchTests(SimpleTestCase):
+    """The coarse-to-fine search finds the dense top-k within its window budget"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.video_path = os.path.join(directory, 'long.avi')
+        writer = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*'MJPG'), 25, (16, 16))
+        for _ in range(15 * 200 + 1):  # 200 windows
+            writer.write(np.zeros((16, 16, 3), dtype=np.uint8))
+        writer.release()
+
+    def test_refines_around_the_peak(self):
+        windows = np.arange(200)
+        scores = 0.2 + 0.7 * np.exp(-0.5 * ((windows - 123) / 6) ** 2)
+        processor = CurveProcessor(scores)
+        results = list(processor.search_video_file(self.video_path, top_k=3, stride=8, budget=0.25))
+
+        self.assertLessEqual(len(processor.classified), 50)
+        self.assertEqual(len(set(processor.classified)), len(processor.classified))
+        best = sorted(results, key=lambda r: r['prediction']['confidence'], reverse=True)[:3]
+        self.assertEqual(sorted(r['prediction']['frame_number'] for r in best),
+                         [w * 15 + 16 for w in (122, 123, 124)])
+
+
+class AnalysisJobTests(TestCase):
+    """Workers claim each job once, only abandoned jobs are requeued, and progress is private"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='x')
+        self.other = User.objects.create_user('other', password='x')
+
+    def test_each_job_is_claimed_once_oldest_first(self):
+        first = AnalysisJob.objects.create(user=self.user, video_path='a.mp4')
+        second = AnalysisJob.objects.create(user=self.user, video_path='b.mp4')
+        AnalysisJob.objects.filter(id=first.id).update(created_at=timezone.now() - timedelta(minutes=1))
+        workers = [AnalysisWorkerCommand(), AnalysisWorkerCommand()]
+        workers[1].worker_id = 'other-host:1'
+
+        self.assertEqual(workers[0].claim_next_job().id, first.id)
+        claimed = workers[1].claim_next_job()
+        self.assertEqual(claimed.id, second.id)
+        self.assertEqual((claimed.status, claimed.worker), ('running', 'other-host:1'))
+        self.assertIsNone(workers[0].claim_next_job())
+
+    def test_requeue_leaves_jobs_with_recent_heartbeats(self):
+        now = timezone.now()
+        live = AnalysisJob.objects.create(user=self.user, video_path='a.mp4', status='running',
+                                          started_at=now - timedelta(hours=1), heartbeat_at=now)
+        stale = AnalysisJob.objects.create(user=self.user, video_path='b.mp4', status='running',
+                                           started_at=now - timedelta(hours=1), heartbeat_at=now - timedelta(hours=1),
+                                           frames_processed=50, worker='gone:1')
+
+        self.assertEqual(AnalysisWorkerCommand().requeue_stale_jobs(stale_after=600), 1)
+        live.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual(live.status, 'running')
+        self.assertEqual((stale.status, stale.frames_processed, stale.worker), ('queued', 0, ''))
+
+    def test_progress_and_eta(self):
+        job = AnalysisJob(status='running', frames_total=400, frames_processed=100,
+                          started_at=timezone.now() - timedelta(seconds=10))
+        progress = job.progress()
+        self.assertEqual(progress['percent'], 25.0)
+        self.assertAlmostEqual(progress['eta_seconds'], 30.0, delta=1.0)
+
+        job.status = 'completed'
+        self.assertEqual(job.progress()['percent'], 100.0)
+        self.assertIsNone(job.eta_seconds())
+
+    def test_progress_view_hides_other_users_jobs(self):
+        job = AnalysisJob.objects.create(user=self.user, video_path='a.mp4', frames_total=10, frames_processed=5)
+        url = reverse('analysis_progress', args=[job.id])
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['percent'], 50.0)
+        self.assertEqual(response.json()['results_url'], reverse('view_results', args=[job.id]))
+
+
+class PreloadTests(SimpleTestCase):
+    """Only serving processes preload the model; app start-up for manage.py commands does not"""
+
+    @mock.patch.dict(os.environ, {'SURVEILLANCE_PRELOAD_MODEL': '1'})
+    def test_preload_runs_from_the_entry_point_not_ready(self):
+        with mock.patch('surveillance.utils.setup.preload_model') as preload:
+            apps.get_app_config('surveillance').ready()
+            preload.assert_not_called()
+            preload_model_if_enabled()
+            preload.assert_called_once()
+
+    @mock.patch.dict(os.environ, {'SURVEILLANCE_PRELOAD_MODEL': '0'})
+    def test_preload_is_off_by_default(self):
+        with mock.patch.object(VideoProcessorConfig, 'PRELOAD_MODEL', False), \
+                mock.patch('surveillance.utils.setup.preload_model') as preload:
+            preload_model_if_enabled()
+        preload.assert_not_called()
+
+
+class MetricsViewTests(TestCase):
+    """Camera labels in /metrics/ are only shown to staff and the configured scraper"""
+
+    def setUp(self):
+        self.url = reverse('metrics')
+
+    def test_anonymous_and_regular_users_are_refused(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(User.objects.create_user('viewer', password='x'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_staff_can_read_metrics(self):
+        self.client.force_login(User.objects.create_user('admin', password='x', is_staff=True))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+    def test_scraper_token(self):
+        with mock.patch.object(VideoProcessorConfig, 'METRICS_TOKEN', 'secret'):
+            self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+            self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
@@ -10,11 +10,14 @@ urlpatterns = [
                   path('login/', views.login_view, name='login'),  # Define login URL here
                   path('register/', views.register_view, name='register'),  # Add the register URL here
                   path('upload/', views.upload_video, name='upload_video'),
-                  path('results/', views.view_results, name='view_results'),
+                  path('results/', views.view_results, name='view_results'),  # Latest job in the session
+                  path('results/<int:job_id>/', views.view_results, name='view_results'),
+                  path('jobs/<int:job_id>/progress/', views.analysis_progress, name='analysis_progress'),
                   path('alerts/filter/', views.filter_alerts, name='filter_alerts'),  # Filtered list
                   path('', views.video_feed, name='video_feed'),  # Changed to video_feed
                   path('video_feed/', views.video_feed, name='video_feed'),
                   path('', views.video_feedCCTV, name='video_feedCCTV'),  # Changed to video_feed
                   path('video_feedCCTV/', views.video_feedCCTV, name='video_feedCCTV'),  # Added an index path
+                  path('metrics/', views.metrics, name='metrics'),  # Prometheus scrape endpoint
 
               ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -2,6 +2,7 @@ import cv2
 import threading
 from django.shortcuts import render
 from django.http import StreamingHttpResponse, HttpResponse
+from .metrics import FRAMES, FRAMES_DROPPED, STAGE_SECONDS
 from .setup import initialize_video_processor
 
 class VideoCamera:
@@ -23,8 +24,10 @@ class VideoCamera:
 
         # Initialize video properties
         self.grabbed, self.frame = self.video.read()
+        self.frame_read = False  # Whether get_frame has taken the current frame
         self.lock = threading.Lock()
-        self.processor = initialize_video_processor()
+        self.camera = 'webcam'  # Metrics label and config key for the local camera
+        self.processor = initialize_video_processor(self.camera)
 
         # Start background frame grabbing
         self.stop_thread = False
@@ -69,6 +72,7 @@ class VideoCamera:
 
                 # Make a copy to avoid threading issues
                 frame = self.frame.copy()
+                self.frame_read = True
                 frame = cv2.flip(frame, 1)  # Horizontal flip
 
             try:
@@ -130,7 +134,8 @@ class VideoCamera:
                                 sys.exit(1)
 
                 # Encode frame to JPEG
-                ret, jpeg = cv2.imencode('.jpg', frame)
+                with STAGE_SECONDS.time(camera=self.camera, stage='encode'):
+                    ret, jpeg = cv2.imencode('.jpg', frame)
                 if not ret:
                     raise Exception("Failed to encode frame")
                 return jpeg.tobytes()
@@ -168,11 +173,18 @@ class VideoCamera:
                     break
                 continue
 
-            grabbed, frame = self.video.read()
+            with STAGE_SECONDS.time(camera=self.camera, stage='capture'):
+                grabbed, frame = self.video.read()
             with self.lock:
                 if grabbed and frame is not None:
+                    FRAMES.inc(camera=self.camera)
+                    if not self.frame_read:
+                        # The viewer is slower than the camera, so the previous frame is never analysed
+                        FRAMES_DROPPED.inc(camera=self.camera, reason='superseded')
                     self.frame = frame
+                    self.frame_read = False
                 else:
+                    FRAMES_DROPPED.inc(camera=self.camera, reason='capture_failure')
                     self.frame = None
                     print("Failed to grab frame, camera may be disconnected")
                     self.video.release()
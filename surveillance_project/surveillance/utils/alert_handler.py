@@ -5,6 +5,7 @@ import os
 import numpy as np
 from pathlib import Path
 from ..models import Alert, Camera
+from .metrics import STAGE_SECONDS, camera_label
 
 
 class AlertHandler:
@@ -22,7 +23,9 @@ class AlertHandler:
         return self.class_to_threat_map.get(class_name, 'suspicious')
 
     def save_frame_as_image(self, frame):
-        """Convert frame to image file"""
+        """Convert frame to image file; JPEG bytes are used as they are"""
+        if isinstance(frame, bytes):
+            return ContentFile(frame)
         success, buffer = cv2.imencode('.jpg', frame)
         if not success:
             return None
@@ -38,7 +41,8 @@ class AlertHandler:
             threat_type = self.map_class_to_threat(prediction['class_name'])
 
             # Convert frame to image file
-            image_file = self.save_frame_as_image(frame)
+            with STAGE_SECONDS.time(camera=camera_label(camera_id), stage='alert_encode'):
+                image_file = self.save_frame_as_image(frame)
             if image_file is None:
                 raise ValueError("Failed to convert frame to image")
 
@@ -59,7 +63,8 @@ class AlertHandler:
             # You can add video clip saving later if needed
 
             # Save the alert
-            alert.save()
+            with STAGE_SECONDS.time(camera=camera_label(camera_id), stage='alert_db'):
+                alert.save()
 
             return {
                 'id': alert.id,
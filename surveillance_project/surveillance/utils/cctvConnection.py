@@ -5,14 +5,18 @@ from django.shortcuts import render
 from django.http import StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt  # For handling POST requests
 
+from .metrics import FRAMES, FRAMES_DROPPED, STAGE_SECONDS, camera_label
+
 class VideoCameraCCTV(object):
     def __init__(self, rtsp_url):
+        self.camera = camera_label(rtsp_url)  # Metrics label, without the credentials
         self.video = cv2.VideoCapture(rtsp_url)
 
         if not self.video.isOpened():
             raise Exception(f"Error opening video stream: {rtsp_url}")
 
         (self.grabbed, self.frame) = self.video.read()
+        self.frame_read = False
         self.lock = threading.Lock()
         threading.Thread(target=self.update, args=()).start()
 
@@ -22,15 +26,27 @@ class VideoCameraCCTV(object):
     def get_frame(self):
         with self.lock:
             frame = self.frame.copy()
-        _, jpeg = cv2.imencode('.jpg', frame)
+            self.frame_read = True
+        with STAGE_SECONDS.time(camera=self.camera, stage='encode'):
+            _, jpeg = cv2.imencode('.jpg', frame)
         return jpeg.tobytes()
 
     def update(self):
         while True:
-            (self.grabbed, self.frame) = self.video.read()
-            if self.grabbed:
+            with STAGE_SECONDS.time(camera=self.camera, stage='capture'):
+                grabbed, frame = self.video.read()
+            if grabbed:
+                FRAMES.inc(camera=self.camera)
+                if not self.frame_read:
+                    # This feed is only displayed, so a replaced frame was never shown, not never analysed
+                    FRAMES_DROPPED.inc(camera=self.camera, reason='not_displayed')
+                with self.lock:
+                    (self.grabbed, self.frame) = (grabbed, frame)
+                    self.frame_read = False
                 continue
             else:
+                FRAMES_DROPPED.inc(camera=self.camera, reason='capture_failure')
+                self.grabbed = grabbed
                 break
         self.video.release()
 
@@ -2,5 +2,38 @@
 class VideoProcessorConfig:
 
     MODEL_PATH = '/home/de-coder/Videoclassification/surveillance_project/AI_Model/c3d_best_v1.h5'  # Update with your model path
+    MODEL_ARTIFACT_DIR = '/home/de-coder/Videoclassification/surveillance_project/AI_Model/artifacts'  # Scripted models from `manage.py build_model_artifact`
+    MODEL_ARCH = 'resnet50'  # One of resnet50, resnet101, resnet152, resnet200 (must match the weights)
     ALERT_SAVE_DIR = 'surveillance_project/media/alerts'  # Update with your save directory
-    CONFIDENCE_THRESHOLD = 0.7  # Minimum confidence to generate alert
\ No newline at end of file
+    CONFIDENCE_THRESHOLD = 0.7  # Minimum confidence to generate alert
+    BATCH_SIZE = 8  # Number of 16-frame windows classified per forward when analysing video files
+    WINDOW_STRIDE = 4  # Live feeds: predict every N frames over the last 16 (16 = non-overlapping windows)
+    SPARSE_DECODE = True  # Video files: skip converting frames the SlowFast sampling never reads (they are still decoded)
+    FFMPEG_BINARY = None  # Decode files and streams with this ffmpeg executable, scaled to the model size at decode (None = OpenCV)
+    FILE_PIPELINE_DEPTH = 2  # Video files: batches queued between overlapping decode, preprocess and inference threads (0 = off)
+    ANALYSIS_WORKERS = 0  # Uploaded videos: analyse chunks in this many processes (0 or 1 = one sequential pass)
+    ANALYSIS_CHUNK_WINDOWS = 256  # Smallest chunk, in 16-frame windows, worth a worker (shorter videos run in-process)
+    TEMPORAL_SEARCH_STRIDE = 0  # Long uploads: classify every Nth window, then re-scan around the best (0 = every window)
+    TEMPORAL_SEARCH_BUDGET = 0.25  # Fraction of a video's windows the coarse-to-fine search may classify
+    TEMPORAL_SEARCH_MIN_WINDOWS = 512  # Shorter uploads are always analysed window by window
+    RESULT_CACHE_MAX_ENTRIES = 1000  # Cached upload analyses, keyed by video content, model and settings
+    RESULT_CACHE_MAX_AGE_DAYS = 7  # Cached analyses expire like other uploads and results
+    QUANTIZATION = None  # CPU int8 inference: None, 'dynamic' (fc only) or 'static' (needs `manage.py calibrate_quantization`)
+    INFERENCE_BACKEND = 'torch'  # 'torch' or 'onnxruntime' (needs `manage.py export_onnx` and the onnxruntime package)
+    INFERENCE_THREADS = None  # Intra-op threads for the inference backend (None = library default)
+    OPTIMIZE_FOR_INFERENCE = True  # Fold BatchNorm into convolutions and use channels-last weights for eager models
+    WARMUP_MODEL = True  # Run one dummy clip when a model is first loaded into the shared registry
+    PRELOAD_MODEL = False  # Load the video stack and model when the WSGI/ASGI server starts (or set SURVEILLANCE_PRELOAD_MODEL=1)
+    METRICS_TOKEN = None  # Bearer token a Prometheus scraper sends to /metrics/ (or set SURVEILLANCE_METRICS_TOKEN); staff can always view it
+    SCHEDULER_MAX_BATCH = 8  # Live clips from all cameras are micro-batched up to this size (None = per-stream forwards)
+    SCHEDULER_MAX_WAIT_MS = 30  # Longest a live clip waits for its micro-batch to fill
+    INFERENCE_WORKERS = 0  # Run inference in this many worker processes (0 = in the web process)
+    WORKER_TORCH_THREADS = 1  # Torch intra-op threads per inference worker process
+    MOTION_THRESHOLD = None  # Fraction of changed pixels below which a live window skips the model, e.g. 0.002 (None = off)
+    CAMERA_MOTION_THRESHOLDS = {}  # Per-camera motion gate thresholds, keyed by camera id or URL (overrides MOTION_THRESHOLD)
+    STREAMING_INFERENCE = False  # Cache per-frame stem activations across overlapping live windows (eager models only)
+    LOAD_SHEDDING = True  # Lower per-camera analysis rate when live inference falls behind
+    LOAD_TARGET_LATENCY_MS = 500  # Live clip latency (window ready to prediction) the load governor aims for
+    LOAD_MAX_QUEUE_DEPTH = 16  # Scheduler backlog that counts as overload
+    CAMERA_PRIORITIES = {}  # Camera id or URL -> priority; higher keeps full rate longer under load (default 0)
+    CASCADE_THRESHOLD = None  # Run full SlowFast only above this screener non-normal probability (needs `manage.py train_screener`)
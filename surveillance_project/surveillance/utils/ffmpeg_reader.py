@@ -0,0 +1,122 @@
+import collections
+import os
+import subprocess
+import threading
+
+import numpy as np
+
+
+class FFmpegFrameReader:
+    """Read a video file or stream through an ffmpeg subprocess, scaled at decode time
+
+    ffmpeg scales every frame to `width` x `height` and converts it to BGR (the
+    layout the rest of the pipeline uses) before it leaves the decoder, so only
+    small fixed-size raw frames cross the pipe. read() fills a caller-supplied
+    or reusable buffer directly from the pipe.
+
+    With `snapshot_fps` the same ffmpeg process also writes full-resolution
+    JPEG frames at that rate to a second pipe; snapshot() returns the latest.
+    """
+
+    def __init__(self, source, width, height, ffmpeg='ffmpeg', start_seconds=0.0, threads=None, snapshot_fps=None):
+        self.source = source
+        self.shape = (height, width, 3)
+        self.frame_bytes = height * width * 3
+        self._buffer = np.empty(self.shape, dtype=np.uint8)
+        self._errors = collections.deque(maxlen=20)  # Last lines ffmpeg wrote to stderr
+
+        command = [ffmpeg, '-nostdin', '-hide_banner', '-loglevel', 'error']
+        if str(source).startswith('rtsp://'):
+            command += ['-rtsp_transport', 'tcp']
+        if start_seconds:
+            # Before -i, ffmpeg seeks to the previous keyframe and decodes up to the exact time
+            command += ['-ss', f"{start_seconds:.6f}"]
+        if threads:
+            command += ['-threads', str(threads)]
+        command += ['-i', str(source), '-an', '-sn',
+                    '-vf', f"scale={width}:{height}:flags=area",
+                    '-pix_fmt', 'bgr24', '-f', 'rawvideo', 'pipe:1']
+
+        self._snapshot = None
+        snapshot_fds = ()
+        if snapshot_fps:
+            snapshot_read, snapshot_write = os.pipe()
+            snapshot_fds = (snapshot_write,)
+            command += ['-an', '-sn', '-vf', f"fps={snapshot_fps}", '-c:v', 'mjpeg', '-q:v', '3',
+                        '-f', 'image2pipe', f"pipe:{snapshot_write}"]
+
+        try:
+            self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                            bufsize=self.frame_bytes, pass_fds=snapshot_fds)
+        except FileNotFoundError:
+            raise ValueError(f"ffmpeg executable not found: {ffmpeg}")
+        finally:
+            for fd in snapshot_fds:
+                os.close(fd)
+
+        # Drained in the background so a chatty ffmpeg can never block on a full stderr pipe
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_thread.start()
+        self._snapshot_thread = None
+        if snapshot_fds:
+            self._snapshot_pipe = open(snapshot_read, 'rb', buffering=0)
+            self._snapshot_thread = threading.Thread(target=self._read_snapshots, daemon=True)
+            self._snapshot_thread.start()
+        self.frames_read = 0
+
+    def _drain_stderr(self):
+        for line in self.process.stderr:
+            self._errors.append(line.decode(errors='replace').rstrip())
+
+    def _read_snapshots(self):
+        """Keep the newest complete JPEG from the snapshot pipe"""
+        pending = bytearray()
+        while True:
+            data = self._snapshot_pipe.read(1 << 16)
+            if not data:
+                return
+            pending += data
+            # Entropy-coded JPEG data never contains FFD9, so it only appears as the end-of-image marker
+            end = pending.rfind(b'\xff\xd9')
+            if end >= 0:
+                start = pending.rfind(b'\xff\xd8', 0, end)
+                if start >= 0:
+                    self._snapshot = bytes(pending[start:end + 2])
+                del pending[:end + 2]
+
+    def snapshot(self):
+        """The latest full-resolution JPEG frame, as bytes; None before the first one (or without snapshot_fps)"""
+        return self._snapshot
+
+    def read(self, out=None):
+        """Read the next frame into `out` (or the reusable buffer) and return it; None at the end"""
+        if out is None:
+            out = self._buffer
+        view = memoryview(out).cast('B')
+        filled = 0
+        while filled < self.frame_bytes:
+            count = self.process.stdout.readinto(view[filled:])
+            if not count:
+                if filled == 0 and self.frames_read == 0:
+                    self.close()
+                    self._stderr_thread.join(timeout=1)
+                    raise ValueError(f"ffmpeg could not read {self.source}: {' '.join(self._errors) or 'no frames'}")
+                return None
+            filled += count
+        self.frames_read += 1
+        return out
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process.stdout.close()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join(timeout=1)
+            self._snapshot_pipe.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
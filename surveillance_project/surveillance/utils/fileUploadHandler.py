@@ -1,3 +1,4 @@
+import hashlib
 import os
 from datetime import datetime
 import cv2
@@ -6,7 +7,9 @@ from django.core.files.storage import FileSystemStorage
 from pathlib import Path
 import uuid
 
-from .setup import initialize_video_processor
+from .config import VideoProcessorConfig
+from .file_analysis import TopKFrames
+from .result_cache import ResultCache
 
 
 class VideoFileHandler:
@@ -19,20 +22,34 @@ class VideoFileHandler:
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.results_dir, exist_ok=True)
 
+        # Analyses of earlier uploads, so the same footage is not analysed twice
+        self.result_cache = ResultCache(
+            os.path.join(self.results_dir, 'cache'),
+            max_entries=VideoProcessorConfig.RESULT_CACHE_MAX_ENTRIES,
+            max_age_days=VideoProcessorConfig.RESULT_CACHE_MAX_AGE_DAYS
+        )
+
     def save_uploaded_video(self, video_file):
-        """Save uploaded video file with unique name"""
+        """Save uploaded video file with unique name, hashing its content on the way to disk"""
         # Generate unique filename
         ext = Path(video_file.name).suffix
         unique_filename = f"{uuid.uuid4()}{ext}"
 
         # Save file
         fs = FileSystemStorage(location=self.upload_dir)
-        filename = fs.save(unique_filename, video_file)
+        filename = fs.get_available_name(unique_filename)
+        filepath = os.path.join(self.upload_dir, filename)
+        digest = hashlib.sha256()
+        with open(filepath, 'wb') as f:
+            for chunk in video_file.chunks():
+                digest.update(chunk)
+                f.write(chunk)
 
         return {
             'filename': filename,
-            'filepath': os.path.join(self.upload_dir, filename),
-            'url': fs.url(filename)
+            'filepath': filepath,
+            'url': fs.url(filename),
+            'sha256': digest.hexdigest()
         }
 
     def create_result_directory(self, video_filename):
@@ -57,10 +74,11 @@ class VideoFileHandler:
                 if (current_time - file_age).days > max_age_days:
                     os.remove(file_path)
 
-        # Clean results
+        # Clean results; the result cache applies its own limits
+        self.result_cache.evict()
         for dir_name in os.listdir(self.results_dir):
             dir_path = os.path.join(self.results_dir, dir_name)
-            if os.path.isdir(dir_path):
+            if os.path.isdir(dir_path) and dir_path != self.result_cache.directory:
                 dir_age = datetime.fromtimestamp(os.path.getctime(dir_path))
                 if (current_time - dir_age).days > max_age_days:
                     for root, dirs, files in os.walk(dir_path, topdown=False):
@@ -194,12 +212,33 @@ def frame_to_time(frame_num, fps):
     }
 
 
-def process_uploaded_video(video_path, processor=None, camera_id=None):
+def process_uploaded_video(video_path, processor=None, camera_id=None, top_k=5, workers=None, progress=None,
+                           raise_errors=False, report=None):
+    """Analyse an uploaded video and save alerts for its `top_k` most confident windows
+
+    Results are streamed from the processor and only the current top-k
+    candidates are kept, with their frames JPEG-encoded, so memory stays the
+    same however long the video is. With more than one worker (default
+    VideoProcessorConfig.ANALYSIS_WORKERS) long videos are split into chunks
+    analysed in parallel processes. With VideoProcessorConfig.TEMPORAL_SEARCH_STRIDE
+    set, long videos are searched coarse-to-fine instead, classifying only a
+    budgeted fraction of the windows. `progress(frame_number)` is called after
+    each analysed window with the furthest frame reached. Errors are printed and
+    give an empty result unless `raise_errors` is set. The number of windows,
+    top-k candidates and alerts actually saved are written to `report`.
+    """
     if processor is None:
+        # Imported here so upload views can save files without loading the model stack
+        from .setup import initialize_video_processor
         processor = initialize_video_processor()
+    if workers is None:
+        workers = VideoProcessorConfig.ANALYSIS_WORKERS
 
     results = []
-    all_detections = []
+    # Results decoded through ffmpeg carry no frame; only the final top-k are decoded again
+    top_detections = TopKFrames(top_k, load_frame=lambda frame_number: processor.read_frame(video_path, frame_number))
+    detection_count = 0
+    furthest_frame = 0
 
     try:
         # Open video to get properties
@@ -210,77 +249,81 @@ def process_uploaded_video(video_path, processor=None, camera_id=None):
         print(f"Video FPS: {fps}")
         video.release()
 
-        detections = processor.process_video_file(video_path)
+        if VideoProcessorConfig.TEMPORAL_SEARCH_STRIDE > 1:
+            detections = processor.search_video_file(
+                video_path, top_k=top_k,
+                stride=VideoProcessorConfig.TEMPORAL_SEARCH_STRIDE,
+                budget=VideoProcessorConfig.TEMPORAL_SEARCH_BUDGET,
+                min_windows=VideoProcessorConfig.TEMPORAL_SEARCH_MIN_WINDOWS
+            )
+        elif workers > 1:
+            detections = processor.process_video_chunks(
+                video_path, workers, top_k=top_k,
+                min_chunk_windows=VideoProcessorConfig.ANALYSIS_CHUNK_WINDOWS,
+                torch_threads=VideoProcessorConfig.WORKER_TORCH_THREADS
+            )
+        else:
+            detections = processor.process_video_file(video_path)
 
-        # Process all frames and store them with confidence scores
         for result in detections:
-            frame_num = result['prediction']['frame_number']
-            time_data = frame_to_time(frame_num, fps)
-
-            # Get top probabilities
-            top_probs = get_top_probabilities(
-                result['prediction']['probabilities'],
-                processor.class_labels
-            )
+            # Ties keep the earlier window, as a stable sort by confidence would
+            top_detections.offer(detection_count, result)
+            detection_count += 1
+            if progress is not None:
+                # The search's refinement pass goes back over frames already passed
+                furthest_frame = max(furthest_frame, result['prediction']['frame_number'])
+                progress(furthest_frame)
+
+        print(f"Found {detection_count} total detections. Processing top {top_k} by confidence.")
+
+        # Process only the top confidence detections, most confident first
+        candidates = top_detections.items()
+        if report is not None:
+            report.update(windows=detection_count, candidates=len(candidates), alerts=0)
+        for jpeg, prediction in candidates:
+            time_data = frame_to_time(prediction['frame_number'], fps)
 
             # Add time and top probabilities to prediction
-            result['prediction'].update({
+            prediction.update({
                 'timestamp': time_data['formatted'],
                 'timestamp_vid': time_data['time_obj'],  # Store as time object
                 'frame_time': time_data['total_seconds'],
                 'fps': fps,
-                'top_probabilities': top_probs
+                'top_probabilities': get_top_probabilities(prediction['probabilities'], processor.class_labels)
             })
 
-            # Store detection with its confidence
-            all_detections.append({
-                'confidence': result['prediction']['confidence'],
-                'result': result
-            })
-
-        # Sort and process top 5 detections
-        top_detections = sorted(
-            all_detections,
-            key=lambda x: x['confidence'],
-            reverse=True
-        )[:5]
-
-        print(f"Found {len(all_detections)} total detections. Processing top 5 by confidence.")
-
-        # Process only the top 5 confidence detections
-        for detection in top_detections:
-            result = detection['result']
-
-            print(f"Processing detection with timestamp: {result['prediction']['timestamp']}")
+            print(f"Processing detection with timestamp: {prediction['timestamp']}")
 
             # Save alert for each top detection
             alert = processor.save_alert(
-                result['frame'],
-                result['prediction'],
+                jpeg,
+                prediction,
                 None,
                 camera_id
             )
 
             if alert:
                 # For response JSON, format the time as string
-                formatted_time = result['prediction']['timestamp_vid'].strftime('%H:%M:%S.%f')[:-3]
+                formatted_time = prediction['timestamp_vid'].strftime('%H:%M:%S.%f')[:-3]
 
                 results.append({
-                    'frame_number': result['prediction']['frame_number'],
+                    'frame_number': prediction['frame_number'],
                     'timestamp': formatted_time,
                     'prediction': {
-                        'class_name': result['prediction']['class_name'],
-                        'confidence': result['prediction']['confidence'],
-                        'predicted_class_idx': result['prediction']['predicted_class_idx'],
-                        'top_probabilities': result['prediction']['top_probabilities'],
+                        'class_name': prediction['class_name'],
+                        'confidence': prediction['confidence'],
+                        'predicted_class_idx': prediction['predicted_class_idx'],
+                        'top_probabilities': prediction['top_probabilities'],
                         'alert_id': alert['id'],
                         'timestamp_vid': formatted_time,
                         'fps': fps,
-                        'frame_time': result['prediction']['frame_time'],
+                        'frame_time': prediction['frame_time'],
                         'image_url': alert['image_url']
                     }
                 })
 
+        if report is not None:
+            report['alerts'] = len(results)
         print(f"\nSaved {len(results)} alerts with highest confidence scores:")
         for idx, res in enumerate(results, 1):
             print(f"{idx}. Time {res['timestamp']} (Frame {res['frame_number']}): "
@@ -288,6 +331,8 @@ def process_uploaded_video(video_path, processor=None, camera_id=None):
                   f"Confidence: {res['prediction']['confidence']:.2f}%")
 
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error processing video: {str(e)}")
         import traceback
         traceback.print_exc()
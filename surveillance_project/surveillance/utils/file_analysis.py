@@ -0,0 +1,275 @@
+import heapq
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+
+def seek_to_frame(cap, frame_index):
+    """Position `cap` so the next grab() returns frame `frame_index` (0-based)
+
+    Containers without an accurate index may seek to a nearby keyframe instead,
+    so the position is checked and frames are grabbed from the start if needed.
+    """
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_index:
+        return
+
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(frame_index):
+        if not cap.grab():
+            break
+
+
+def plan_chunks(total_frames, sequence_length, workers, min_chunk_windows):
+    """Split a video into (start_window, window_count) chunks; the last chunk runs to the end
+
+    Windows advance by sequence_length - 1 frames, so chunk boundaries fall on
+    window starts and no window is split or classified twice.
+    """
+    full_windows = max(0, total_frames - 1) // (sequence_length - 1)
+    # A few chunks per worker keeps every worker busy when chunks run at different speeds
+    chunk_count = min(max(1, workers) * 4, full_windows // max(1, min_chunk_windows))
+    if chunk_count < 2:
+        return [(0, None)]
+
+    bounds = np.linspace(0, full_windows, chunk_count + 1).astype(int)
+    chunks = [(int(start), int(end - start)) for start, end in zip(bounds[:-1], bounds[1:])]
+    chunks[-1] = (chunks[-1][0], None)
+    return chunks
+
+
+class TopKFrames:
+    """The k most confident window results seen so far, with their frames kept as JPEG bytes
+
+    Ties keep the window offered first. A frame is only encoded when its window
+    enters the top-k, and frames that are already JPEG bytes are kept as they are.
+    Results without a frame are kept when `load_frame(frame_number)` is given;
+    their frames are loaded once the final top-k are known.
+    """
+
+    def __init__(self, k, load_frame=None):
+        self.k = k
+        self.load_frame = load_frame
+        self._heap = []  # Min-heap of ((confidence, -order), jpeg bytes or None, prediction)
+
+    def offer(self, order, result):
+        """Consider one result; `order` is its position in the video. Returns whether it was kept"""
+        key = (result['prediction']['confidence'], -order)
+        if len(self._heap) >= self.k and key <= self._heap[0][0]:
+            return False
+
+        frame = result['frame']
+        if isinstance(frame, np.ndarray):
+            frame = self._encode(frame)
+            if frame is None:
+                return False
+        elif not frame:
+            if self.load_frame is None:
+                return False
+            frame = None
+
+        entry = (key, frame, result['prediction'])
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        else:
+            heapq.heapreplace(self._heap, entry)
+        return True
+
+    @staticmethod
+    def _encode(frame):
+        success, jpeg = cv2.imencode('.jpg', frame)
+        return jpeg.tobytes() if success else None
+
+    def items(self):
+        """(jpeg bytes, prediction) pairs, most confident first"""
+        items = []
+        for _, jpeg, prediction in sorted(self._heap, key=lambda e: e[0], reverse=True):
+            if jpeg is None:
+                frame = self.load_frame(prediction['frame_number'])
+                jpeg = self._encode(frame) if frame is not None else None
+                if jpeg is None:
+                    continue
+            items.append((jpeg, prediction))
+        return items
+
+
+_worker_processor = None
+
+
+def _init_chunk_worker(settings, torch_threads):
+    """Chunk worker start-up: configure Django and load the model once per process"""
+    global _worker_processor
+    import django
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    django.setup()
+    from .video_processor import VideoProcessor
+
+    _worker_processor = VideoProcessor(settings=settings)
+
+
+def _analyse_chunk(video_path, start_window, window_count, top_k):
+    """Classify one chunk and return (jpeg bytes or None, prediction) per window, in frame order"""
+    top = TopKFrames(top_k, load_frame=lambda frame_number: _worker_processor.read_frame(video_path, frame_number))
+    predictions = []
+    results = _worker_processor.process_video_file(video_path, start_window=start_window, window_count=window_count)
+    for order, result in enumerate(results):
+        predictions.append(result['prediction'])
+        top.offer(order, result)
+
+    kept = {prediction['frame_number']: jpeg for jpeg, prediction in top.items()}
+    return [(kept.get(prediction['frame_number']), prediction) for prediction in predictions]
+
+
+def analyse_chunks(settings, video_path, chunks, workers, top_k, torch_threads=1):
+    """Run every chunk in a pool of `workers` processes and yield the results in frame order
+
+    `settings` is the ProcessorSettings each worker builds its VideoProcessor from.
+    """
+    # spawn, not fork: forking a process that already runs torch and Django threads is unsafe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_chunk_worker,
+                             initargs=(settings, torch_threads)) as executor:
+        futures = [executor.submit(_analyse_chunk, video_path, start, count, top_k) for start, count in chunks]
+        for future in futures:
+            for jpeg, prediction in future.result():
+                yield {'frame': jpeg, 'prediction': prediction}
+
+
+_DONE = object()  # Sentinel closing a pipeline queue
+
+
+class _StageFailure:
+    def __init__(self, error):
+        self.error = error
+
+
+def _put(q, item, stop):
+    """Block until `item` is queued or the pipeline is stopped; returns False when stopped"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    """Block until an item arrives or the pipeline is stopped; returns _DONE when stopped"""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return _DONE
+
+
+def pipelined_analysis(windows, preprocess, infer, clip_shape, batch_size, depth, report=None, keep_frames=True):
+    """Decode, preprocess and classify windows in overlapping stages and yield the results in order
+
+    A decoder thread pulls (frames, frame_number) from `windows`, a preprocessing
+    thread writes them into batch buffers with `preprocess(frames, out=slot)`, and
+    the calling thread runs `infer(clips, windows)` on each full batch. At most
+    `depth` preprocessed batches and two decoded windows wait between the stages,
+    so a fast stage waits for a slow one instead of buffering the whole video.
+    Busy time and utilization of each stage are written to `report`. Each
+    window's last frame is passed on to `infer` unless `keep_frames` is False.
+    """
+    stop = threading.Event()
+    # Decoded windows hold full-resolution frames, so only a couple wait for preprocessing;
+    # the batch queue is what absorbs the difference in stage speeds
+    decoded = queue.Queue(maxsize=2)
+    batches = queue.Queue(maxsize=depth)
+    free_buffers = queue.Queue()
+    for _ in range(depth + 1):
+        free_buffers.put(np.empty((batch_size,) + tuple(clip_shape), dtype=np.float32))
+
+    busy = {'decode': 0.0, 'preprocess': 0.0, 'inference': 0.0}
+    window_count = 0
+
+    def decode():
+        iterator = iter(windows)
+        try:
+            while True:
+                start = time.perf_counter()
+                window = next(iterator, _DONE)
+                busy['decode'] += time.perf_counter() - start
+                if not _put(decoded, window, stop) or window is _DONE:
+                    return
+        except Exception as e:
+            _put(decoded, _StageFailure(e), stop)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    def preprocess_batches():
+        buffer, pending = None, []
+        while True:
+            window = _get(decoded, stop)
+            if window is _DONE or isinstance(window, _StageFailure):
+                if pending:
+                    _put(batches, (buffer, pending), stop)
+                _put(batches, window, stop)
+                return
+
+            if buffer is None:
+                buffer = _get(free_buffers, stop)
+                if buffer is _DONE:
+                    return
+
+            frames, frame_number = window
+            start = time.perf_counter()
+            try:
+                preprocess(frames, out=buffer[len(pending)])
+            except Exception as e:
+                _put(batches, _StageFailure(e), stop)
+                return
+            busy['preprocess'] += time.perf_counter() - start
+            # Only the last original frame is kept for the result
+            pending.append((frames[-1] if keep_frames else None, frame_number))
+
+            if len(pending) >= batch_size:
+                if not _put(batches, (buffer, pending), stop):
+                    return
+                buffer, pending = None, []
+
+    threads = [threading.Thread(target=decode, name='file-decode', daemon=True),
+               threading.Thread(target=preprocess_batches, name='file-preprocess', daemon=True)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            batch = _get(batches, stop)
+            if batch is _DONE:
+                break
+            if isinstance(batch, _StageFailure):
+                raise batch.error
+
+            buffer, pending = batch
+            start = time.perf_counter()
+            results = infer(buffer[:len(pending)], pending)
+            busy['inference'] += time.perf_counter() - start
+            free_buffers.put(buffer)
+            window_count += len(pending)
+            yield from results
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        wall = time.perf_counter() - began
+        if report is not None:
+            report.update(wall_seconds=wall, windows=window_count, stages={
+                name: {'busy_seconds': seconds, 'utilization': seconds / wall if wall else 0.0}
+                for name, seconds in busy.items()
+            })
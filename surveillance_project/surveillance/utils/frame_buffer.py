@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+
+
+class FrameRingBuffer:
+    """Preallocated ring of resized BGR uint8 frames for sliding-window inference"""
+
+    def __init__(self, capacity, height, width, stride=None, resize=None):
+        self.capacity = capacity
+        self.stride = max(1, int(stride or capacity))
+        self.resize = resize  # Optional resize(frame, dst) used instead of a plain INTER_AREA resize
+        self.frames = np.zeros((capacity, height, width, 3), dtype=np.uint8)
+        self.count = 0  # Total frames pushed since the last reset
+
+    def reset(self):
+        """Forget all buffered frames without releasing the storage"""
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def push(self, frame):
+        """Resize a frame straight into the next slot of the ring"""
+        slot = self.frames[self.count % self.capacity]
+        height, width = slot.shape[:2]
+
+        if frame.shape[:2] == (height, width):
+            np.copyto(slot, frame)
+        elif self.resize is not None:
+            self.resize(frame, slot)
+        else:
+            cv2.resize(frame, (width, height), dst=slot, interpolation=cv2.INTER_AREA)
+
+        self.count += 1
+
+    def latest(self):
+        """The most recently pushed (resized) frame"""
+        return self.frames[(self.count - 1) % self.capacity]
+
+    def window_ready(self):
+        """True when the ring is full and `stride` new frames arrived since the last window"""
+        return self.count >= self.capacity and (self.count - self.capacity) % self.stride == 0
+
+    def window(self, out=None):
+        """Return the buffered frames oldest-first as a (capacity, H, W, 3) array"""
+        order = (self.count + np.arange(self.capacity)) % self.capacity
+        return np.take(self.frames, order, axis=0, out=out)
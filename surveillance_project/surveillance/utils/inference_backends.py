@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import torch
+
+from .model_loader import DEFAULT_FRAME_STRIDES, artifact_path, load_model
+
+INFERENCE_BACKENDS = ('torch', 'onnxruntime')
+
+
+def softmax(logits):
+    """Numerically stable softmax over the class axis of a (N, num_classes) array"""
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+class InferenceBackend:
+    """Runs a batch of preprocessed clips through a model and returns class probabilities"""
+    name = None
+    parallelism = 1  # Batches this backend can usefully run at the same time
+
+    def predict(self, clips):
+        """Map a (N, 3, T, H, W) float32 array or tensor to (N, num_classes) float32 probabilities"""
+        raise NotImplementedError
+
+
+class TorchBackend(InferenceBackend):
+    """PyTorch eager, TorchScript or quantized module"""
+    name = 'torch'
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+
+    def predict(self, clips):
+        if isinstance(clips, np.ndarray):
+            clips = torch.from_numpy(clips)
+
+        with torch.inference_mode():
+            logits = self.model(clips.to(self.device))
+            return torch.softmax(logits, dim=1).cpu().numpy()
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """ONNX Runtime CPU session over a graph from `manage.py export_onnx`"""
+    name = 'onnxruntime'
+
+    def __init__(self, onnx_path, num_threads=None):
+        import onnxruntime as ort  # Optional dependency, only needed for this backend
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, clips):
+        if isinstance(clips, torch.Tensor):
+            clips = clips.cpu().numpy()
+
+        logits = self.session.run(None, {self.input_name: np.ascontiguousarray(clips, dtype=np.float32)})[0]
+        return softmax(logits).astype(np.float32)
+
+
+def export_onnx(model, path, sequence_length, im_size, opset_version=17):
+    """Export a SlowFast module to ONNX with a dynamic batch dimension"""
+    model = model.cpu().eval()
+    example = torch.zeros(1, 3, sequence_length, im_size, im_size)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with torch.no_grad():
+        torch.onnx.export(
+            model, (example,), tmp_path,
+            input_names=['clips'], output_names=['logits'],
+            dynamic_axes={'clips': {0: 'batch'}, 'logits': {0: 'batch'}},
+            opset_version=opset_version, dynamo=False
+        )
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_backend(model_path, model_arch, num_classes, device, sequence_length, im_size, artifact_dir=None,
+                 quantization=None, inference_backend='torch', backend_threads=None, optimize=False,
+                 cascade_threshold=None, normal_index=None):
+    """Create an inference backend, preferring prebuilt artifacts in artifact_dir
+
+    Returns (backend, model, info); model is the torch module, or None for ONNX Runtime.
+    """
+    if inference_backend == 'onnxruntime' and not quantization and cascade_threshold is None:
+        onnx_path = artifact_dir and artifact_path(
+            artifact_dir, model_path, model_arch, sequence_length, im_size, 'cpu', extension='.onnx'
+        )
+        if onnx_path and os.path.exists(onnx_path):
+            backend = OnnxRuntimeBackend(onnx_path, num_threads=backend_threads)
+            return backend, None, dict(DEFAULT_FRAME_STRIDES, source='onnx', path=onnx_path)
+        print("No ONNX export found for these weights, run `manage.py export_onnx`; using the torch backend")
+
+    if backend_threads:
+        torch.set_num_threads(backend_threads)
+
+    # A prebuilt scripted artifact in artifact_dir is used when one matches these weights
+    model, info = load_model(
+        model_path, model_arch, num_classes, device, sequence_length, im_size,
+        artifact_dir=artifact_dir, quantization=quantization, optimize=optimize,
+        cascade_threshold=cascade_threshold, normal_index=normal_index
+    )
+    return TorchBackend(model, device), model, info
@@ -0,0 +1,245 @@
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .inference_backends import InferenceBackend
+
+
+def _worker_main(connection, input_name, output_name, input_shape, output_shape, load_kwargs, torch_threads):
+    """Inference worker process: load the model once, then serve batches through shared memory"""
+    import torch
+
+    from .inference_backends import load_backend
+
+    torch.set_num_threads(torch_threads)
+    input_memory = shared_memory.SharedMemory(name=input_name)
+    output_memory = shared_memory.SharedMemory(name=output_name)
+    clips = np.ndarray(input_shape, dtype=np.float32, buffer=input_memory.buf)
+    probabilities = np.ndarray(output_shape, dtype=np.float32, buffer=output_memory.buf)
+
+    try:
+        try:
+            backend, _, info = load_backend(**load_kwargs)
+        except Exception as e:
+            connection.send(('error', str(e)))
+            return
+        connection.send(('ready', info))
+
+        while True:
+            count = connection.recv()
+            if count is None:
+                break
+            try:
+                probabilities[:count] = backend.predict(clips[:count])
+                connection.send(('ok', count))
+            except Exception as e:
+                connection.send(('error', str(e)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del clips, probabilities
+        input_memory.close()
+        output_memory.close()
+
+
+class _Worker:
+    """One worker process with its own shared-memory input and output slot"""
+
+    def __init__(self, index, input_shape, output_shape):
+        self.index = index
+        self.input_memory = shared_memory.SharedMemory(create=True, size=int(np.prod(input_shape)) * 4)
+        self.output_memory = shared_memory.SharedMemory(create=True, size=int(np.prod(output_shape)) * 4)
+        self.clips = np.ndarray(input_shape, dtype=np.float32, buffer=self.input_memory.buf)
+        self.probabilities = np.ndarray(output_shape, dtype=np.float32, buffer=self.output_memory.buf)
+        self.process = None
+        self.connection = None
+        self.lock = threading.Lock()  # Held while a batch runs or the process restarts
+        self.restarts = 0  # Restarts since the last batch that succeeded
+        self.retry_at = 0.0  # No restart before this time.monotonic()
+        self.failed = False  # Gave up restarting; kept out of the idle queue
+
+    def release(self):
+        del self.clips, self.probabilities
+        for memory in (self.input_memory, self.output_memory):
+            memory.close()
+            memory.unlink()
+
+
+class InferencePool(InferenceBackend):
+    """Pool of inference worker processes, usable anywhere an InferenceBackend is
+
+    Clips are copied into a worker's shared-memory slot and only the batch size
+    goes through the pipe, so nothing is pickled per clip. Each worker loads the
+    model itself with `load_kwargs` (the arguments of load_backend). A worker
+    that dies is restarted; the batch it was running fails with RuntimeError.
+    Restarts back off exponentially from `restart_backoff` seconds up to
+    `max_backoff`, and a worker that dies `max_restarts` times without serving
+    a batch in between is marked failed and no longer used. Once every worker
+    has failed, predict raises instead of waiting.
+    """
+    name = 'pool'
+
+    def __init__(self, load_kwargs, clip_shape, workers=2, torch_threads=1, max_batch=8, startup_timeout=300,
+                 max_restarts=5, restart_backoff=1.0, max_backoff=60.0):
+        self.load_kwargs = dict(load_kwargs, device='cpu')
+        self.torch_threads = max(1, int(torch_threads))
+        self.max_batch = max(1, int(max_batch))
+        self.startup_timeout = startup_timeout
+        self.max_restarts = max_restarts
+        self.restart_backoff = restart_backoff
+        self.max_backoff = max_backoff
+        self.info = None
+
+        # spawn, not fork: forking a process that already runs torch and Django threads is unsafe
+        self._context = multiprocessing.get_context('spawn')
+        input_shape = (self.max_batch,) + tuple(clip_shape)
+        output_shape = (self.max_batch, load_kwargs['num_classes'])
+        self._workers = [_Worker(i, input_shape, output_shape) for i in range(max(1, int(workers)))]
+        self._idle = queue.Queue()
+        self._closed = False
+
+        for worker in self._workers:
+            self._start(worker)
+            self._idle.put(worker)
+
+        self._supervisor = threading.Thread(target=self._supervise, name='inference-pool-supervisor', daemon=True)
+        self._supervisor.start()
+
+    @property
+    def parallelism(self):
+        return len(self._workers)
+
+    def _start(self, worker):
+        parent_connection, child_connection = self._context.Pipe()
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(child_connection, worker.input_memory.name, worker.output_memory.name,
+                  worker.clips.shape, worker.probabilities.shape, self.load_kwargs, self.torch_threads),
+            name=f'inference-worker-{worker.index}',
+            daemon=True
+        )
+        worker.process.start()
+        child_connection.close()
+
+        # The connection is only handed to the worker once the handshake is done,
+        # so no batch can ever read the 'ready' message
+        try:
+            if not parent_connection.poll(self.startup_timeout):
+                raise RuntimeError(f"Inference worker {worker.index} did not start")
+            status, info = parent_connection.recv()
+            if status != 'ready':
+                raise RuntimeError(f"Inference worker {worker.index} failed to load the model: {info}")
+        except BaseException:
+            parent_connection.close()
+            if worker.process.is_alive():  # A hung worker would otherwise never be restarted
+                worker.process.terminate()
+                worker.process.join(timeout=5)
+            raise
+        worker.connection = parent_connection
+        self.info = info
+        print(f"Inference worker {worker.index} started (pid {worker.process.pid})")
+
+    def _restart(self, worker):
+        """Start a dead worker again unless it is backing off or has failed; the caller holds worker.lock"""
+        if self._closed or worker.failed or worker.process.is_alive():
+            return
+        if worker.restarts >= self.max_restarts:
+            self._fail(worker)
+            return
+        if time.monotonic() < worker.retry_at:
+            return
+
+        worker.restarts += 1
+        backoff = min(self.restart_backoff * 2 ** (worker.restarts - 1), self.max_backoff)
+        worker.retry_at = time.monotonic() + backoff
+        print(f"Inference worker {worker.index} exited with code {worker.process.exitcode}, "
+              f"restarting (attempt {worker.restarts} of {self.max_restarts})")
+        worker.connection.close()
+        self._start(worker)
+
+    def _fail(self, worker):
+        """Stop restarting a worker; wake waiting batches once no worker is left"""
+        worker.failed = True
+        print(f"Inference worker {worker.index} did not recover after {worker.restarts} restarts, giving up on it")
+        if all(w.failed for w in self._workers):
+            self._idle.put(None)
+
+    def _supervise(self):
+        """Restart workers that die while idle, so a crash is noticed before the next batch"""
+        interval = 1.0 / len(self._workers)
+        while not self._closed:
+            for worker in self._workers:
+                if worker.failed or not worker.process.is_alive():
+                    time.sleep(interval)  # join() on a dead process returns at once
+                else:
+                    worker.process.join(timeout=interval)
+                if self._closed or worker.failed or worker.process.is_alive():
+                    continue
+                # A batch taking this worker meanwhile waits for the lock, not for the handshake
+                with worker.lock:
+                    try:
+                        self._restart(worker)
+                    except Exception as e:
+                        print(f"Failed to restart inference worker {worker.index}: {str(e)}")
+
+    def predict(self, clips):
+        if hasattr(clips, 'numpy'):
+            clips = clips.cpu().numpy()
+
+        results = []
+        for start in range(0, len(clips), self.max_batch):
+            results.append(self._predict_chunk(clips[start:start + self.max_batch]))
+        return np.concatenate(results)
+
+    def _acquire(self):
+        """Take an idle worker, dropping failed ones"""
+        while True:
+            worker = self._idle.get()
+            if worker is None:
+                self._idle.put(None)  # Wake the next waiting batch too
+                raise RuntimeError("All inference workers failed")
+            if not worker.failed:
+                return worker
+
+    def _predict_chunk(self, clips):
+        worker = self._acquire()
+        try:
+            with worker.lock:
+                count = len(clips)
+                worker.clips[:count] = clips
+                try:
+                    worker.connection.send(count)
+                    status, payload = worker.connection.recv()
+                except (EOFError, OSError):
+                    worker.process.join(timeout=5)
+                    try:
+                        self._restart(worker)
+                    except Exception as e:
+                        print(f"Failed to restart inference worker {worker.index}: {str(e)}")
+                    raise RuntimeError(f"Inference worker {worker.index} crashed")
+
+                if status != 'ok':
+                    raise RuntimeError(f"Inference worker {worker.index} failed: {payload}")
+                worker.restarts = 0
+                return worker.probabilities[:count].copy()
+        finally:
+            if not worker.failed:
+                self._idle.put(worker)
+
+    def close(self):
+        self._closed = True
+        for worker in self._workers:
+            try:
+                worker.connection.send(None)
+            except (EOFError, OSError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.connection.close()
+            worker.release()
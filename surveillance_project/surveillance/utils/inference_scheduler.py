@@ -0,0 +1,162 @@
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+
+import numpy as np
+
+from .metrics import MODEL_FPS, metrics
+
+_schedulers = weakref.WeakSet()
+
+QUEUE_DEPTH = metrics.gauge(
+    'surveillance_inference_queue_depth', 'Live clips waiting for a micro-batch',
+    collect=lambda: {(): sum(scheduler.queue_depth() for scheduler in list(_schedulers))}
+)
+
+
+def _mean_batch_size():
+    schedulers = list(_schedulers)
+    batches = sum(scheduler.batches for scheduler in schedulers)
+    return sum(scheduler.clips for scheduler in schedulers) / batches if batches else 0.0
+
+
+MEAN_BATCH_SIZE = metrics.gauge(
+    'surveillance_inference_mean_batch_size', 'Live clips per micro-batch since start-up',
+    collect=lambda: {(): _mean_batch_size()}
+)
+
+
+class _PendingClip:
+    __slots__ = ('clip', 'future', 'callback', 'submitted')
+
+    def __init__(self, clip, future, callback):
+        self.clip = clip
+        self.future = future
+        self.callback = callback
+        self.submitted = time.monotonic()
+
+
+class InferenceScheduler:
+    """Groups clips submitted by many streams into micro-batches for one shared backend
+
+    A batch is dispatched as soon as it holds ``max_batch`` clips or its oldest clip
+    has waited ``max_wait_ms``. Each clip's probabilities are delivered through the
+    Future returned by submit() and, when given, the stream's callback. Several
+    dispatcher threads keep several batches in flight, for backends such as a
+    worker pool that run batches in parallel.
+    """
+
+    def __init__(self, backend, clip_shape, max_batch=8, max_wait_ms=30, dispatchers=1):
+        self.backend = backend
+        self.clip_shape = tuple(clip_shape)
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending = []
+        self._condition = threading.Condition()
+        self._stopped = False
+
+        self.batches = 0
+        self.clips = 0
+        self.busy_seconds = 0.0  # Time spent inside backend.predict
+
+        self._threads = [
+            threading.Thread(target=self._dispatch_loop, name=f'inference-scheduler-{i}', daemon=True)
+            for i in range(max(1, int(dispatchers)))
+        ]
+        for thread in self._threads:
+            thread.start()
+        _schedulers.add(self)
+
+    def submit(self, clip, callback=None):
+        """Queue one preprocessed (3, T, H, W) clip; return a Future for its class probabilities
+
+        The clip is copied, so the caller may reuse its buffer straight away.
+        callback(probabilities) runs on the scheduler thread and must not block.
+        """
+        future = Future()
+        pending = _PendingClip(np.array(clip, dtype=np.float32), future, callback)
+
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("Inference scheduler has been stopped")
+            self._pending.append(pending)
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._condition.notify()
+        return future
+
+    def _next_batch(self):
+        """Block until a batch is due, then remove and return it (empty once stopped)"""
+        with self._condition:
+            while True:
+                if self._stopped:
+                    return []
+                if not self._pending:
+                    self._condition.wait()
+                    continue
+
+                remaining = self._pending[0].submitted + self.max_wait - time.monotonic()
+                if len(self._pending) >= self.max_batch or remaining <= 0:
+                    batch = self._pending[:self.max_batch]
+                    del self._pending[:self.max_batch]
+                    if self._pending:
+                        # Clips left behind were submitted without a wake-up of their own
+                        self._condition.notify()
+                    return batch
+                self._condition.wait(remaining)
+
+    def _dispatch_loop(self):
+        # Clips are gathered into this buffer so every batch reuses the same memory
+        batch_clips = np.empty((self.max_batch,) + self.clip_shape, dtype=np.float32)
+
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+
+            try:
+                for i, pending in enumerate(batch):
+                    batch_clips[i] = pending.clip
+                start = time.perf_counter()
+                probabilities = self.backend.predict(batch_clips[:len(batch)])
+                elapsed = time.perf_counter() - start
+            except Exception as e:
+                print(f"Error in batched inference: {str(e)}")
+                for pending in batch:
+                    pending.future.set_exception(e)
+                continue
+
+            with self._condition:
+                self.batches += 1
+                self.clips += len(batch)
+                self.busy_seconds += elapsed
+            MODEL_FPS.set(len(batch) / elapsed if elapsed else 0.0, camera='scheduler')
+            for i, pending in enumerate(batch):
+                pending.future.set_result(probabilities[i])
+                if pending.callback is not None:
+                    try:
+                        pending.callback(probabilities[i])
+                    except Exception as e:
+                        print(f"Error in inference callback: {str(e)}")
+
+    def queue_depth(self):
+        """Clips waiting for a batch"""
+        return len(self._pending)
+
+    def mean_batch_size(self):
+        """Clips per dispatched batch so far"""
+        return self.clips / self.batches if self.batches else 0.0
+
+    def seconds_per_clip(self):
+        return self.busy_seconds / self.clips if self.clips else 0.0
+
+    def stop(self):
+        """Stop the dispatcher; clips still queued are cancelled"""
+        with self._condition:
+            self._stopped = True
+            pending, self._pending = self._pending, []
+            self._condition.notify_all()
+        for clip in pending:
+            clip.future.cancel()
+        for thread in self._threads:
+            thread.join()
@@ -0,0 +1,117 @@
+import threading
+import time
+import weakref
+
+from .metrics import LOAD_PRESSURE, metrics
+
+# (window hop multiplier, analyse every Nth frame) for each degradation level
+DEGRADATION_STEPS = ((1, 1), (2, 1), (2, 2), (4, 2), (4, 3), (8, 4))
+
+_governors = weakref.WeakSet()
+
+
+def _governor_seconds(stat):
+    """The largest of a millisecond stat over every live governor, in seconds"""
+    return {(): max((governor.stats()[stat] for governor in list(_governors)), default=0.0) / 1000}
+
+
+LOAD_LATENCY = metrics.gauge(
+    'surveillance_load_latency_seconds', 'Smoothed live clip latency the load governor acts on',
+    collect=lambda: _governor_seconds('latency_ms')
+)
+LOAD_TARGET_LATENCY = metrics.gauge(
+    'surveillance_load_target_latency_seconds', 'Live clip latency above which the load governor sheds load',
+    collect=lambda: _governor_seconds('target_latency_ms')
+)
+
+
+class LoadGovernor:
+    """Process-wide load shedding for live inference
+
+    Streams report each clip's latency (window ready to prediction) and the
+    inference queue depth. Once per `interval` seconds the pressure level rises
+    when the smoothed latency is above `target_latency_ms` or the queue is deeper
+    than `max_queue_depth`, and falls again when latency is under half the
+    target with an empty-ish queue. When no clip reaches the model for
+    `idle_timeout` seconds (cameras idle or gated by motion) the pressure falls
+    one level, and another each interval after that, so cameras do not stay
+    degraded once the load is gone. The timeout (default five intervals) is
+    longer than the gap between clips of a fully degraded camera. A
+    camera with priority p degrades only once the pressure exceeds p, so
+    low-priority cameras shed load first.
+    """
+
+    def __init__(self, target_latency_ms=500, max_queue_depth=16, interval=1.0, smoothing=0.2, idle_timeout=None):
+        self.target_latency = target_latency_ms / 1000.0
+        self.max_queue_depth = max_queue_depth
+        self.interval = interval
+        self.idle_timeout = idle_timeout if idle_timeout is not None else 5 * interval
+        self.smoothing = smoothing
+
+        self.pressure = 0
+        self.max_pressure = len(DEGRADATION_STEPS) - 1
+        self.latency = 0.0  # Exponential moving average, seconds
+        self.queue_depth = 0
+        self._lock = threading.Lock()
+        self._last_update = time.monotonic()
+        self._last_sample = self._last_update
+        _governors.add(self)
+
+    def record(self, latency, queue_depth=0):
+        """Report one clip's inference latency in seconds and the current queue depth"""
+        with self._lock:
+            now = time.monotonic()
+            self._decay(now)
+            self._last_sample = now
+            self.latency += self.smoothing * (latency - self.latency)
+            self.queue_depth = queue_depth
+
+            if now - self._last_update < self.interval:
+                return
+            self._last_update = now
+
+            if self.latency > self.target_latency or queue_depth > self.max_queue_depth:
+                if self.pressure < self.max_pressure:
+                    self.pressure += 1
+                    LOAD_PRESSURE.set(self.pressure)
+                    print(f"Inference overloaded ({self.latency * 1000:.0f} ms, queue {queue_depth}), "
+                          f"load shedding level {self.pressure}")
+            elif self.latency < self.target_latency / 2 and queue_depth <= self.max_queue_depth // 4:
+                if self.pressure > 0:
+                    self.pressure -= 1
+                    LOAD_PRESSURE.set(self.pressure)
+                    print(f"Inference load recovered, load shedding level {self.pressure}")
+
+    def _decay(self, now):
+        """Lower the pressure after idle_timeout without samples, then once per interval; the caller holds the lock"""
+        if self.pressure == 0 or now - self._last_sample < self.idle_timeout:
+            return
+        since = now - max(self._last_update, self._last_sample + self.idle_timeout - self.interval)
+        steps = int(since // self.interval)
+        if steps < 1:
+            return
+        self._last_update = now
+        self.pressure = max(0, self.pressure - steps)
+        self.latency *= 0.5 ** steps  # Stale latency must not push the pressure straight back up
+        self.queue_depth = 0
+        LOAD_PRESSURE.set(self.pressure)
+        print(f"No inference load for {now - self._last_sample:.0f} s, load shedding level {self.pressure}")
+
+    def level(self, priority=0):
+        """Degradation level for a camera of the given priority"""
+        with self._lock:
+            self._decay(time.monotonic())
+        return min(self.max_pressure, max(0, self.pressure - priority))
+
+    def degradation(self, priority=0):
+        """(window hop multiplier, frame step) a camera of the given priority should use now"""
+        return DEGRADATION_STEPS[self.level(priority)]
+
+    def stats(self):
+        """Current pressure, smoothed latency and queue depth, reported in /metrics"""
+        return {
+            'pressure': self.pressure,
+            'latency_ms': self.latency * 1000,
+            'queue_depth': self.queue_depth,
+            'target_latency_ms': self.target_latency * 1000,
+        }
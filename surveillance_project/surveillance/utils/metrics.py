@@ -0,0 +1,177 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# Histogram buckets in seconds, from sub-millisecond preprocessing up to slow alert emails
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def camera_label(camera_id):
+    """Label value for a camera id or stream URL, without any credentials in the URL"""
+    if camera_id is None:
+        return 'default'
+    camera_id = str(camera_id)
+    if '://' in camera_id:
+        parts = urlsplit(camera_id)
+        return f"{parts.scheme}://{parts.hostname or ''}{f':{parts.port}' if parts.port else ''}{parts.path}"
+    return camera_id
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self):
+        """Yield (suffix, label values, extra labels, value) for the exposition format"""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield '', key, (), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that goes up and down; `collect` optionally supplies {label values: value} at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        yield from super().samples()
+        if self.collect is not None:
+            for key, value in self.collect().items():
+                yield '', key if isinstance(key, tuple) else (key,), (), value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield '_bucket', key, (('le', le),), cumulative
+            yield '_sum', key, (), total
+            yield '_count', key, (), count
+
+
+class MetricsRegistry:
+    """Process-wide collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), collect=None):
+        return self._register(Gauge(name, documentation, labelnames, collect))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+metrics = MetricsRegistry()
+
+# Pipeline metrics shared by the capture, inference and alert code
+STAGE_SECONDS = metrics.histogram(
+    'surveillance_stage_seconds', 'Time spent per pipeline stage', ('camera', 'stage'))
+# Both are counted where a live source captures the frame, so every dropped frame is also in FRAMES.
+# Display-only CCTV feeds are never analysed; their reason is 'not_displayed'.
+FRAMES = metrics.counter(
+    'surveillance_frames_total', 'Frames captured from live cameras', ('camera',))
+FRAMES_DROPPED = metrics.counter(
+    'surveillance_frames_dropped_total', 'Captured frames not analysed (or not displayed), by reason',
+    ('camera', 'reason'))
+CLIPS = metrics.counter(
+    'surveillance_clips_total', 'Analysis windows, by outcome (inferred or skipped_static)', ('camera', 'outcome'))
+MODEL_FPS = metrics.gauge(
+    'surveillance_model_fps', 'Clips per second of the last model forward', ('camera',))
+MOTION_ACTIVITY = metrics.gauge(
+    'surveillance_motion_activity', 'Latest frame-to-frame activity score of the motion gate', ('camera',))
+LOAD_PRESSURE = metrics.gauge(
+    'surveillance_load_shedding_level', 'Current load governor pressure level')
+ALERTS = metrics.counter(
+    'surveillance_alerts_total', 'Alerts saved, by threat type', ('threat_type',))
@@ -0,0 +1,159 @@
+import importlib
+import json
+import os
+import sys
+
+import torch
+
+from .quantization import quantize_dynamic_model
+from .result_cache import file_sha256
+
+# Get the absolute path to the project root (Videoclassification directory), where model.py lives
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+
+MODEL_ARCHITECTURES = ('resnet50', 'resnet101', 'resnet152', 'resnet200')
+
+# SlowFast samples every 2nd frame for the fast pathway and every 16th for the slow one
+DEFAULT_FRAME_STRIDES = {'fast_stride': 2, 'slow_stride': 16}
+
+def import_model_module():
+    """Import the training-time model.py, only needed when no scripted artifact is available"""
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    return importlib.import_module('model')
+
+
+def weights_hash(model_path):
+    """SHA-256 of a weights file, cached per (path, size, mtime)"""
+    return file_sha256(model_path)
+
+
+def artifact_path(artifact_dir, model_path, model_arch, sequence_length, im_size, device, quantization=None,
+                  extension='.pt'):
+    """Cache location of the scripted model for these weights, input shape, device and quantization"""
+    device_type = torch.device(device).type
+    name = f"slowfast_{model_arch}_{weights_hash(model_path)[:16]}_t{sequence_length}_s{im_size}_{device_type}"
+    if quantization:
+        name += f"_int8-{quantization}"
+    return os.path.join(artifact_dir, f"{name}{extension}")
+
+
+def screener_path(artifact_dir, model_path, model_arch):
+    """Location of the trained fast-pathway screener head for these weights"""
+    return os.path.join(artifact_dir, f"screener_{model_arch}_{weights_hash(model_path)[:16]}.pt")
+
+
+def build_cascade_model(model_path, model_arch, num_classes, device, head_path, normal_index, threshold):
+    """Wrap the optimized eager SlowFast and a trained screener head in a model.ScreenedSlowFast"""
+    model_module = import_model_module()
+    model = build_eager_model(model_path, model_arch, num_classes, device, optimize=True)
+    head = model_module.screener_head(model, num_classes).to(device)
+    head.load_state_dict(torch.load(head_path, map_location=device, weights_only=True))
+    head.eval().requires_grad_(False)
+    return model_module.ScreenedSlowFast(model, head, normal_index, threshold).eval()
+
+
+def build_eager_model(model_path, model_arch, num_classes, device, optimize=False):
+    """Build the SlowFast network from model.py and load its state dict
+
+    With `optimize` BatchNorm is folded into the convolutions and weights use the
+    channels-last 3D layout (see model.optimize_for_inference).
+    """
+    if model_arch not in MODEL_ARCHITECTURES:
+        raise ValueError(f"Unknown model architecture: {model_arch}")
+
+    model_module = import_model_module()
+    model = getattr(model_module, model_arch)(class_num=num_classes).to(device)
+    model.load_state_dict(torch.load(model_path, map_location=device, weights_only=True))
+    model.eval()
+
+    if optimize:
+        model = model_module.optimize_for_inference(model)
+    return model
+
+
+def save_artifact(model, path, example, metadata):
+    """Trace and freeze `model` with an example input and save it with its metadata"""
+    with torch.no_grad():
+        scripted = torch.jit.freeze(torch.jit.trace(model, example))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    torch.jit.save(scripted, tmp_path, _extra_files={'metadata.json': json.dumps(metadata)})
+    os.replace(tmp_path, path)  # Readers never see a half-written artifact
+    return path
+
+
+def artifact_metadata(model, model_path, model_arch, num_classes, sequence_length, im_size, quantization=None):
+    return {
+        'model_arch': model_arch,
+        'num_classes': num_classes,
+        'sequence_length': sequence_length,
+        'im_size': im_size,
+        'weights_sha256': weights_hash(model_path),
+        'fast_stride': model.fast_stride,
+        'slow_stride': model.slow_stride,
+        'quantization': quantization,
+    }
+
+
+def build_artifact(model_path, model_arch, num_classes, sequence_length, im_size, artifact_dir,
+                   device='cpu', force=False):
+    """Trace, freeze and save an inference-only SlowFast; return the artifact path"""
+    path = artifact_path(artifact_dir, model_path, model_arch, sequence_length, im_size, device)
+    if os.path.exists(path) and not force:
+        return path
+
+    model = build_eager_model(model_path, model_arch, num_classes, device, optimize=True)
+    example = torch.zeros(2, 3, sequence_length, im_size, im_size, device=device)
+    metadata = artifact_metadata(model, model_path, model_arch, num_classes, sequence_length, im_size)
+    return save_artifact(model, path, example, metadata)
+
+
+def load_model(model_path, model_arch, num_classes, device, sequence_length, im_size, artifact_dir=None,
+               quantization=None, optimize=False, cascade_threshold=None, normal_index=None):
+    """Load the model for inference, preferring a prebuilt scripted artifact
+
+    Returns (model, info); info holds the frame strides SlowFast samples and where
+    the model came from ('cascade', 'artifact' or 'eager'). Quantized models always
+    run on CPU. With `cascade_threshold` a trained screener head in artifact_dir
+    turns the model into a screener cascade, which is eager-only.
+    """
+    if quantization:
+        device = torch.device('cpu')
+
+    if cascade_threshold is not None:
+        head_path = artifact_dir and screener_path(artifact_dir, model_path, model_arch)
+        if quantization:
+            print("The screener cascade does not support quantization; using the full model")
+        elif head_path and os.path.exists(head_path):
+            model = build_cascade_model(model_path, model_arch, num_classes, device, head_path, normal_index,
+                                        cascade_threshold)
+            info = {'fast_stride': model.fast_stride, 'slow_stride': model.slow_stride, 'source': 'cascade',
+                    'path': head_path, 'quantization': None}
+            return model, info
+        else:
+            print("No screener head found for these weights, run `manage.py train_screener`; using the full model")
+
+    if artifact_dir:
+        path = artifact_path(artifact_dir, model_path, model_arch, sequence_length, im_size, device, quantization)
+        if os.path.exists(path):
+            extra_files = {'metadata.json': ''}
+            model = torch.jit.load(path, map_location=device, _extra_files=extra_files)
+            metadata = json.loads(extra_files['metadata.json'] or '{}')
+            info = {key: metadata.get(key, value) for key, value in DEFAULT_FRAME_STRIDES.items()}
+            info.update(source='artifact', path=path, quantization=quantization)
+            return model, info
+
+    model = build_eager_model(model_path, model_arch, num_classes, device, optimize=optimize)
+    info = {'fast_stride': model.fast_stride, 'slow_stride': model.slow_stride, 'source': 'eager', 'path': model_path,
+            'quantization': None}
+
+    if quantization == 'dynamic':
+        model = quantize_dynamic_model(model)
+        info['quantization'] = quantization
+    elif quantization:
+        print(f"No calibrated int8-{quantization} artifact found, run `manage.py calibrate_quantization`; "
+              f"using the float model")
+
+    return model, info
@@ -0,0 +1,65 @@
+import threading
+
+import numpy as np
+
+from .inference_scheduler import InferenceScheduler
+
+
+class SharedModel:
+    """A loaded inference backend shared read-only between all streams in the process"""
+
+    def __init__(self, backend, model, info):
+        self.backend = backend
+        self.model = model  # Underlying torch module, None for non-torch backends
+        self.info = info
+        self._scheduler = None
+        self._scheduler_lock = threading.Lock()
+
+    def scheduler(self, clip_shape, max_batch, max_wait_ms):
+        """Return the micro-batching scheduler shared by every stream using this model"""
+        with self._scheduler_lock:
+            if self._scheduler is None:
+                self._scheduler = InferenceScheduler(self.backend, clip_shape, max_batch, max_wait_ms,
+                                                     dispatchers=self.backend.parallelism)
+            return self._scheduler
+
+
+class ModelRegistry:
+    """Process-wide, thread-safe cache of loaded models
+
+    Each key is loaded once, on first use, and warmed up with a dummy clip; every
+    later request for the same key gets the same SharedModel. Per-stream state
+    (frame buffers, counters) stays in each VideoProcessor.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+        self._loading = {}  # key -> lock held while that key is being loaded
+
+    def get(self, key, loader, warmup_shape=None):
+        """Return the SharedModel for `key`, calling loader() to create it the first time"""
+        with self._lock:
+            if key in self._models:
+                return self._models[key]
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given key; the others wait here and then reuse it
+        with key_lock:
+            with self._lock:
+                if key in self._models:
+                    return self._models[key]
+
+            shared = loader()
+            if shared.model is not None:
+                shared.model.requires_grad_(False)
+            if warmup_shape is not None:
+                shared.backend.predict(np.zeros(warmup_shape, dtype=np.float32))
+
+            with self._lock:
+                self._models[key] = shared
+                self._loading.pop(key, None)
+        return shared
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,71 @@
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Cheap activity detector that decides whether a clip is worth running SlowFast on
+
+    Each frame is reduced to a small grayscale image and scored as the fraction of
+    pixels that changed by more than ``pixel_delta`` since the previous frame. A
+    window is active when any of its last ``window`` frames scored at least
+    ``threshold``; inactive windows skip the model.
+    """
+
+    def __init__(self, threshold, window, size=32, pixel_delta=15):
+        self.threshold = threshold
+        self.size = size
+        self.pixel_delta = pixel_delta
+        self.scores = deque(maxlen=window)
+        self._previous = None
+        self._gray = np.empty((size, size), dtype=np.uint8)
+        self._small = np.empty((size, size, 3), dtype=np.uint8)
+
+        self.windows = 0
+        self.skipped = 0
+        self.activity_total = 0.0
+        self.last_score = 0.0
+
+    def reset(self):
+        self.scores.clear()
+        self._previous = None
+
+    def score(self, frame):
+        """Score one BGR frame against the previous one and return its activity in [0, 1]"""
+        cv2.resize(frame, (self.size, self.size), dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+
+        if self._previous is None:
+            # Nothing to compare against yet, so never gate out the first frames
+            self._previous = self._gray.copy()
+            activity = 1.0
+        else:
+            changed = cv2.absdiff(self._gray, self._previous) > self.pixel_delta
+            activity = float(np.count_nonzero(changed)) / changed.size
+            np.copyto(self._previous, self._gray)
+
+        self.scores.append(activity)
+        self.last_score = activity
+        return activity
+
+    def window_active(self):
+        """Record a window decision: True if the model should run on the current window"""
+        activity = max(self.scores) if self.scores else 1.0
+        self.windows += 1
+        self.activity_total += activity
+
+        if activity >= self.threshold:
+            return True
+        self.skipped += 1
+        return False
+
+    def stats(self):
+        return {
+            'windows': self.windows,
+            'skipped_windows': self.skipped,
+            'skipped_ratio': self.skipped / self.windows if self.windows else 0.0,
+            'mean_window_activity': self.activity_total / self.windows if self.windows else 0.0,
+            'last_activity': self.last_score,
+            'threshold': self.threshold,
+        }
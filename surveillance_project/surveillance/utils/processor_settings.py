@@ -0,0 +1,91 @@
+from .config import VideoProcessorConfig
+
+
+class ProcessorSettings:
+    """Every VideoProcessor option in one object
+
+    Options missing from the constructor take their DEFAULTS value. Settings
+    without a governor pickle, so a worker process can rebuild a processor from
+    them (see for_file_analysis).
+    """
+
+    DEFAULTS = {
+        # Model and inference backend
+        'model_path': None,
+        'model_arch': 'resnet50',
+        'artifact_dir': None,
+        'quantization': None,
+        'inference_backend': 'torch',
+        'backend_threads': None,
+        'optimize': False,
+        'cascade_threshold': None,
+        'shared_model': True,
+        'warmup': True,
+        'inference_workers': 0,
+        'worker_threads': 1,
+        # Video files
+        'batch_size': 1,
+        'sparse_decode': False,
+        'pipeline_depth': 0,
+        'ffmpeg_binary': None,
+        # Live streams: micro-batching, motion gate, streaming stems and load shedding
+        'window_stride': None,
+        'scheduler_batch': None,
+        'scheduler_wait_ms': 30,
+        'motion_threshold': None,
+        'streaming': False,
+        'governor': None,
+        'priority': 0,
+        'camera_id': None,
+    }
+
+    # Options a file analysis worker resets: live-stream state, and the threading it sets up itself
+    FILE_ANALYSIS_RESET = ('backend_threads', 'inference_workers', 'worker_threads', 'window_stride',
+                           'scheduler_batch', 'scheduler_wait_ms', 'motion_threshold', 'streaming', 'governor',
+                           'priority', 'camera_id')
+
+    def __init__(self, **options):
+        unknown = set(options) - set(self.DEFAULTS)
+        if unknown:
+            raise TypeError(f"Unknown VideoProcessor options: {', '.join(sorted(unknown))}")
+        for name, default in self.DEFAULTS.items():
+            setattr(self, name, options.get(name, default))
+
+    def replace(self, **options):
+        """A copy with some options changed"""
+        return ProcessorSettings(**dict(vars(self), **options))
+
+    def for_file_analysis(self):
+        """What a chunk worker process needs to analyse a file exactly like this processor"""
+        return self.replace(**{name: self.DEFAULTS[name] for name in self.FILE_ANALYSIS_RESET})
+
+    @classmethod
+    def from_config(cls, camera_id=None, governor=None):
+        """Settings from VideoProcessorConfig, with the camera's motion threshold and priority"""
+        return cls(
+            model_path=VideoProcessorConfig.MODEL_PATH,
+            model_arch=VideoProcessorConfig.MODEL_ARCH,
+            artifact_dir=VideoProcessorConfig.MODEL_ARTIFACT_DIR,
+            quantization=VideoProcessorConfig.QUANTIZATION,
+            inference_backend=VideoProcessorConfig.INFERENCE_BACKEND,
+            backend_threads=VideoProcessorConfig.INFERENCE_THREADS,
+            optimize=VideoProcessorConfig.OPTIMIZE_FOR_INFERENCE,
+            cascade_threshold=VideoProcessorConfig.CASCADE_THRESHOLD,
+            warmup=VideoProcessorConfig.WARMUP_MODEL,
+            inference_workers=VideoProcessorConfig.INFERENCE_WORKERS,
+            worker_threads=VideoProcessorConfig.WORKER_TORCH_THREADS,
+            batch_size=VideoProcessorConfig.BATCH_SIZE,
+            sparse_decode=VideoProcessorConfig.SPARSE_DECODE,
+            pipeline_depth=VideoProcessorConfig.FILE_PIPELINE_DEPTH,
+            ffmpeg_binary=VideoProcessorConfig.FFMPEG_BINARY,
+            window_stride=VideoProcessorConfig.WINDOW_STRIDE,
+            scheduler_batch=VideoProcessorConfig.SCHEDULER_MAX_BATCH,
+            scheduler_wait_ms=VideoProcessorConfig.SCHEDULER_MAX_WAIT_MS,
+            motion_threshold=VideoProcessorConfig.CAMERA_MOTION_THRESHOLDS.get(
+                camera_id, VideoProcessorConfig.MOTION_THRESHOLD
+            ),
+            streaming=VideoProcessorConfig.STREAMING_INFERENCE,
+            governor=governor,
+            priority=VideoProcessorConfig.CAMERA_PRIORITIES.get(camera_id, 0),
+            camera_id=camera_id,
+        )
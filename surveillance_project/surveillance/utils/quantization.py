@@ -0,0 +1,106 @@
+import copy
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+# 'dynamic' quantizes the fc head only and needs no calibration; 'static' also
+# quantizes the Conv3d/BatchNorm/ReLU stacks and needs calibration clips
+QUANTIZATION_MODES = ('dynamic', 'static')
+
+# Largest change in any class probability, as reported by compare_models, accepted for each mode
+MAX_PROBABILITY_DIFF = {'dynamic': 0.01, 'static': 0.05}
+
+
+def quantize_dynamic_model(model):
+    """Return a CPU copy of `model` with int8 dynamically quantized Linear layers"""
+    model = copy.deepcopy(model).cpu().eval()
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static_model(model, calibration_batches, backend='x86'):
+    """Return a CPU copy of `model` with int8 convolutions and fc, calibrated on the given batches
+
+    Uses FX graph mode post-training quantization, which fuses each Conv3d with its
+    BatchNorm3d (and ReLU) and inserts the quantize/dequantize steps around the
+    concatenations and residual additions.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    calibration_batches = list(calibration_batches)
+    if not calibration_batches:
+        raise ValueError("Static quantization needs at least one calibration batch")
+
+    torch.backends.quantized.engine = backend
+    model = copy.deepcopy(model).cpu().eval()
+    prepared = prepare_fx(model, get_default_qconfig_mapping(backend), (calibration_batches[0],))
+
+    with torch.no_grad():
+        for batch in calibration_batches:
+            prepared(batch)
+
+    return convert_fx(prepared)
+
+
+def quantize_model(model, mode, calibration_batches=None):
+    """Quantize `model` with one of QUANTIZATION_MODES"""
+    if mode == 'dynamic':
+        return quantize_dynamic_model(model)
+    if mode == 'static':
+        return quantize_static_model(model, calibration_batches or [])
+    raise ValueError(f"Unknown quantization mode: {mode}")
+
+
+def compare_models(float_model, quantized_model, batches, labels=None):
+    """Compare predictions and CPU latency of the float and quantized models on the same clips
+
+    `labels` optionally holds one ground-truth class index per clip (-1 when unknown).
+    """
+    float_predictions, quantized_predictions = [], []
+    float_seconds = quantized_seconds = 0.0
+    max_probability_diff = 0.0
+    clip_count = 0
+
+    with torch.no_grad():
+        for batch in batches:
+            start = time.perf_counter()
+            float_probabilities = torch.softmax(float_model(batch), dim=1)
+            float_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            quantized_probabilities = torch.softmax(quantized_model(batch), dim=1)
+            quantized_seconds += time.perf_counter() - start
+
+            float_predictions.extend(float_probabilities.argmax(dim=1).tolist())
+            quantized_predictions.extend(quantized_probabilities.argmax(dim=1).tolist())
+            max_probability_diff = max(
+                max_probability_diff,
+                (float_probabilities - quantized_probabilities).abs().max().item()
+            )
+            clip_count += len(batch)
+
+    float_predictions = np.array(float_predictions)
+    quantized_predictions = np.array(quantized_predictions)
+    report = {
+        'clips': clip_count,
+        'top1_agreement': float(np.mean(float_predictions == quantized_predictions)) if clip_count else None,
+        'max_probability_diff': max_probability_diff,
+        'float_ms_per_clip': float_seconds / clip_count * 1000 if clip_count else None,
+        'quantized_ms_per_clip': quantized_seconds / clip_count * 1000 if clip_count else None,
+        'float_accuracy': None,
+        'quantized_accuracy': None,
+    }
+    if clip_count and report['quantized_ms_per_clip']:
+        report['speedup'] = report['float_ms_per_clip'] / report['quantized_ms_per_clip']
+
+    if labels is not None:
+        labels = np.array(labels)
+        labelled = labels >= 0
+        if labelled.any():
+            report['labelled_clips'] = int(labelled.sum())
+            report['float_accuracy'] = float(np.mean(float_predictions[labelled] == labels[labelled]))
+            report['quantized_accuracy'] = float(np.mean(quantized_predictions[labelled] == labels[labelled]))
+
+    return report
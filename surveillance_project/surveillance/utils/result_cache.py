@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import time
+
+from .config import VideoProcessorConfig
+
+_file_hash_cache = {}
+
+
+def file_sha256(path):
+    """SHA-256 of a file, cached per (path, size, mtime)"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _file_hash_cache:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        _file_hash_cache[key] = digest.hexdigest()
+    return _file_hash_cache[key]
+
+
+def analysis_cache_key(content_hash, user_id, top_k=5):
+    """Cache key for a user's analysis of a video under the configured model and pipeline settings
+
+    Cached results point at the alerts and images saved for the first job, so
+    they are only shared between jobs of the same user. Only settings that can
+    change the results are included; batch size, decode and parallelism
+    settings give identical results and are left out.
+    """
+    model_path = VideoProcessorConfig.MODEL_PATH
+    settings = {
+        'content': content_hash,
+        'user': user_id,
+        'weights': file_sha256(model_path) if os.path.exists(model_path) else None,
+        'arch': VideoProcessorConfig.MODEL_ARCH,
+        'quantization': VideoProcessorConfig.QUANTIZATION,
+        'backend': VideoProcessorConfig.INFERENCE_BACKEND,
+        'optimize': VideoProcessorConfig.OPTIMIZE_FOR_INFERENCE,
+        'cascade': VideoProcessorConfig.CASCADE_THRESHOLD,
+        'decoder': 'ffmpeg' if VideoProcessorConfig.FFMPEG_BINARY else 'opencv',  # Scales frames differently
+        'top_k': top_k,
+        # The coarse-to-fine search may miss windows the dense pass finds
+        'search': ((VideoProcessorConfig.TEMPORAL_SEARCH_STRIDE, VideoProcessorConfig.TEMPORAL_SEARCH_BUDGET,
+                    VideoProcessorConfig.TEMPORAL_SEARCH_MIN_WINDOWS)
+                   if VideoProcessorConfig.TEMPORAL_SEARCH_STRIDE > 1 else None),
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+
+def cached_alerts_exist(entry):
+    """Whether every alert a cached analysis links to, and its image file, still exists"""
+    from ..models import Alert
+
+    alert_ids = {result['prediction']['alert_id'] for result in entry['results']}
+    alerts = Alert.objects.in_bulk(alert_ids)
+    if len(alerts) != len(alert_ids):
+        return False
+    return all(alert.image and alert.image.storage.exists(alert.image.name) for alert in alerts.values())
+
+
+class ResultCache:
+    """Analysis results stored as one JSON file per cache key
+
+    Entries expire after `max_age_days` and at most `max_entries` are kept; a
+    hit refreshes the entry's age, so the least recently used go first.
+    """
+
+    def __init__(self, directory, max_entries=1000, max_age_days=7):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 24 * 3600
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key, validate=None):
+        """Cached entry for `key`, or None
+
+        An entry for which `validate(entry)` is false is removed and not returned.
+        """
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                os.remove(path)
+                return None
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if validate is not None and not validate(entry):
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key, entry):
+        """Store a JSON-serialisable entry, then evict expired and excess entries"""
+        path = self._path(key)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Remove expired entries and the least recently used beyond max_entries"""
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if now - mtime > self.max_age:
+                self._remove(path)
+            else:
+                entries.append((mtime, path))
+
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_entries:]:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
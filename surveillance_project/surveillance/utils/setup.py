@@ -1,15 +1,43 @@
 from .config import VideoProcessorConfig
+from .load_governor import LoadGovernor
+from .processor_settings import ProcessorSettings
 from .video_processor import VideoProcessor
 
-def initialize_video_processor():
-    """Initialize VideoProcessor with configuration"""
-    processor = VideoProcessor(model_path=VideoProcessorConfig.MODEL_PATH)
+# One governor per process, shared by every camera
+load_governor = LoadGovernor(
+    target_latency_ms=VideoProcessorConfig.LOAD_TARGET_LATENCY_MS,
+    max_queue_depth=VideoProcessorConfig.LOAD_MAX_QUEUE_DEPTH
+) if VideoProcessorConfig.LOAD_SHEDDING else None
+
+def initialize_video_processor(camera_id=None):
+    """Initialize VideoProcessor with configuration
+
+    The model itself comes from the process-wide registry, so each call only
+    allocates per-stream state. `camera_id` selects the camera's motion threshold
+    and load shedding priority.
+    """
+    processor = VideoProcessor(settings=ProcessorSettings.from_config(camera_id, governor=load_governor))
     return processor
 
+def preload_model():
+    """Import the video stack and load the configured model into the shared registry
+
+    Called from the WSGI/ASGI entry points (see apps.preload_model_if_enabled)
+    so the first request does not pay for the torch import and model load.
+    """
+    try:
+        processor = initialize_video_processor()
+        if processor.backend is None:
+            print(f"No model preloaded: weights not found at {VideoProcessorConfig.MODEL_PATH}")
+        else:
+            print(f"Video processing model preloaded ({processor.model_source})")
+    except Exception as e:
+        print(f"Error preloading video processing model: {str(e)}")
+
 def process_camera_feed(camera_url, processor=None):
     """Process camera feed and generate alerts"""
     if processor is None:
-        processor = initialize_video_processor()
+        processor = initialize_video_processor(camera_url)
 
     for detection in processor.process_video_stream(
             camera_url,
@@ -1,26 +1,61 @@
 import cv2
 import torch
 import numpy as np
-from PIL import Image
 
-from torchvision import transforms
 from django.utils import timezone  # Add this import
 import os
-import sys
+import time
+import weakref
+from concurrent.futures import Future
 
 from .alert_handler import AlertHandler
+from .ffmpeg_reader import FFmpegFrameReader
+from .file_analysis import analyse_chunks, pipelined_analysis, plan_chunks, seek_to_frame
+from .frame_buffer import FrameRingBuffer
+from .metrics import (ALERTS, CLIPS, FRAMES, FRAMES_DROPPED, MODEL_FPS, MOTION_ACTIVITY, STAGE_SECONDS,
+                      camera_label, metrics)
+from .motion_gate import MotionGate
+from .preprocessing import ClipPreprocessor
+from .processor_settings import ProcessorSettings
 from .mailings import ThreatStatistics
-
-# Get the absolute path to the project root (Videoclassification directory)
-PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
-sys.path.insert(0, PROJECT_ROOT)
-
-from model import resnet50
+from .inference_backends import INFERENCE_BACKENDS, load_backend
+from .inference_pool import InferencePool
+from .model_loader import DEFAULT_FRAME_STRIDES, MODEL_ARCHITECTURES, import_model_module, weights_hash
+from .model_registry import SharedModel, model_registry
 
 from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth.models import User
 
+_gated_processors = weakref.WeakSet()  # Processors with a motion gate, reported at scrape time
+
+
+def _motion_reports():
+    """{camera label: summed motion_report()} over the live processors with a motion gate"""
+    totals = {}
+    for processor in list(_gated_processors):
+        report = processor.motion_report()
+        total = totals.setdefault(processor.camera, {'windows': 0, 'skipped_windows': 0,
+                                                     'inference_seconds_saved': 0.0})
+        for key in total:
+            total[key] += report[key]
+    return totals
+
+
+MOTION_SKIPPED_WINDOWS = metrics.gauge(
+    'surveillance_motion_skipped_windows', 'Live windows the motion gate kept from the model', ('camera',),
+    collect=lambda: {(camera,): r['skipped_windows'] for camera, r in _motion_reports().items()}
+)
+MOTION_SKIPPED_RATIO = metrics.gauge(
+    'surveillance_motion_skipped_ratio', 'Fraction of live windows the motion gate kept from the model', ('camera',),
+    collect=lambda: {(camera,): r['skipped_windows'] / r['windows'] if r['windows'] else 0.0
+                     for camera, r in _motion_reports().items()}
+)
+MOTION_SECONDS_SAVED = metrics.gauge(
+    'surveillance_motion_inference_seconds_saved', 'Estimated inference time the skipped windows saved',
+    ('camera',),
+    collect=lambda: {(camera,): r['inference_seconds_saved'] for camera, r in _motion_reports().items()}
+)
 
 # def _format_email_content(alert_data, threat_stats, camera_id): #Remove self
 #     """Format email content with threat statistics"""
@@ -61,194 +96,632 @@ from django.contrib.auth.models import User
 #     return content
 
 class VideoProcessor:
-    def __init__(self, model_path=None):
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    def __init__(self, model_path=None, settings=None, **options):
+        """Set up a processor from `settings` (a ProcessorSettings), with `options` overriding single values
+
+        VideoProcessor(model_path, batch_size=8) and
+        VideoProcessor(settings=ProcessorSettings(model_path=model_path, batch_size=8)) are the same.
+        """
+        if model_path is not None:
+            options['model_path'] = model_path
+        settings = (settings or ProcessorSettings()).replace(**options)
+        self.settings = settings
+
+        # Quantized kernels, the ONNX Runtime backend and inference worker processes are CPU-only
+        use_cuda = (torch.cuda.is_available() and not settings.quantization
+                    and settings.inference_backend == 'torch' and not settings.inference_workers)
+        self.device = torch.device('cuda' if use_cuda else 'cpu')
         self.sequence_length = 16
         self.im_size = 128
         self.class_labels = ['Robbery', 'Vandalism', 'Shoplifting', 'normal', 'Burglary', 'Stealing']
-
-        self.transform = transforms.Compose([
-            transforms.Resize((self.im_size, self.im_size)),
-            transforms.ToTensor(),
-            transforms.Normalize(
-                mean=[0.4889, 0.4887, 0.4891],
-                std=[0.2074, 0.2074, 0.2074]
-            )
-        ])
-
-        if model_path and os.path.exists(model_path):
-            self.model = resnet50(class_num=len(self.class_labels)).to(self.device)
-            self.model.load_state_dict(torch.load(model_path, map_location=self.device, weights_only=True))
-            self.model.eval()
-        else:
-            self.model = None
-
-        self.frame_buffer = []
+        self.model_arch = settings.model_arch
+        self.batch_size = max(1, int(settings.batch_size))
+        self.mean = [0.4889, 0.4887, 0.4891]
+        self.std = [0.2074, 0.2074, 0.2074]
+        self.sparse_decode = settings.sparse_decode
+        self.pipeline_depth = settings.pipeline_depth  # Batches queued between file analysis stages (0 = in turn)
+        self.pipeline_report = None  # Stage utilization of the last pipelined file analysis
+        # Decode through this ffmpeg executable, scaled to the model size (None = OpenCV at full resolution)
+        self.ffmpeg_binary = settings.ffmpeg_binary
+        self.camera = camera_label(settings.camera_id)  # Metrics label
+
+        if settings.model_arch not in MODEL_ARCHITECTURES:
+            raise ValueError(f"Unknown model architecture: {settings.model_arch}")
+        if settings.inference_backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend: {settings.inference_backend}")
+
+        # self.backend does all inference; self.model is only set for the torch backend.
+        # Both are shared read-only with every other processor using the same weights and settings.
+        self.model = None
+        self.backend = None
+        self.scheduler = None
+        model_info = dict(DEFAULT_FRAME_STRIDES, source=None)
+        if settings.model_path and os.path.exists(settings.model_path):
+            def loader():
+                return self._load_backend(settings, worker_batch=max(self.batch_size, settings.scheduler_batch or 1))
+
+            if settings.shared_model:
+                key = (weights_hash(settings.model_path), settings.model_arch, str(self.device), settings.artifact_dir,
+                       settings.quantization, settings.inference_backend, settings.backend_threads, settings.optimize,
+                       self.sequence_length, self.im_size, settings.inference_workers, settings.worker_threads,
+                       settings.cascade_threshold)
+                warmup_shape = (1, 3, self.sequence_length, self.im_size, self.im_size) if settings.warmup else None
+                shared = model_registry.get(key, loader, warmup_shape=warmup_shape)
+            else:
+                shared = loader()
+            self.backend, self.model, model_info = shared.backend, shared.model, shared.info
+
+            # Live clips from all streams on this model are micro-batched by one scheduler
+            if settings.scheduler_batch:
+                clip_shape = (3, self.sequence_length, self.im_size, self.im_size)
+                self.scheduler = shared.scheduler(clip_shape, settings.scheduler_batch, settings.scheduler_wait_ms)
+        self.model_source = model_info['source']
+        self.quantization = model_info.get('quantization')
+
+        # Offsets within a window that SlowFast reads (fast path ::2, slow path ::16)
+        self.consumed_offsets = sorted(
+            set(range(0, self.sequence_length, model_info['fast_stride']))
+            | set(range(0, self.sequence_length, model_info['slow_stride']))
+        )
+        self.preprocessor = ClipPreprocessor(
+            self.sequence_length, self.im_size, self.mean, self.std,
+            consumed_slots=self.consumed_offsets
+        )
+
+        # Live frames go through a fixed-size ring so overlapping windows need no per-frame allocation
+        self.frame_buffer = FrameRingBuffer(
+            self.sequence_length, self.im_size, self.im_size,
+            stride=settings.window_stride or self.sequence_length,
+            resize=self.preprocessor.resize_frame
+        )
+        self._window = np.empty_like(self.frame_buffer.frames)
         self.processed_frames = 0
 
-    def preprocess_frames(self, frames):
-        if len(frames) < self.sequence_length:
-            last_frame = frames[-1]
-            frames.extend([last_frame] * (self.sequence_length - len(frames)))
-
-        if len(frames) > self.sequence_length:
-            indices = np.linspace(0, len(frames) - 1, self.sequence_length, dtype=int)
-            frames = [frames[i] for i in indices]
-
-        transformed_frames = [self.transform(frame) for frame in frames]
-        frames_tensor = torch.stack(transformed_frames, dim=1)
-        return frames_tensor.unsqueeze(0)
-
-    def process_video_file(self, video_path):
-        """Process entire video file at once and return all results"""
-        if self.model is None:
-            return None
+        # Live windows with too little frame-to-frame change skip the model and count as normal
+        self.motion_gate = None
+        if settings.motion_threshold is not None:
+            self.motion_gate = MotionGate(settings.motion_threshold, window=self.sequence_length)
+            _gated_processors.add(self)
+        self.inference_seconds = 0.0  # Time spent in unscheduled live forwards, for motion_report()
+        self.inferred_clips = 0
+
+        # Under load the governor widens the window hop and drops frames, lowest priority first
+        self.governor = settings.governor
+        self.priority = settings.priority
+        self.window_stride = self.frame_buffer.stride
+        self.received_frames = 0
+
+        # Live windows reuse the per-frame stem activations of the frames they share
+        self.streaming_model = None
+        if settings.streaming and self.model is not None:
+            if isinstance(getattr(self.model, 'fast_conv1', None), torch.nn.Conv3d):
+                self.streaming_model = import_model_module().StreamingSlowFast(self.model)
+            else:
+                print(f"Streaming inference needs the eager SlowFast, not the {self.model_source} model; "
+                      f"using full windows")
+
+    def _load_backend(self, settings, worker_batch=1):
+        """Load the backend, in-process or as a pool of worker processes, and return it as a SharedModel"""
+        load_kwargs = dict(
+            model_path=settings.model_path, model_arch=self.model_arch, num_classes=len(self.class_labels),
+            device=self.device, sequence_length=self.sequence_length, im_size=self.im_size,
+            artifact_dir=settings.artifact_dir, quantization=settings.quantization,
+            inference_backend=settings.inference_backend, backend_threads=settings.backend_threads,
+            optimize=settings.optimize, cascade_threshold=settings.cascade_threshold,
+            normal_index=self.class_labels.index('normal')
+        )
+
+        if settings.inference_workers:
+            # Workers run on the CPU and keep inference off this process's GIL
+            clip_shape = (3, self.sequence_length, self.im_size, self.im_size)
+            pool = InferencePool(load_kwargs, clip_shape, workers=settings.inference_workers,
+                                 torch_threads=settings.worker_threads, max_batch=worker_batch)
+            print(f"Loaded {self.model_arch} model in {settings.inference_workers} worker processes "
+                  f"from {pool.info['source']}: {pool.info['path']}")
+            return SharedModel(pool, None, pool.info)
+
+        backend, model, info = load_backend(**load_kwargs)
+        print(f"Loaded {self.model_arch} model from {info['source']}: {info['path']}")
+        return SharedModel(backend, model, info)
+
+    def preprocess_frames(self, frames, out=None):
+        """Preprocess BGR uint8 frames into a (1, 3, T, H, W) model input tensor
+
+        The tensor shares memory with `out` (or the preprocessor's reusable buffer
+        when `out` is omitted), so it must be consumed before the next call.
+        """
+        clip = self.preprocessor(frames, out=out)
+        return torch.from_numpy(clip).unsqueeze(0)
+
+    def predict_batch(self, clips):
+        """Run the backend on a (N, 3, T, H, W) batch and return (N, num_classes) probabilities"""
+        return self.backend.predict(clips)
+
+    def predict_streaming(self, clip, first_frame_id):
+        """Classify one live (1, 3, T, H, W) window with cached stems; return its probabilities"""
+        with torch.inference_mode():
+            logits = self.streaming_model(clip.to(self.device), first_frame_id)
+            return torch.softmax(logits, dim=1)[0].cpu().numpy()
+
+    def _build_prediction(self, probabilities, frame_number):
+        """Format one row of model probabilities as a prediction dict"""
+        pred_class = int(np.argmax(probabilities))
+        return {
+            'predicted_class_idx': pred_class,
+            'confidence': float(probabilities[pred_class]) * 100,
+            'class_name': self.class_labels[pred_class],
+            'probabilities': probabilities,
+            'frame_number': frame_number
+        }
+
+    def _run_window_batch(self, clips, windows):
+        """Classify the first len(windows) preprocessed clips in `clips` with one forward"""
+        start = time.perf_counter()
+        probabilities = self.predict_batch(clips[:len(windows)])
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, camera='file', stage='inference')
+        MODEL_FPS.set(len(windows) / elapsed if elapsed else 0.0, camera='file')
+
+        return [
+            {
+                'frame': frame,  # Last original frame of the window
+                'prediction': self._build_prediction(probabilities[i], frame_number)
+            }
+            for i, (frame, frame_number) in enumerate(windows)
+        ]
+
+    def iter_windows(self, video_path, sparse_decode=None, start_window=0, window_count=None):
+        """Yield (frames, frame_number) for each window of a video file
+
+        Windows are ``sequence_length`` frames long and share their last frame with
+        the next window; the final window may be shorter. With ``sparse_decode``
+        frames the model never reads are grabbed but not retrieved and appear as
+        None. grab() still decodes them, so this only saves the colour conversion
+        and copy: about 10-35% of decode time, more at higher resolutions.
+        ``start_window`` seeks to that window and ``window_count`` stops after that
+        many full windows, so a chunk of the video yields exactly the windows a
+        full pass would. With ``ffmpeg_binary`` set, windows are (n, im_size,
+        im_size, 3) arrays already scaled by ffmpeg.
+        """
+        if self.ffmpeg_binary:
+            yield from self._iter_ffmpeg_windows(video_path, start_window, window_count)
+            return
+
+        if sparse_decode is None:
+            sparse_decode = self.sparse_decode
 
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise ValueError(f"Failed to open video: {video_path}")
 
-        frames = []
-        original_frames = []  # Store original frames for output
-        results = []
-        frame_count = 0
+        # Window offsets that must be decoded: the model's inputs plus the last frame,
+        # which is the result frame and the first frame of the next window
+        needed_offsets = set(self.consumed_offsets) | {self.sequence_length - 1}
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        frames = []  # None marks a frame that was skipped without decoding
+        frame_count = start_window * (self.sequence_length - 1)
+        windows = 0
 
         try:
+            if frame_count:
+                seek_to_frame(cap, frame_count)
+
             while True:
-                ret, frame = cap.read()
-                if not ret:
+                if not cap.grab():
                     break
 
                 frame_count += 1
-                # Store original frame
-                original_frames.append(frame.copy())
-
-                # Process frame for model
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frames.append(Image.fromarray(frame_rgb))
+                if sparse_decode and len(frames) not in needed_offsets and frame_count != total_frames:
+                    frames.append(None)
+                else:
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        break
+                    frames.append(frame)
 
                 if len(frames) >= self.sequence_length:
-                    # Process the sequence
-                    input_tensor = self.preprocess_frames(frames)
-                    input_tensor = input_tensor.to(self.device)
-
-                    with torch.no_grad():
-                        predictions = self.model(input_tensor)
-                        probabilities = torch.nn.functional.softmax(predictions, dim=1)
-                        pred_class = torch.argmax(probabilities, dim=1).item()
-                        confidence = probabilities[0][pred_class].item()
-
-                    # Use the last frame from original_frames for the result
-                    result = {
-                        'frame': original_frames[-1],  # Use the last original frame
-                        'prediction': {
-                            'predicted_class_idx': pred_class,
-                            'confidence': confidence * 100,
-                            'class_name': self.class_labels[pred_class],
-                            'probabilities': probabilities[0].cpu().numpy(),
-                            'frame_number': frame_count
-                        }
-                    }
-                    results.append(result)
+                    yield frames, frame_count
+                    windows += 1
+                    if window_count is not None and windows >= window_count:
+                        return
 
-                    # Clear processed frames but keep the last one for overlap
+                    # Keep the last frame for overlap
                     frames = frames[-1:]
-                    original_frames = original_frames[-1:]
 
-            # Process any remaining frames
+            # The last frames are only skipped when the container under-reports its frame count
+            while frames and frames[-1] is None:
+                frames.pop()
+
+            # Remaining frames form a short final window
             if len(frames) > 0:
-                input_tensor = self.preprocess_frames(frames)
-                input_tensor = input_tensor.to(self.device)
-
-                with torch.no_grad():
-                    predictions = self.model(input_tensor)
-                    probabilities = torch.nn.functional.softmax(predictions, dim=1)
-                    pred_class = torch.argmax(probabilities, dim=1).item()
-                    confidence = probabilities[0][pred_class].item()
-
-                result = {
-                    'frame': original_frames[-1],  # Use the last original frame
-                    'prediction': {
-                        'predicted_class_idx': pred_class,
-                        'confidence': confidence * 100,
-                        'class_name': self.class_labels[pred_class],
-                        'probabilities': probabilities[0].cpu().numpy(),
-                        'frame_number': frame_count
-                    }
-                }
-                results.append(result)
+                yield frames, frame_count
 
         finally:
             cap.release()
 
-        return results
-    def process_video_stream(self, camera_url, confidence_threshold=0.7):
-        """Process live video stream from camera"""
-        cap = cv2.VideoCapture(camera_url)
-        if not cap.isOpened():
-            raise ValueError(f"Failed to open camera stream: {camera_url}")
+    def _iter_ffmpeg_windows(self, video_path, start_window=0, window_count=None):
+        """iter_windows through ffmpeg: each window is read straight from the pipe into its own array"""
+        frame_count = start_window * (self.sequence_length - 1)
+        start_seconds = 0.0
+        if frame_count:
+            cap = cv2.VideoCapture(video_path)
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            cap.release()
+            if fps <= 0:
+                raise ValueError(f"Cannot seek in video without a frame rate: {video_path}")
+            start_seconds = frame_count / fps
+
+        shape = (self.sequence_length, self.im_size, self.im_size, 3)
+        window = np.empty(shape, dtype=np.uint8)
+        filled = 0
+        windows = 0
+
+        with FFmpegFrameReader(video_path, self.im_size, self.im_size, ffmpeg=self.ffmpeg_binary,
+                               start_seconds=start_seconds) as reader:
+            while reader.read(out=window[filled]) is not None:
+                filled += 1
+                frame_count += 1
+                if filled == self.sequence_length:
+                    yield window, frame_count
+                    windows += 1
+                    if window_count is not None and windows >= window_count:
+                        return
+
+                    # The next window starts with this window's last frame
+                    next_window = np.empty(shape, dtype=np.uint8)
+                    next_window[0] = window[-1]
+                    window, filled = next_window, 1
+
+        # Remaining frames form a short final window
+        if filled > 0:
+            yield window[:filled], frame_count
+
+    def read_frame(self, video_path, frame_number=None):
+        """Decode one full-resolution frame with OpenCV; None if it cannot be read
+
+        `frame_number` counts frames from 1, as in results, so it names the last
+        frame of that result's window. Without it the next frame of a stream is read.
+        """
+        cap = cv2.VideoCapture(video_path)
+        try:
+            if frame_number:
+                seek_to_frame(cap, frame_number - 1)
+            ret, frame = cap.read()
+            return frame if ret else None
+        finally:
+            cap.release()
+
+    def _result_frame(self, frames):
+        """Frame kept with a window's result: its last original frame, or None when ffmpeg scaled it"""
+        return None if self.ffmpeg_binary else frames[-1]
+
+    def iter_selected_windows(self, video_path, window_indices, sparse_decode=None):
+        """Yield (frames, frame_number) for the given window indices, in increasing order
+
+        Each run of consecutive indices is read with one seek.
+        """
+        indices = sorted(set(window_indices))
+        run_start = 0
+        for i in range(1, len(indices) + 1):
+            if i == len(indices) or indices[i] != indices[i - 1] + 1:
+                yield from self.iter_windows(video_path, sparse_decode=sparse_decode,
+                                             start_window=indices[run_start], window_count=i - run_start)
+                run_start = i
+
+    def process_video_file(self, video_path, batch_size=None, sparse_decode=None, start_window=0,
+                           window_count=None, window_indices=None):
+        """Yield a result for every window of a video file, one batch at a time
+
+        Windows are collected into batches of ``batch_size`` clips (defaults to
+        ``self.batch_size``) so each batch needs only one model forward. Nothing
+        is kept once a batch's results are yielded, so memory does not grow with
+        the video's length. ``start_window``/``window_count`` limit the pass to
+        one chunk of the video (see iter_windows), and ``window_indices`` to the
+        listed windows (see iter_selected_windows). With ``pipeline_depth`` set,
+        decoding, preprocessing and inference overlap in separate threads. With
+        ``ffmpeg_binary`` set results carry no frame; read_frame() decodes the
+        full-resolution frame of the few results that need one.
+        """
+        if self.backend is None:
+            return
+
+        batch_size = max(1, int(batch_size or self.batch_size))
+        if window_indices is not None:
+            windows = self.iter_selected_windows(video_path, window_indices, sparse_decode=sparse_decode)
+        else:
+            windows = self.iter_windows(video_path, sparse_decode=sparse_decode, start_window=start_window,
+                                        window_count=window_count)
+
+        if self.pipeline_depth:
+            self.pipeline_report = {}
+            yield from pipelined_analysis(
+                windows, self._preprocess_file_window, self._run_window_batch,
+                (3, self.sequence_length, self.im_size, self.im_size), batch_size, self.pipeline_depth,
+                report=self.pipeline_report, keep_frames=not self.ffmpeg_binary
+            )
+            stages = self.pipeline_report['stages']
+            print(f"File analysis pipeline: {self.pipeline_report['windows']} windows in "
+                  f"{self.pipeline_report['wall_seconds']:.1f}s, utilization "
+                  + ', '.join(f"{name} {stage['utilization']:.0%}" for name, stage in stages.items()))
+            return
+
+        # Preprocessed windows are written straight into this batch buffer
+        clips = np.empty((batch_size, 3, self.sequence_length, self.im_size, self.im_size), dtype=np.float32)
+        pending_windows = []  # (original frame, frame number) of the clips waiting in the batch buffer
+
+        for frames, frame_number in windows:
+            # Queue the sequence, using the last original frame for the result
+            self._preprocess_file_window(frames, out=clips[len(pending_windows)])
+            pending_windows.append((self._result_frame(frames), frame_number))
+
+            if len(pending_windows) >= batch_size:
+                yield from self._run_window_batch(clips, pending_windows)
+                pending_windows = []
+
+        if pending_windows:
+            yield from self._run_window_batch(clips, pending_windows)
+
+    def _preprocess_file_window(self, frames, out):
+        with STAGE_SECONDS.time(camera='file', stage='preprocess'):
+            self.preprocessor(frames, out=out)
+
+    def search_video_file(self, video_path, top_k=5, stride=8, budget=0.25, min_windows=0):
+        """Yield results for a coarse-to-fine selection of windows approximating the dense top-k
+
+        A coarse pass classifies every `stride`-th window. A refinement pass then
+        classifies the unvisited windows around the most confident coarse windows,
+        nearest first, until `budget` (a fraction of all windows) is spent. Results
+        carry no frame, so read_frame() decodes the frames of the final top-k.
+        Videos with fewer than `min_windows` windows are analysed densely.
+        """
+        if self.backend is None:
+            return
+
+        cap = cv2.VideoCapture(video_path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        hop = self.sequence_length - 1
+        window_total = max(0, total_frames - 1) // hop
+        stride = max(1, int(stride))
+        if stride == 1 or window_total < max(min_windows, 2 * stride):
+            yield from self.process_video_file(video_path)
+            return
+
+        scores = {}
+        for result in self.process_video_file(video_path, window_indices=range(0, window_total, stride)):
+            window = (result['prediction']['frame_number'] - self.sequence_length) // hop
+            scores[window] = result['prediction']['confidence']
+            result['frame'] = None
+            yield result
+
+        # Refine around as many of the best coarse windows as the budget covers fully (at least top_k),
+        # one distance step at a time so a tight budget still reaches each of them
+        remaining = max(0, int(window_total * budget) - len(scores))
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        candidates = ranked[:max(top_k, remaining // (2 * (stride - 1)))]
+        refine = set()
+        for distance in range(1, stride):
+            for window in candidates:
+                for neighbour in (window - distance, window + distance):
+                    if remaining and 0 <= neighbour < window_total and neighbour not in scores \
+                            and neighbour not in refine:
+                        refine.add(neighbour)
+                        remaining -= 1
+
+        for result in self.process_video_file(video_path, window_indices=refine):
+            result['frame'] = None
+            yield result
+
+        classified = len(scores) + len(refine)
+        print(f"Temporal search: classified {classified} of {window_total} windows "
+              f"({classified / window_total:.0%}), {len(refine)} in refinement")
+
+    def process_video_chunks(self, video_path, workers, top_k=5, min_chunk_windows=256, torch_threads=1):
+        """Yield the results of process_video_file, analysing chunks of the video in parallel processes
+
+        Chunks are whole runs of windows, so every window is classified exactly
+        once, as in a sequential pass. Results come back in frame order. To keep
+        them small, only the `top_k` most confident windows of each chunk carry
+        their frame, as JPEG bytes; the others have 'frame' set to None. The
+        video's overall top-k windows are always among these. Videos shorter
+        than two chunks are analysed in this process.
+        """
+        if self.backend is None:
+            return
+
+        cap = cv2.VideoCapture(video_path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        chunks = plan_chunks(total_frames, self.sequence_length, workers, min_chunk_windows)
+        if len(chunks) < 2:
+            # Too short to be worth starting workers
+            yield from self.process_video_file(video_path)
+            return
+
+        yield from analyse_chunks(self.settings.for_file_analysis(), video_path, chunks,
+                                  min(workers, len(chunks)), top_k, torch_threads)
+
+    def process_video_stream(self, camera_url, confidence_threshold=0.7, snapshot_fps=2.0):
+        """Process live video stream from camera
+
+        With ``ffmpeg_binary`` set the stream is decoded at the model size, and
+        the same ffmpeg process keeps full-resolution JPEG snapshots at
+        `snapshot_fps`. An alert's frame is then the latest snapshot, up to
+        1 / snapshot_fps seconds from the alerting frame, or the scaled frame
+        before the first snapshot arrives.
+        """
+        reader = None
+        if self.ffmpeg_binary:
+            reader = FFmpegFrameReader(camera_url, self.im_size, self.im_size, ffmpeg=self.ffmpeg_binary,
+                                       snapshot_fps=snapshot_fps)
+            read = reader.read
+            release = reader.close
+        else:
+            cap = cv2.VideoCapture(camera_url)
+            if not cap.isOpened():
+                raise ValueError(f"Failed to open camera stream: {camera_url}")
+
+            def read():
+                ret, frame = cap.read()
+                return frame if ret else None
+            release = cap.release
 
-        self.frame_buffer = []
+        self.frame_buffer.reset()
         self.processed_frames = 0
+        self.received_frames = 0
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        if self.streaming_model is not None:
+            self.streaming_model.reset()
 
         try:
             while True:
-                ret, frame = cap.read()
-                if not ret:
+                frame = read()
+                if frame is None:
                     break
+                FRAMES.inc(camera=self.camera)
 
                 result = self.process_frame(frame)
 
                 if result is not None and result['confidence'] > confidence_threshold * 100:
                     if result['class_name'].lower() != 'normal':
+                        if reader is not None:
+                            # The scaled frame is overwritten by the next read
+                            frame = reader.snapshot() or frame.copy()
                         yield {
                             'frame': frame,
                             'prediction': result
                         }
 
         finally:
-            cap.release()
+            release()
 
     def process_frame(self, frame):
-        """Process a single frame for live streaming"""
-        if self.model is None:
+        """Process a single frame for live streaming
+
+        Once the ring buffer holds ``sequence_length`` frames a prediction is made
+        every ``frame_buffer.stride`` frames over the most recent window.
+        """
+        future = self.process_frame_async(frame)
+        return future.result() if future is not None else None
+
+    def process_frame_async(self, frame, callback=None):
+        """Push a frame and, when a window is ready, start its prediction without waiting
+
+        Returns None when no prediction was started, otherwise a Future for the
+        prediction dict; callback(prediction) is also called once it is ready. With
+        a scheduler the clip joins a micro-batch with other streams' clips.
+        """
+        if self.backend is None:
             return None
 
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image = Image.fromarray(frame_rgb)
+        if self.governor is not None:
+            hop_factor, frame_step = self.governor.degradation(self.priority)
+            self.frame_buffer.stride = self.window_stride * hop_factor
+            self.received_frames += 1
+            if self.received_frames % frame_step:
+                FRAMES_DROPPED.inc(camera=self.camera, reason='load_shedding')
+                return None
 
-        self.frame_buffer.append(image)
+        self.frame_buffer.push(frame)
         self.processed_frames += 1
+        if self.motion_gate is not None:
+            # Scored on the already resized ring slot, so the gate adds almost no work
+            MOTION_ACTIVITY.set(self.motion_gate.score(self.frame_buffer.latest()), camera=self.camera)
 
-        if len(self.frame_buffer) >= self.sequence_length:
-            input_tensor = self.preprocess_frames(self.frame_buffer)
-            input_tensor = input_tensor.to(self.device)
-
-            with torch.no_grad():
-                predictions = self.model(input_tensor)
-                probabilities = torch.nn.functional.softmax(predictions, dim=1)
-                pred_class = torch.argmax(probabilities, dim=1).item()
-                confidence = probabilities[0][pred_class].item()
+        if not self.frame_buffer.window_ready():
+            return None
 
-                self.frame_buffer = []
+        frame_number = self.processed_frames
+        future = Future()
+
+        if self.motion_gate is not None and not self.motion_gate.window_active():
+            CLIPS.inc(camera=self.camera, outcome='skipped_static')
+            prediction = self._static_scene_prediction(frame_number)
+            future.set_result(prediction)
+            if callback is not None:
+                callback(prediction)
+            return future
+
+        ready = time.perf_counter()
+        window = self.frame_buffer.window(out=self._window)
+        clip = self.preprocess_frames(window)
+        STAGE_SECONDS.observe(time.perf_counter() - ready, camera=self.camera, stage='preprocess')
+        CLIPS.inc(camera=self.camera, outcome='inferred')
+
+        def deliver(probabilities):
+            # Latency from window ready to prediction, including any wait for a micro-batch
+            latency = time.perf_counter() - ready
+            STAGE_SECONDS.observe(latency, camera=self.camera, stage='inference')
+            if self.governor is not None:
+                queue_depth = self.scheduler.queue_depth() if self.scheduler is not None else 0
+                self.governor.record(latency, queue_depth)
+            prediction = self._build_prediction(probabilities, frame_number)
+            future.set_result(prediction)
+            if callback is not None:
+                callback(prediction)
+
+        if self.streaming_model is not None or self.scheduler is None:
+            start = time.perf_counter()
+            if self.streaming_model is not None:
+                # Per-stream caches cannot be shared across streams, so this bypasses the scheduler
+                probabilities = self.predict_streaming(clip, frame_number - self.sequence_length)
+            else:
+                probabilities = self.predict_batch(clip)[0]
+            elapsed = time.perf_counter() - start
+            self.inference_seconds += elapsed
+            self.inferred_clips += 1
+            MODEL_FPS.set(1 / elapsed if elapsed else 0.0, camera=self.camera)
+            deliver(probabilities)
+        else:
+            def on_done(scheduled):
+                if scheduled.cancelled():
+                    future.cancel()
+                elif scheduled.exception() is not None:
+                    future.set_exception(scheduled.exception())
+                else:
+                    deliver(scheduled.result())
+
+            self.scheduler.submit(clip[0].numpy()).add_done_callback(on_done)
+        return future
+
+    def _static_scene_prediction(self, frame_number):
+        """Prediction for a window the motion gate skipped: certain 'normal'"""
+        probabilities = np.zeros(len(self.class_labels), dtype=np.float32)
+        probabilities[self.class_labels.index('normal')] = 1.0
+        prediction = self._build_prediction(probabilities, frame_number)
+        prediction['skipped'] = True
+        prediction['activity'] = self.motion_gate.last_score
+        return prediction
+
+    def motion_report(self):
+        """Motion gate statistics with the inference time the skipped windows saved"""
+        if self.motion_gate is None:
+            return None
 
-                return {
-                    'predicted_class_idx': pred_class,
-                    'confidence': confidence * 100,
-                    'class_name': self.class_labels[pred_class],
-                    'probabilities': probabilities[0].cpu().numpy(),
-                    'frame_number': self.processed_frames
-                }
+        if self.scheduler is not None:
+            seconds_per_clip = self.scheduler.seconds_per_clip()
+        else:
+            seconds_per_clip = self.inference_seconds / self.inferred_clips if self.inferred_clips else 0.0
 
-        return None
+        report = self.motion_gate.stats()
+        report['inference_ms_per_clip'] = seconds_per_clip * 1000
+        report['inference_seconds_saved'] = report['skipped_windows'] * seconds_per_clip
+        return report
 
     def save_alert(self, frame, alert_info,timestamp_vid, save_dir, camera_id=None):
-        """Save alert information and send email notification"""
-        if frame is None or not isinstance(frame, np.ndarray):
+        """Save alert information and send email notification
+
+        `frame` is a BGR image or the frame already encoded as JPEG bytes.
+        """
+        if frame is None or not isinstance(frame, (np.ndarray, bytes)):
             print(f"Warning: Invalid frame data received: {type(frame)}")
             return None
 
-        if frame.size == 0:
+        if (len(frame) if isinstance(frame, bytes) else frame.size) == 0:
             print("Warning: Empty frame received")
             return None
 
@@ -257,13 +730,17 @@ class VideoProcessor:
             alert_handler = AlertHandler()
 
             # Create alert and get response
-            alert_data = alert_handler.create_alert(
-                frame=frame,
-                prediction=alert_info,
-                camera_id=camera_id,
-            )
+            with STAGE_SECONDS.time(camera=camera_label(camera_id), stage='alert_persist'):
+                alert_data = alert_handler.create_alert(
+                    frame=frame,
+                    prediction=alert_info,
+                    camera_id=camera_id,
+                )
 
             if alert_data:
+                ALERTS.inc(threat_type=alert_data.get('threat_type'))
+                email_start = time.perf_counter()
+
                 # Get threat statistics
                 stats = ThreatStatistics()
                 threat_stats = stats.get_threat_statistics_test(time_window_minutes=15)
@@ -277,6 +754,7 @@ class VideoProcessor:
 
                 # Send email to all active staff users
                 self._send_notification_email(email_content)
+                STAGE_SECONDS.observe(time.perf_counter() - email_start, camera=camera_label(camera_id), stage='email')
 
             return alert_data
 
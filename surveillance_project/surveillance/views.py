@@ -1,23 +1,24 @@
+import hmac
 import os
+
 from django.contrib.auth.decorators import login_required
-from django.http import StreamingHttpResponse, HttpResponse
+from django.http import StreamingHttpResponse, HttpResponse, HttpResponseForbidden, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
 from .forms import VideoUploadForm, CustomUserCreationForm
-from .models import Camera, Alert
-from .utils.VideoFeed import VideoCamera, gen
-from .utils.cctvConnection import VideoCameraCCTV, genCCTV
-from .utils.fileUploadHandler import process_uploaded_video, VideoFileHandler
+from .models import Camera, Alert, AnalysisJob
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.forms import UserCreationForm
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-import json
 
-from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
 
+from .utils.config import VideoProcessorConfig
 from .utils.path_handlers import get_media_url
+from .utils.metrics import metrics as pipeline_metrics
 
 
 @login_required
@@ -32,6 +33,10 @@ def dashboard(request):
 
 @login_required
 def video_feed(request):
+    # The video modules pull in torch, OpenCV and the model code, so they are imported
+    # by the views that use them rather than whenever Django loads the URLconf
+    from .utils.VideoFeed import VideoCamera, gen
+
     try:
         camera = VideoCamera()
         return StreamingHttpResponse(
@@ -40,6 +45,21 @@ def video_feed(request):
         )
     except Exception as e:
         return HttpResponse(f"Error: {str(e)}")
+
+def metrics(request):
+    """Pipeline counters and stage latencies in the Prometheus text format
+
+    Labels name camera hosts and paths, so only staff users and scrapers sending
+    the configured bearer token may read them.
+    """
+    token = VideoProcessorConfig.METRICS_TOKEN or os.environ.get('SURVEILLANCE_METRICS_TOKEN')
+    authorization = request.headers.get('Authorization', '')
+    token_ok = bool(token) and hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode())
+    if not (token_ok or request.user.is_staff):
+        return HttpResponseForbidden("Metrics are only available to staff or with the scrape token")
+    return HttpResponse(pipeline_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @login_required
 def index(request):
     return render(request, 'video/index.html')
@@ -48,6 +68,8 @@ def index(request):
 @csrf_exempt  # Exempt from CSRF protection for simplicity (INSECURE for production)
 def video_feedCCTV(request):
     if request.method == 'POST':
+        from .utils.cctvConnection import VideoCameraCCTV, genCCTV
+
         ip_address = request.POST.get('ip_address')
         port = request.POST.get('port')
         username = request.POST.get('username')
@@ -134,32 +156,39 @@ def upload_video(request):
     if request.method == 'POST':
         form = VideoUploadForm(request.POST, request.FILES)
         if form.is_valid():
-            # Initialize handlers
-            file_handler = VideoFileHandler()
+            # Only the file is saved here; `manage.py run_analysis_worker` analyses it
+            from .utils.fileUploadHandler import VideoFileHandler
+            from .utils.result_cache import analysis_cache_key, cached_alerts_exist
 
             try:
-                # Save uploaded video
+                file_handler = VideoFileHandler()
                 video_info = file_handler.save_uploaded_video(request.FILES['video'])
-
-                # Create result directory
-                result_dir = file_handler.create_result_directory(video_info['filename'])
-
-                # Process video
-                results = process_uploaded_video(video_info['filepath'])
-
-                # Save results
-                result_file = os.path.join(result_dir, 'analysis_results.json')
-                with open(result_file, 'w') as f:
-                    json.dump(results, f, indent=2)
-
-                # Store paths in session for result view
-                request.session['video_path'] = video_info['filepath']
-                request.session['result_path'] = os.path.relpath(result_file, settings.MEDIA_ROOT)
-
-                return redirect('view_results')
+                job = AnalysisJob(
+                    user=request.user,
+                    video_path=video_info['filepath'],
+                    original_name=request.FILES['video'].name,
+                    content_hash=video_info['sha256']
+                )
+
+                # The same footage analysed for this user with the same model and settings is not analysed
+                # again, unless alerts it links to have since been deleted
+                cached = file_handler.result_cache.get(analysis_cache_key(job.content_hash, request.user.id),
+                                                       validate=cached_alerts_exist)
+                if cached is not None:
+                    job.status = 'completed'
+                    job.results = cached['results']
+                    job.frames_total = job.frames_processed = cached['frames_total']
+                    job.started_at = job.finished_at = timezone.now()
+                    messages.success(request, "This video was analysed before; showing the saved results.")
+                else:
+                    messages.success(request, "Video uploaded. Analysis will start shortly.")
+
+                job.save()
+                request.session['analysis_job_id'] = job.id
+                return redirect('view_results', job_id=job.id)
 
             except Exception as e:
-                messages.error(request, f"Error processing video: {str(e)}")
+                messages.error(request, f"Error saving video: {str(e)}")
                 return redirect('upload_video')
     else:
         form = VideoUploadForm()
@@ -168,25 +197,30 @@ def upload_video(request):
 
 
 @login_required
-def view_results(request):
-    video_path = request.session.get('video_path')
-    result_path = request.session.get('result_path')
+def view_results(request, job_id=None):
+    if job_id is None:
+        job_id = request.session.get('analysis_job_id')
 
-    if not video_path or not result_path:
+    if not job_id:
         messages.error(request, "No results found. Please upload a video first.")
         return redirect('upload_video')
 
-    # Convert video path to proper media URL for template
-    video_url = get_media_url(video_path)
-
-    # Read results
-    result_file = os.path.join(settings.MEDIA_ROOT, result_path)
-    with open(result_file, 'r') as f:
-        results = json.load(f)
+    job = get_object_or_404(AnalysisJob, id=job_id, user=request.user)
 
     context = {
-        'video_path': video_url,
-        'results': results
+        'job': job,
+        # Convert video path to proper media URL for template
+        'video_path': get_media_url(job.video_path),
+        'results': job.results or []
     }
 
-    return render(request, 'upload/view_results.html', context)
\ No newline at end of file
+    return render(request, 'upload/view_results.html', context)
+
+
+@login_required
+def analysis_progress(request, job_id):
+    """JSON progress of an upload's analysis, polled by the results page"""
+    job = get_object_or_404(AnalysisJob, id=job_id, user=request.user)
+    progress = job.progress()
+    progress['results_url'] = reverse('view_results', args=[job.id])
+    return JsonResponse(progress)